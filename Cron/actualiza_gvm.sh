@@ -4,6 +4,8 @@ sudo -u gvm greenbone-nvt-sync
 sudo -u gvm greenbone-feed-sync --type GVMD_DATA
 sudo -u gvm greenbone-feed-sync --type SCAP
 sudo -u gvm greenbone-feed-sync --type CERT
+# Los datos SCAP/CERT han cambiado: se vacía la caché de enriquecimiento de CVE
+python3 /opt/gvm/Reports/enriquecimiento.py --invalidar
 
 
 
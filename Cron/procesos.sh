@@ -1,13 +1,8 @@
 #!/bin/bash
 
-old_process=$(ps -eo command)
-
-while true; do
-        new_process=$(ps -eo command)
-        diff <(echo "$old_process") <(echo "$new_process") | grep "[\>\<]" | grep -v  "kworker"
-        old_process=$new_process
-done
-
-
-
+# Monitor de procesos: muestreo de CPU/RSS/E-S de gvmd, ospd-openvas, openvas,
+# redis-server y postgres leyendo /proc cada 10 s (antes, ps + diff en bucle sin pausa).
+# Muestras y eventos de arranque/fin en /opt/gvm/Reports/recursos.jsonl (rotativo).
+# Uso: procesos.sh [-i SEGUNDOS] [--todos] | procesos.sh --resumen [--horas N]
 
+exec python3 /opt/gvm/Reports/muestreo_recursos.py "$@"
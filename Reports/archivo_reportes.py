@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Archivo local de los reportes de gvmd antes de borrarlos.
+
+Cuando delete-files.py borra los reportes de gvmd los datos en bruto se
+pierden, y repetir una exportación con otros filtros (otro `min_qod`, sin
+`apply_overrides`...) obligaba a volver a escanear todo. Con
+"archivo_reportes": true en /opt/gvm/Config/config.json, retencion_reportes.py
+archiva cada reporte antes de borrarlo:
+
+- El XML de GMP del reporte completo (todos los resultados, sin filtrar por
+  QoD ni severidad y con sus overrides) se descarga página a página y se
+  escribe comprimido (zstd o gzip) en streaming
+- Almacenamiento direccionado por contenido: el fichero se llama como el
+  SHA-256 del XML (`Reports/archivo/objetos/ab/abcd....xml.zst`); volver a
+  archivar el mismo contenido no duplica nada y el hash permite verificarlo
+- Índice SQLite (`Reports/archivo/indice.db`) por reporte, tarea y fecha
+
+La reexportación reconstruye el CSV de cualquier reporte archivado, sin
+pasar por gvmd, aplicando en local los filtros `apply_overrides`, `min_qod`
+y `severity>`:
+
+    python3 archivo_reportes.py --listar [--tarea NOMBRE] [--desde 2026-01-01]
+    python3 archivo_reportes.py --reexportar --desde 2026-01-01 --filtro "apply_overrides=0 min_qod=30 severity>0"
+"""
+import argparse
+import datetime
+import hashlib
+import ipaddress
+import os
+import re
+import sqlite3
+import time
+
+from compresion import abrir_compresor, abrir_descompresor, escribir_csv, ruta_csv, zstandard
+from ingesta_xml import COLUMNAS, ColumnasResultados, iter_resultados
+
+ARCHIVO_DIR = "/opt/gvm/Reports/archivo"
+INDICE_DB = os.path.join(ARCHIVO_DIR, "indice.db")
+REEXPORT_DIR = "/opt/gvm/Reports/exports/reexport"
+
+# Todos los resultados, con la severidad original y los overrides de cada uno
+FILTRO_ARCHIVO = "apply_overrides=0 min_qod=0 overrides=1 sort=name"
+FILTRO_REEXPORT = "apply_overrides=1 min_qod=70 severity>0"
+
+EXTENSION = ".xml.zst" if zstandard is not None else ".xml.gz"
+
+
+def abrir_indice(ruta=INDICE_DB):
+    """Abre (y crea si no existe) el índice del archivo."""
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    conn = sqlite3.connect(ruta, timeout=30)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS reportes (
+            report_id TEXT PRIMARY KEY,
+            task_id TEXT,
+            task_name TEXT,
+            fecha INTEGER,
+            sha256 TEXT NOT NULL,
+            objeto TEXT NOT NULL,
+            bytes INTEGER,
+            bytes_comprimidos INTEGER,
+            resultados INTEGER,
+            archivado TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_reportes_tarea ON reportes (task_name, fecha);
+        CREATE INDEX IF NOT EXISTS idx_reportes_fecha ON reportes (fecha);
+    """)
+    return conn
+
+
+def archivados(ids, ruta=INDICE_DB):
+    """Subconjunto de `ids` que ya está en el archivo."""
+    ids = list(ids)
+    encontrados = set()
+    conn = abrir_indice(ruta)
+    try:
+        # En bloques de 500 por el límite de parámetros de SQLite
+        for inicio in range(0, len(ids), 500):
+            bloque = ids[inicio:inicio + 500]
+            encontrados.update(fila[0] for fila in conn.execute(
+                f"SELECT report_id FROM reportes WHERE report_id IN ({','.join('?' * len(bloque))})",
+                bloque))
+    finally:
+        conn.close()
+    return encontrados
+
+
+def archivar(gmp, reporte, page_size=1000, directorio=ARCHIVO_DIR, ruta=INDICE_DB):
+    """
+    Descarga el XML completo de un reporte, lo guarda comprimido bajo su
+    SHA-256 y lo registra en el índice.
+
+    Args:
+        reporte: dict de retencion_reportes.listar_reportes (id, task_id, task_name, fecha)
+
+    Returns:
+        dict con sha256, bytes, bytes_comprimidos y resultados
+    """
+    # La extensión al final: abrir_compresor elige zstd/gzip por ella
+    temporal = os.path.join(directorio, f".{reporte['id']}.tmp{EXTENSION}")
+    os.makedirs(directorio, exist_ok=True)
+    sha256 = hashlib.sha256()
+    total_bytes = 0
+    resultados = 0
+    try:
+        with abrir_compresor(temporal) as compresor:
+            def escribir(datos):
+                nonlocal total_bytes
+                sha256.update(datos)
+                compresor.write(datos)
+                total_bytes += len(datos)
+
+            escribir(f'<archivo_reporte id="{reporte["id"]}">'.encode("utf-8"))
+            start = 1
+            while True:
+                respuesta = gmp.get_report(
+                    report_id=reporte["id"],
+                    filter_string=f"{FILTRO_ARCHIVO} first={start} rows={page_size}",
+                    ignore_pagination=False,
+                    details=True,
+                )
+                if isinstance(respuesta, str):
+                    respuesta = respuesta.encode("utf-8")
+                # Cada página es un documento; se quita la declaración XML para anidarlas
+                if respuesta.startswith(b"<?xml"):
+                    respuesta = respuesta[respuesta.index(b"?>") + 2:]
+                recibidos = sum(1 for _ in iter_resultados([respuesta]))
+                escribir(respuesta)
+                resultados += recibidos
+                if recibidos < page_size:
+                    break
+                start += page_size
+            escribir(b"</archivo_reporte>")
+
+        digest = sha256.hexdigest()
+        objeto = os.path.join("objetos", digest[:2], digest + EXTENSION)
+        destino = os.path.join(directorio, objeto)
+        if os.path.exists(destino):
+            # Mismo contenido ya archivado: basta con el índice
+            os.remove(temporal)
+        else:
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            os.replace(temporal, destino)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+    registro = {"sha256": digest, "bytes": total_bytes,
+                "bytes_comprimidos": os.path.getsize(destino), "resultados": resultados}
+    conn = abrir_indice(ruta)
+    try:
+        with conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO reportes
+                    (report_id, task_id, task_name, fecha, sha256, objeto, bytes,
+                     bytes_comprimidos, resultados, archivado)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (reporte["id"], reporte.get("task_id"), reporte.get("task_name"), reporte.get("fecha"),
+                  digest, objeto, total_bytes, registro["bytes_comprimidos"], resultados,
+                  datetime.datetime.now().isoformat(timespec="seconds")))
+    finally:
+        conn.close()
+    return registro
+
+
+def archivar_reportes(gmp, reportes, ruta=INDICE_DB):
+    """
+    Archiva los reportes que aún no estén en el archivo.
+
+    Returns:
+        tuple (ids archivados o que ya lo estaban, dict id -> error)
+    """
+    ya_archivados = archivados([reporte["id"] for reporte in reportes], ruta)
+    correctos, errores = list(ya_archivados), {}
+    pendientes = [reporte for reporte in reportes if reporte["id"] not in ya_archivados]
+    sin_comprimir = comprimido = 0
+    inicio = time.perf_counter()
+    for numero, reporte in enumerate(pendientes, 1):
+        try:
+            registro = archivar(gmp, reporte, ruta=ruta)
+        except Exception as e:
+            errores[reporte["id"]] = f"archivo: {e}"
+            print(f"[ERROR] No se pudo archivar el reporte {reporte['id']}: {e}")
+            continue
+        correctos.append(reporte["id"])
+        sin_comprimir += registro["bytes"]
+        comprimido += registro["bytes_comprimidos"]
+        print(f"[INFO] Archivado {numero}/{len(pendientes)} {reporte['id']} ({reporte.get('task_name')}): "
+              f"{registro['resultados']} resultados, {registro['bytes_comprimidos'] / 1024 / 1024:.1f} MB")
+    if pendientes:
+        print(f"✓ Archivados {len(pendientes) - len(errores)} reportes en {time.perf_counter() - inicio:.1f} s: "
+              f"{sin_comprimir / 1024 / 1024:.1f} MB → {comprimido / 1024 / 1024:.1f} MB")
+    return correctos, errores
+
+
+def buscar(tarea=None, desde=None, hasta=None, report_id=None, ruta=INDICE_DB):
+    """Entradas del índice que cumplen los criterios (fechas como epoch)."""
+    condiciones, parametros = [], []
+    if report_id:
+        condiciones.append("report_id = ?")
+        parametros.append(report_id)
+    if tarea:
+        condiciones.append("task_name = ?")
+        parametros.append(tarea)
+    if desde:
+        condiciones.append("fecha >= ?")
+        parametros.append(desde)
+    if hasta:
+        condiciones.append("fecha < ?")
+        parametros.append(hasta)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    conn = abrir_indice(ruta)
+    conn.row_factory = sqlite3.Row
+    try:
+        return [dict(fila) for fila in conn.execute(
+            f"SELECT * FROM reportes {where} ORDER BY fecha, task_name", parametros)]
+    finally:
+        conn.close()
+
+
+def _filtro_local(filtro):
+    """Interpreta las claves apply_overrides, min_qod y severity> de un filtro GMP."""
+    reglas = {"apply_overrides": True, "min_qod": 70, "severity": None}
+    for clave, operador, valor in re.findall(r"(\w+)(=|>)(\S+)", filtro or ""):
+        if clave == "apply_overrides" and operador == "=":
+            reglas["apply_overrides"] = valor == "1"
+        elif clave == "min_qod" and operador == "=":
+            reglas["min_qod"] = float(valor)
+        elif clave == "severity" and operador == ">":
+            reglas["severity"] = float(valor)
+    return reglas
+
+
+def _severidad(result, apply_overrides):
+    """
+    Severidad del resultado; con apply_overrides, la del override que aplica
+    gvmd. gvmd aplica uno solo y los lista por precedencia (específico del
+    resultado, de la tarea, del puerto y el más reciente): vale el primero activo.
+    """
+    severidad = result.findtext("severity") or "0"
+    if apply_overrides:
+        for override in result.iterfind("overrides/override"):
+            if override.findtext("active", "1") == "1" and override.findtext("new_severity"):
+                severidad = override.findtext("new_severity")
+                break
+    try:
+        return float(severidad)
+    except ValueError:
+        return 0.0
+
+
+def leer_archivado(entrada, filtro=FILTRO_REEXPORT, directorio=ARCHIVO_DIR, trozo=1024 * 1024):
+    """
+    Recorre el XML archivado de un reporte y acumula los resultados que pasan
+    el filtro en un ColumnasResultados (las mismas columnas que la ingesta XML).
+    """
+    reglas = _filtro_local(filtro)
+    columnas = ColumnasResultados()
+    with abrir_descompresor(os.path.join(directorio, entrada["objeto"])) as flujo:
+        for result in iter_resultados(iter(lambda: flujo.read(trozo), b"")):
+            severidad = _severidad(result, reglas["apply_overrides"])
+            try:
+                qod = float(result.findtext("qod/value") or 0)
+            except ValueError:
+                qod = 0.0
+            if qod < reglas["min_qod"]:
+                continue
+            if reglas["severity"] is not None and severidad <= reglas["severity"]:
+                continue
+            if result.find("severity") is not None:
+                result.find("severity").text = str(severidad)
+            columnas.agregar(result)
+    return columnas
+
+
+def reexportar(entradas, filtro=FILTRO_REEXPORT, destino=REEXPORT_DIR, compresion=None,
+               directorio=ARCHIVO_DIR):
+    """
+    Reconstruye un CSV por reporte archivado (columnas de ingesta_xml.COLUMNAS).
+
+    Returns:
+        list de rutas de los CSV generados
+    """
+    os.makedirs(destino, exist_ok=True)
+    ficheros = []
+    for entrada in entradas:
+        inicio = time.perf_counter()
+        df = leer_archivado(entrada, filtro, directorio).a_dataframe()
+        if str(df["IP"].dtype) == "uint32":
+            df["IP"] = [str(ipaddress.IPv4Address(int(ip))) for ip in df["IP"]]
+        ruta = ruta_csv(os.path.join(destino, f"{entrada['report_id']}.csv"), compresion)
+        escribir_csv(df[COLUMNAS], ruta)
+        ficheros.append(ruta)
+        print(f"[OK] {entrada['task_name']} ({entrada['report_id']}): {len(df)} resultados → {ruta} "
+              f"({time.perf_counter() - inicio:.1f} s)")
+    return ficheros
+
+
+def _fecha(texto):
+    return int(datetime.datetime.strptime(texto, "%Y-%m-%d").timestamp()) if texto else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archivo local de reportes de gvmd")
+    grupo = parser.add_mutually_exclusive_group(required=True)
+    grupo.add_argument("--listar", action="store_true", help="Lista los reportes archivados")
+    grupo.add_argument("--reexportar", action="store_true",
+                       help="Reconstruye los CSV desde el archivo, sin gvmd")
+    parser.add_argument("--tarea", help="Nombre de la tarea")
+    parser.add_argument("--reporte", help="ID del reporte")
+    parser.add_argument("--desde", help="Fecha inicial (AAAA-MM-DD)")
+    parser.add_argument("--hasta", help="Fecha final, excluida (AAAA-MM-DD)")
+    parser.add_argument("--filtro", default=FILTRO_REEXPORT,
+                        help=f"Filtro a aplicar al reexportar (por defecto: {FILTRO_REEXPORT})")
+    parser.add_argument("-o", "--output", default=REEXPORT_DIR, help="Directorio de los CSV reexportados")
+    parser.add_argument("--compresion", choices=["gzip", "zstd"], help="Escribe los CSV comprimidos")
+    args = parser.parse_args()
+
+    entradas = buscar(args.tarea, _fecha(args.desde), _fecha(args.hasta), args.reporte)
+    if args.listar:
+        for entrada in entradas:
+            print(f"{datetime.datetime.fromtimestamp(entrada['fecha'] or 0):%Y-%m-%d %H:%M}  "
+                  f"{entrada['report_id']}  {entrada['task_name']:<30} {entrada['resultados']:>7} resultados  "
+                  f"{entrada['bytes_comprimidos'] / 1024 / 1024:6.1f} MB  {entrada['sha256'][:12]}")
+        print(f"[INFO] {len(entradas)} reportes archivados")
+    elif not entradas:
+        print("[ERROR] No hay reportes archivados con esos criterios")
+        raise SystemExit(1)
+    else:
+        reexportar(entradas, args.filtro, args.output, args.compresion)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Bandeja de salida persistente para las subidas (SQLite).
+
+Cada fichero generado en un ciclo se encola con sus destinos (SharePoint, S3)
+antes de intentar subirlo. Un worker vacía la cola con despacho_subidas.py:
+las subidas fallidas se reintentan con espera exponencial y, como ambas son
+idempotentes (S3 omite ficheros sin cambios y SharePoint reemplaza), repetir
+una subida ya hecha no tiene efectos secundarios.
+
+La limpieza (Targets_Tasks/delete-files.py, que borra los reportes de gvmd)
+solo se ejecuta cuando todas las subidas del ciclo están confirmadas. Si S3 o
+Graph no responden un rato, ya no hay que regenerar la exportación: basta con
+que el worker vuelva a intentarlo.
+
+    python3 bandeja_subidas.py --worker       # vacía la cola (reintentos incluidos)
+    python3 bandeja_subidas.py --estado       # muestra la cola
+    python3 bandeja_subidas.py --reintentar   # vuelve a poner en cola las abandonadas
+"""
+import argparse
+import datetime
+import fcntl
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+from despacho_subidas import despachar
+from metricas import configurar as configurar_metricas, fijar, volcar as volcar_metricas
+
+BANDEJA_DB = "/opt/gvm/Reports/bandeja_subidas.db"
+BLOQUEO_WORKER = "/opt/gvm/Reports/.bandeja_worker.lock"
+# Evita que el worker y un script de reportes suban a la vez la misma fila
+BLOQUEO_PROCESO = "/opt/gvm/Reports/.bandeja_proceso.lock"
+LOG_WORKER = "/opt/gvm/Reports/bandeja_subidas.log"
+LIMPIEZA = ["python3", "/opt/gvm/Targets_Tasks/delete-files.py"]
+
+# Espera entre reintentos: 30 s, 60 s, 120 s... hasta 1 h; se abandona tras MAX_INTENTOS
+ESPERA_BASE = 30
+ESPERA_MAXIMA = 3600
+MAX_INTENTOS = 12
+
+
+def abrir_bandeja(ruta=BANDEJA_DB):
+    """Abre (y crea si no existe) la base de datos de la bandeja."""
+    conn = sqlite3.connect(ruta, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS subidas (
+            id INTEGER PRIMARY KEY,
+            ciclo TEXT NOT NULL,
+            destino TEXT NOT NULL,
+            fichero TEXT NOT NULL,
+            carpeta TEXT NOT NULL DEFAULT '',
+            estado TEXT NOT NULL DEFAULT 'pendiente',
+            intentos INTEGER NOT NULL DEFAULT 0,
+            proximo_intento REAL NOT NULL DEFAULT 0,
+            ultimo_error TEXT,
+            confirmado TEXT,
+            UNIQUE (ciclo, destino, fichero, carpeta)
+        );
+        CREATE INDEX IF NOT EXISTS idx_subidas_estado ON subidas (estado, proximo_intento);
+        CREATE TABLE IF NOT EXISTS ciclos (
+            ciclo TEXT PRIMARY KEY,
+            limpieza TEXT
+        );
+    """)
+    return conn
+
+
+def encolar(subidas, ciclo=None, ruta=BANDEJA_DB):
+    """
+    Encola las subidas de un ciclo (idempotente: volver a encolar la misma
+    subida no la duplica). Devuelve el identificador del ciclo.
+    """
+    ciclo = ciclo or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    conn = abrir_bandeja(ruta)
+    try:
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO ciclos (ciclo) VALUES (?)", (ciclo,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO subidas (ciclo, destino, fichero, carpeta) VALUES (?, ?, ?, ?)",
+                [(ciclo, s["destino"], s["fichero"], s.get("carpeta", "")) for s in subidas],
+            )
+    finally:
+        conn.close()
+    print(f"[INFO] {len(subidas)} subidas encoladas (ciclo {ciclo})")
+    return ciclo
+
+
+def _espera(intentos):
+    return min(ESPERA_BASE * 2 ** (intentos - 1), ESPERA_MAXIMA)
+
+
+def procesar(configuracion, ruta=BANDEJA_DB):
+    """
+    Intenta las subidas pendientes cuyo próximo intento ya ha llegado y
+    ejecuta la limpieza de los ciclos completos.
+
+    Returns:
+        int con el número de subidas que siguen pendientes
+    """
+    with open(BLOQUEO_PROCESO, "w") as bloqueo:
+        fcntl.flock(bloqueo, fcntl.LOCK_EX)
+        return _procesar(configuracion, ruta)
+
+
+def _procesar(configuracion, ruta):
+    conn = abrir_bandeja(ruta)
+    try:
+        filas = conn.execute("""
+            SELECT id, destino, fichero, carpeta, intentos FROM subidas
+            WHERE estado = 'pendiente' AND proximo_intento <= ?
+            ORDER BY id
+        """, (time.time(),)).fetchall()
+        if filas:
+            resultados = despachar(
+                [{"destino": destino, "fichero": fichero, "carpeta": carpeta}
+                 for _, destino, fichero, carpeta, _ in filas],
+                configuracion,
+            )
+            with conn:
+                for (id_subida, _, fichero, _, intentos), resultado in zip(filas, resultados):
+                    intentos += 1
+                    if resultado["ok"]:
+                        conn.execute("""
+                            UPDATE subidas SET estado = 'ok', intentos = ?, ultimo_error = NULL,
+                                   confirmado = ? WHERE id = ?
+                        """, (intentos, datetime.datetime.now().isoformat(timespec="seconds"), id_subida))
+                    elif intentos >= MAX_INTENTOS or not os.path.exists(fichero):
+                        conn.execute("""
+                            UPDATE subidas SET estado = 'abandonada', intentos = ?, ultimo_error = ?
+                            WHERE id = ?
+                        """, (intentos, resultado["error"], id_subida))
+                        print(f"[ERROR] Subida abandonada tras {intentos} intentos: {fichero}")
+                    else:
+                        conn.execute("""
+                            UPDATE subidas SET intentos = ?, ultimo_error = ?, proximo_intento = ?
+                            WHERE id = ?
+                        """, (intentos, resultado["error"], time.time() + _espera(intentos), id_subida))
+        _limpiar_ciclos_completos(conn)
+        pendientes = conn.execute("SELECT count(*) FROM subidas WHERE estado = 'pendiente'").fetchone()[0]
+        fijar("openvas_bandeja_pendientes", pendientes)
+        return pendientes
+    finally:
+        conn.close()
+
+
+def _limpiar_ciclos_completos(conn):
+    """Ejecuta la limpieza una vez por ciclo, solo si todas sus subidas están confirmadas."""
+    completos = [fila[0] for fila in conn.execute("""
+        SELECT c.ciclo FROM ciclos c
+        WHERE c.limpieza IS NULL
+          AND NOT EXISTS (SELECT 1 FROM subidas s WHERE s.ciclo = c.ciclo AND s.estado != 'ok')
+        ORDER BY c.ciclo
+    """)]
+    if not completos:
+        return
+    print(f"[INFO] Subidas confirmadas en todos los destinos, se ejecuta la limpieza")
+    resultado = subprocess.run(LIMPIEZA)
+    if resultado.returncode == 0:
+        with conn:
+            conn.executemany("UPDATE ciclos SET limpieza = ? WHERE ciclo = ?",
+                             [(datetime.datetime.now().isoformat(timespec="seconds"), ciclo)
+                              for ciclo in completos])
+
+
+def siguiente_intento(ruta=BANDEJA_DB):
+    """Epoch del próximo reintento pendiente (None si la cola está vacía)."""
+    conn = abrir_bandeja(ruta)
+    try:
+        return conn.execute(
+            "SELECT min(proximo_intento) FROM subidas WHERE estado = 'pendiente'"
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def worker(configuracion, ruta=BANDEJA_DB):
+    """Vacía la cola, esperando entre reintentos. Solo corre un worker a la vez."""
+    configurar_metricas(configuracion)
+    with open(BLOQUEO_WORKER, "w") as bloqueo:
+        try:
+            fcntl.flock(bloqueo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print("[INFO] Ya hay un worker de la bandeja en marcha")
+            return
+        while procesar(configuracion, ruta):
+            # El worker puede durar horas: las métricas se publican en cada pasada
+            volcar_metricas()
+            proximo = siguiente_intento(ruta)
+            if proximo is None:
+                break
+            time.sleep(max(proximo - time.time(), 1))
+    print("✓ Bandeja de subidas vacía")
+
+
+def lanzar_worker():
+    """Lanza el worker en segundo plano (sobrevive al script que lo lanza)."""
+    with open(LOG_WORKER, "a") as log:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "--worker"],
+                         stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+    print("[INFO] Quedan subidas pendientes: reintentos en segundo plano (bandeja_subidas.py --worker)")
+
+
+def enviar(subidas, configuracion, ruta=BANDEJA_DB):
+    """
+    Encola las subidas de un ciclo, hace el primer intento en el momento y,
+    si algo queda pendiente, deja los reintentos a un worker en segundo plano.
+    """
+    encolar(subidas, ruta=ruta)
+    if procesar(configuracion, ruta):
+        lanzar_worker()
+
+
+def estado(ruta=BANDEJA_DB):
+    conn = abrir_bandeja(ruta)
+    try:
+        for ciclo, destino, fichero, estado_subida, intentos, error in conn.execute("""
+            SELECT ciclo, destino, fichero, estado, intentos, ultimo_error FROM subidas
+            WHERE estado != 'ok' OR ciclo = (SELECT max(ciclo) FROM ciclos)
+            ORDER BY ciclo, id
+        """):
+            print(f"{ciclo}  {estado_subida:<10} {destino:<10} {intentos:>2}  {fichero}"
+                  + (f"  ({error})" if error else ""))
+    finally:
+        conn.close()
+
+
+def reintentar(ruta=BANDEJA_DB):
+    conn = abrir_bandeja(ruta)
+    try:
+        with conn:
+            total = conn.execute("""
+                UPDATE subidas SET estado = 'pendiente', intentos = 0, proximo_intento = 0
+                WHERE estado = 'abandonada'
+            """).rowcount
+    finally:
+        conn.close()
+    print(f"[INFO] {total} subidas abandonadas vuelven a la cola")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bandeja de salida de subidas (SharePoint / S3)")
+    parser.add_argument("-c", "--config", default="/opt/gvm/Config/config.json",
+                        help="Ruta al fichero config.json")
+    grupo = parser.add_mutually_exclusive_group(required=True)
+    grupo.add_argument("--worker", action="store_true", help="Vacía la cola con reintentos")
+    grupo.add_argument("--estado", action="store_true", help="Muestra la cola")
+    grupo.add_argument("--reintentar", action="store_true",
+                       help="Vuelve a poner en cola las subidas abandonadas")
+    args = parser.parse_args()
+
+    if args.estado:
+        estado()
+    elif args.reintentar:
+        reintentar()
+    else:
+        with open(args.config, "r", encoding="utf-8") as f:
+            worker(json.load(f))
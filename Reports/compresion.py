@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Compresión de los CSV generados (zstd o gzip) en el momento de escribirlos.
+
+La compresión se elige por destino en /opt/gvm/Config/config.json:
+
+    "compresion": {"sharepoint": "zstd", "s3": ""}
+
+- "sharepoint": CSV de Reports/exports y vulns_host (unificado, deltas,
+  normalizados), que son los que se suben a SharePoint
+- "s3": ficheros _CVE / _Misconfigs para el conector de Balbix/Valbix. No
+  consta que el conector ingiera zstd/gzip, así que van en CSV plano salvo
+  que se active explícitamente
+- un texto ("compresion": "zstd") equivale a {"sharepoint": "zstd", "s3": ""}
+
+Los ficheros se escriben directamente comprimidos (`.csv.zst` / `.csv.gz`),
+sin escribir antes el CSV plano ni hacer una segunda pasada. pandas deduce la
+compresión de la extensión al leerlos (`pd.read_csv`) y al escribir los
+ficheros derivados (deltas, normalizados).
+
+`zstandard` es opcional: si no está instalado, "zstd" usa gzip. El XLSX ya va
+comprimido (zip) y se deja tal cual.
+
+Se acumulan estadísticas del ciclo (bytes sin comprimir, comprimidos y tiempo)
+y `resumen()` informa del ratio y del tiempo de subida ahorrado.
+"""
+import gzip
+import io
+import os
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+EXTENSIONES = {"gzip": ".gz", "zstd": ".zst"}
+
+# Estadísticas del proceso: (fichero, bytes sin comprimir, bytes comprimidos, segundos)
+_estadisticas = []
+
+
+def metodo(configuracion, destino="sharepoint"):
+    """Método de compresión configurado para `destino` ('zstd', 'gzip' o None)."""
+    elegido = (configuracion or {}).get("compresion")
+    if isinstance(elegido, dict):
+        elegido = elegido.get(destino)
+    elif destino != "sharepoint":
+        elegido = None  # el texto solo aplica a SharePoint; S3 necesita activarse explícitamente
+    if not elegido:
+        return None
+    if elegido not in EXTENSIONES:
+        print(f"⚠ Compresión '{elegido}' no soportada, se escriben CSV sin comprimir")
+        return None
+    if elegido == "zstd" and zstandard is None:
+        print("⚠ zstandard no está instalado, se usa gzip")
+        return "gzip"
+    return elegido
+
+
+def ruta_csv(nombre_archivo, metodo_compresion):
+    """Añade la extensión de compresión a un `.csv` (sin cambios si no se comprime)."""
+    if not metodo_compresion:
+        return nombre_archivo
+    return nombre_archivo + EXTENSIONES[metodo_compresion]
+
+
+def ruta_plana(ruta):
+    """Quita la extensión de compresión (`.csv.zst` → `.csv`)."""
+    for extension in EXTENSIONES.values():
+        if ruta.endswith(extension):
+            return ruta[:-len(extension)]
+    return ruta
+
+
+class _Contador(io.RawIOBase):
+    """Cuenta los bytes sin comprimir que pasan hacia el compresor."""
+
+    def __init__(self, destino):
+        self.destino = destino
+        self.total = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self.total += len(datos)
+        self.destino.write(datos)
+        return len(datos)
+
+
+def abrir_compresor(ruta):
+    """Abre el stream de compresión (binario) según la extensión del fichero."""
+    if ruta.endswith(".zst"):
+        return zstandard.ZstdCompressor(level=3).stream_writer(open(ruta, "wb"), closefd=True)
+    return gzip.open(ruta, "wb", compresslevel=6)
+
+
+def abrir_descompresor(ruta):
+    """Abre para lectura (binaria) un fichero .zst o .gz, descomprimiendo al vuelo."""
+    if ruta.endswith(".zst"):
+        return zstandard.ZstdDecompressor().stream_reader(open(ruta, "rb"), closefd=True)
+    return gzip.open(ruta, "rb")
+
+
+def escribir_csv(df, ruta):
+    """
+    Escribe `df` como CSV en `ruta`. Si la ruta termina en .gz/.zst el CSV se
+    comprime mientras se escribe y se guardan las estadísticas.
+    """
+    if not ruta.endswith(tuple(EXTENSIONES.values())):
+        df.to_csv(ruta, index=False)
+        return ruta
+    inicio = time.perf_counter()
+    with abrir_compresor(ruta) as compresor:
+        contador = _Contador(compresor)
+        with io.TextIOWrapper(io.BufferedWriter(contador), encoding="utf-8", newline="") as texto:
+            df.to_csv(texto, index=False)
+        sin_comprimir = contador.total
+    _estadisticas.append((ruta, sin_comprimir, os.path.getsize(ruta), time.perf_counter() - inicio))
+    return ruta
+
+
+def escribir_texto(ruta, texto):
+    """Escribe un texto (p. ej. el CSV de gvmd ya decodificado) comprimido en `ruta`."""
+    inicio = time.perf_counter()
+    datos = texto.encode("utf-8")
+    with abrir_compresor(ruta) as compresor:
+        compresor.write(datos)
+    _estadisticas.append((ruta, len(datos), os.path.getsize(ruta), time.perf_counter() - inicio))
+    return ruta
+
+
+def resumen(mb_por_segundo=None):
+    """
+    Imprime el ratio de compresión del ciclo y, si se conoce el throughput de
+    subida (MB/s), el tiempo de transferencia ahorrado.
+    """
+    if not _estadisticas:
+        return
+    sin_comprimir = sum(fila[1] for fila in _estadisticas)
+    comprimido = sum(fila[2] for fila in _estadisticas)
+    segundos = sum(fila[3] for fila in _estadisticas)
+    ahorro_mb = (sin_comprimir - comprimido) / 1024 / 1024
+    print(f"[INFO] Compresión: {len(_estadisticas)} ficheros, "
+          f"{sin_comprimir / 1024 / 1024:.1f} MB → {comprimido / 1024 / 1024:.1f} MB "
+          f"(ratio {sin_comprimir / max(comprimido, 1):.1f}x, {segundos:.1f} s escribiendo)")
+    if mb_por_segundo:
+        print(f"[INFO] Tiempo de subida ahorrado estimado: {ahorro_mb / mb_por_segundo:.1f} s "
+              f"a {mb_por_segundo:.1f} MB/s")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Despachador de subidas: lanza a la vez las subidas a todos los destinos.
+
+Tras una exportación, get-reports-test.py sube los ficheros del ciclo a
+SharePoint (CSV/XLSX o delta) y a S3 (ficheros _CVE/_Misconfigs). En lugar de
+hacerlo en serie (la latencia total era la suma de todas las transferencias),
+cada destino tiene su propio pool de hilos con un límite de subidas
+simultáneas y todas las subidas avanzan en paralelo. El despacho termina
+cuando acaba la más lenta y devuelve un resumen con el resultado de cada una.
+
+Cada subida es un diccionario:
+
+    {"destino": "sharepoint", "fichero": "/ruta/fichero.csv", "carpeta": "Openvas_Interno"}
+    {"destino": "s3", "fichero": "/ruta/fichero_CVE.csv"}
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from metricas import incrementar, observar
+from registro import tramo
+from subida_share import get_subidor
+
+# Subidas simultáneas por destino
+LIMITES = {
+    "sharepoint": 2,
+    "s3": 4,
+}
+
+
+def _subir_sharepoint(subida, configuracion):
+    web_url = get_subidor(configuracion).subir(subida["fichero"], configuracion.get("pais"),
+                                               subida["carpeta"])
+    print(f"[OK] Archivo subido: {web_url}")
+
+
+def _subir_s3(subida, configuracion):
+    # boto3 solo se importa si hay subidas a S3
+    from subida_s3 import get_cliente, subir_fichero
+    subir_fichero(configuracion.get("s3bucket"), subida["fichero"], get_cliente(configuracion))
+
+
+# Bytes y segundos (reloj) del último despacho, para estimar el throughput
+_ultimo_despacho = {"bytes": 0, "segundos": 0.0}
+
+DESTINOS = {
+    "sharepoint": _subir_sharepoint,
+    "s3": _subir_s3,
+}
+
+
+def _ejecutar(subida, configuracion):
+    """Ejecuta una subida y devuelve su resultado (nunca lanza excepción)."""
+    resultado = dict(subida, ok=False, error=None, bytes=0)
+    inicio = time.perf_counter()
+    try:
+        resultado["bytes"] = os.path.getsize(subida["fichero"])
+        with tramo(f"subida.{subida['destino']}", fichero=os.path.basename(subida["fichero"]),
+                   bytes=resultado["bytes"]):
+            DESTINOS[subida["destino"]](subida, configuracion)
+        resultado["ok"] = True
+    except Exception as e:
+        resultado["error"] = str(e)
+        print(f"[ERROR] Fallo subida {os.path.basename(subida['fichero'])} a {subida['destino']}: {e}")
+    resultado["segundos"] = time.perf_counter() - inicio
+    destino = subida["destino"]
+    incrementar("openvas_subidas_total", destino=destino, resultado="ok" if resultado["ok"] else "error")
+    observar("openvas_subida_segundos", resultado["segundos"], destino=destino)
+    if resultado["ok"]:
+        incrementar("openvas_bytes_subidos_total", resultado["bytes"], destino=destino)
+    return resultado
+
+
+def despachar(subidas, configuracion, limites=None):
+    """
+    Ejecuta todas las subidas en paralelo, con un pool por destino.
+
+    Returns:
+        list de resultados (la subida + ok, error, bytes, segundos), en el
+        mismo orden que `subidas`
+    """
+    limites = dict(LIMITES, **(limites or {}))
+    destinos = {subida["destino"] for subida in subidas}
+    pools = {destino: ThreadPoolExecutor(max_workers=limites.get(destino, 1),
+                                         thread_name_prefix=f"subida-{destino}")
+             for destino in destinos}
+    inicio = time.perf_counter()
+    try:
+        futuros = [pools[subida["destino"]].submit(_ejecutar, subida, configuracion)
+                   for subida in subidas]
+        wait(futuros)
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+    resultados = [futuro.result() for futuro in futuros]
+    segundos = time.perf_counter() - inicio
+    _ultimo_despacho["bytes"] = sum(r["bytes"] for r in resultados if r["ok"])
+    _ultimo_despacho["segundos"] = segundos
+    imprimir_resumen(resultados, segundos)
+    return resultados
+
+
+def throughput():
+    """MB/s agregados del último despacho (None si no hubo subidas correctas)."""
+    if not _ultimo_despacho["bytes"] or not _ultimo_despacho["segundos"]:
+        return None
+    return _ultimo_despacho["bytes"] / 1024 / 1024 / _ultimo_despacho["segundos"]
+
+
+def imprimir_resumen(resultados, segundos):
+    """Resumen de las subidas: una línea por fichero y el total."""
+    print(f"[INFO] Resumen de subidas ({segundos:.1f} s en total):")
+    for resultado in resultados:
+        estado = "✓" if resultado["ok"] else "✗"
+        print(f"  {estado} {resultado['destino']:<10} {os.path.basename(resultado['fichero'])} "
+              f"({resultado['bytes'] / 1024 / 1024:.1f} MB, {resultado['segundos']:.1f} s)"
+              + (f" - {resultado['error']}" if resultado["error"] else ""))
+    correctas = sum(resultado["ok"] for resultado in resultados)
+    suma = sum(resultado["segundos"] for resultado in resultados)
+    print(f"  {correctas}/{len(resultados)} correctas; en serie habrían sido {suma:.1f} s")
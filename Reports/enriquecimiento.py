@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Enriquecimiento de hallazgos con los datos SCAP/CERT de gvmd (caché local).
+
+Cron/actualiza_gvm.sh sincroniza los feeds SCAP y CERT en gvmd; este módulo
+los usa para añadir a cada hallazgo:
+
+- cvss_vector: vector CVSS del CVE más grave del hallazgo
+- cve_publicado: fecha de publicación del CVE más antiguo
+- cert_refs: avisos CERT (CERT-Bund, DFN-CERT) que referencian sus CVE
+
+Los CVE se piden con `get_info_list` en lotes (varios CVE por filtro,
+paginados) y se guardan en una caché SQLite. Cada CVE se resuelve una vez por
+versión de los feeds: si la versión SCAP/CERT de gvmd cambia (o se ejecuta
+`--invalidar` tras la sincronización) la caché se vacía. Si gvmd no está
+accesible se usa la caché tal cual.
+
+Se activa con "enriquecimiento": true en /opt/gvm/Config/config.json.
+
+    python3 enriquecimiento.py --invalidar   # vaciar la caché (actualiza_gvm.sh)
+    python3 enriquecimiento.py CVE-2021-44228 CVE-2014-0160
+"""
+import argparse
+import json
+import sqlite3
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+from gvm.connections import TLSConnection
+from gvm.protocols.gmp import Gmp
+
+CACHE_DB = "/opt/gvm/Reports/cache_cve.db"
+
+# Feeds cuya versión invalida la caché
+FEEDS_CACHE = ("SCAP", "CERT")
+
+COLUMNAS_ENRIQUECIMIENTO = ["cvss_vector", "cve_publicado", "cert_refs"]
+
+
+def abrir_cache(ruta=CACHE_DB):
+    """Abre (y crea si no existe) la caché de CVE."""
+    conn = sqlite3.connect(ruta)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS cves (
+            cve TEXT PRIMARY KEY,
+            severidad REAL,
+            cvss_vector TEXT,
+            publicado TEXT,
+            cert_refs TEXT
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS meta (
+            clave TEXT PRIMARY KEY,
+            valor TEXT
+        );
+    """)
+    return conn
+
+
+def invalidar(ruta=CACHE_DB):
+    """Vacía la caché (se llama tras sincronizar los feeds)."""
+    conn = abrir_cache(ruta)
+    try:
+        with conn:
+            conn.execute("DELETE FROM cves")
+            conn.execute("DELETE FROM meta WHERE clave = 'version_feed'")
+    finally:
+        conn.close()
+    print("✓ Caché de CVE invalidada")
+
+
+def version_feeds(gmp):
+    """Devuelve la versión de los feeds SCAP/CERT de gvmd ('SCAP:...|CERT:...')."""
+    root = ET.fromstring(gmp.get_feeds())
+    versiones = {feed.findtext("type"): feed.findtext("version") for feed in root.iter("feed")}
+    return "|".join(f"{tipo}:{versiones.get(tipo, '')}" for tipo in FEEDS_CACHE)
+
+
+def _comprobar_version(conn, version):
+    """Vacía la caché si la versión de los feeds no es la guardada."""
+    fila = conn.execute("SELECT valor FROM meta WHERE clave = 'version_feed'").fetchone()
+    if fila and fila[0] == version:
+        return
+    with conn:
+        conn.execute("DELETE FROM cves")
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('version_feed', ?)", (version,))
+    if fila:
+        print(f"[INFO] Feeds actualizados ({version}), se renueva la caché de CVE")
+
+
+def _parsear_cve(info):
+    """Extrae (cve, severidad, cvss_vector, publicado, cert_refs) de un <info>."""
+    cve = info.find("cve")
+    if cve is None:
+        return None
+    try:
+        severidad = float(cve.findtext("severity"))
+    except (TypeError, ValueError):
+        severidad = None
+    certs = sorted({ref.findtext("name") for ref in cve.iterfind("cert/cert_ref") if ref.findtext("name")})
+    return (
+        info.findtext("name") or info.get("id"),
+        severidad,
+        cve.findtext("cvss_vector") or None,
+        (info.findtext("creation_time") or "")[:10] or None,
+        ",".join(certs) or None,
+    )
+
+
+def _consultar_lote(gmp, lote, page_size):
+    """Pide a gvmd los CVE de un lote (un filtro con 'or'), paginando."""
+    filtro = " or ".join(f"name={cve}" for cve in lote)
+    start = 1
+    filas = []
+    while True:
+        respuesta = gmp.get_info_list(
+            info_type=gmp.types.InfoType.CVE,
+            filter_string=f"{filtro} first={start} rows={page_size}",
+            details=True,
+        )
+        root = ET.fromstring(respuesta)
+        infos = root.findall("info")
+        for info in infos:
+            fila = _parsear_cve(info)
+            if fila:
+                filas.append(fila)
+        if len(infos) < page_size:
+            break
+        start += page_size
+    return filas
+
+
+def resolver(cves, connection, user, password, lote=100, ruta=CACHE_DB):
+    """
+    Devuelve {cve: (severidad, cvss_vector, publicado, cert_refs)} para los CVE
+    pedidos, consultando a gvmd solo los que no están en la caché.
+    """
+    cves = sorted({cve.strip().upper() for cve in cves if cve and cve.strip()})
+    conn = abrir_cache(ruta)
+    try:
+        try:
+            with Gmp(connection=connection) as gmp:
+                gmp.authenticate(user, password)
+                _comprobar_version(conn, version_feeds(gmp))
+                cacheados = {fila[0] for fila in conn.execute("SELECT cve FROM cves")}
+                pendientes = [cve for cve in cves if cve not in cacheados]
+                for inicio in range(0, len(pendientes), lote):
+                    grupo = pendientes[inicio:inicio + lote]
+                    filas = _consultar_lote(gmp, grupo, page_size=lote)
+                    # Los que gvmd no conoce se guardan vacíos para no repetir la consulta
+                    encontrados = {fila[0] for fila in filas}
+                    filas += [(cve, None, None, None, None) for cve in grupo if cve not in encontrados]
+                    with conn:
+                        conn.executemany("INSERT OR REPLACE INTO cves VALUES (?, ?, ?, ?, ?)", filas)
+            if pendientes:
+                print(f"✓ Caché de CVE: {len(pendientes)} CVE consultados a gvmd, "
+                      f"{len(cves) - len(pendientes)} desde caché")
+        except Exception as e:
+            print(f"⚠ No se pudo consultar SCAP/CERT en gvmd ({e}), se usa la caché local")
+
+        resultado = {}
+        for inicio in range(0, len(cves), 500):
+            grupo = cves[inicio:inicio + 500]
+            marcas = ",".join("?" * len(grupo))
+            for cve, *datos in conn.execute(f"SELECT * FROM cves WHERE cve IN ({marcas})", grupo):
+                resultado[cve] = tuple(datos)
+        return resultado
+    finally:
+        conn.close()
+
+
+def _combinar(lista_cves, datos):
+    """Columnas de enriquecimiento para una celda CVEs ('CVE-1,CVE-2')."""
+    filas = [datos[cve] for cve in (c.strip().upper() for c in str(lista_cves).split(",")) if cve in datos]
+    if not filas:
+        return None, None, None
+    mas_grave = max(filas, key=lambda fila: fila[0] if fila[0] is not None else -1)
+    fechas = [fila[2] for fila in filas if fila[2]]
+    certs = sorted({cert for fila in filas if fila[3] for cert in fila[3].split(",")})
+    return mas_grave[1], min(fechas) if fechas else None, ",".join(certs) or None
+
+
+def enriquecer(df, connection, user, password, ruta=CACHE_DB):
+    """
+    Añade cvss_vector, cve_publicado y cert_refs a un DataFrame de hallazgos.
+    Se calcula una vez por valor distinto de la columna CVEs, no por fila.
+    """
+    celdas = df["CVEs"].astype("category")
+    unicos = [str(celda) for celda in celdas.cat.categories]
+    datos = resolver((cve for celda in unicos for cve in celda.split(",")),
+                     connection, user, password, ruta=ruta)
+    # Una fila extra al final para las celdas vacías (código -1)
+    combinados = [_combinar(celda, datos) for celda in unicos] + [(None, None, None)]
+    codigos = celdas.cat.codes.to_numpy()
+    for posicion, columna in enumerate(COLUMNAS_ENRIQUECIMIENTO):
+        valores = np.array([fila[posicion] for fila in combinados], dtype=object)
+        df[columna] = valores[codigos]
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Caché de CVE para el enriquecimiento de hallazgos")
+    parser.add_argument("cves", nargs="*", help="CVE a consultar")
+    parser.add_argument("-c", "--config", default="/opt/gvm/Config/config.json",
+                        help="Ruta al fichero config.json")
+    parser.add_argument("--invalidar", action="store_true",
+                        help="Vacía la caché (tras sincronizar los feeds)")
+    args = parser.parse_args()
+
+    if args.invalidar:
+        invalidar()
+    if args.cves:
+        with open(args.config, "r", encoding="utf-8") as f:
+            configuracion = json.load(f)
+        connection = TLSConnection(hostname="127.0.0.1", port=9390)
+        datos = resolver(args.cves, connection, configuracion.get("user"), configuracion.get("password"))
+        tabla = pd.DataFrame.from_dict(datos, orient="index",
+                                       columns=["severidad", "cvss_vector", "publicado", "cert_refs"])
+        print(tabla.to_string())
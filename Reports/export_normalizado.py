@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Exportación normalizada de hallazgos: catálogo de NVT + hallazgos compactos.
+
+En el CSV unificado (y en los ficheros _CVE / _Misconfigs) el nombre, el
+Summary, la solución y los CVEs de un NVT se repiten en cada host afectado.
+En la exportación normalizada se escriben dos ficheros:
+
+- `<base>_nvt.csv`: catálogo con una fila por NVT (nvt_id, NVT Name, Summary,
+  solución y CVEs)
+- `<base>_hallazgos.csv`: los hallazgos con `nvt_id` en lugar de esas columnas
+
+El `nvt_id` se calcula a partir de todas las columnas del catálogo (nombre,
+Summary, solución y CVEs), así que es el mismo entre ciclos y dos NVT con el
+mismo nombre pero distinto contenido no se mezclan en una sola fila. Se
+activa con "export_normalizado": true en /opt/gvm/Config/config.json.
+
+Para volver a la vista plana:
+
+    python3 export_normalizado.py base_hallazgos.csv base_nvt.csv -o base.csv
+"""
+import argparse
+import hashlib
+import os
+
+import pandas as pd
+
+# Columnas que dependen solo del NVT y pasan al catálogo (las que existan)
+COLUMNAS_NVT = ["NVT Name", "Summary", "Solution", "solucion_propuesta", "CVEs"]
+
+# Orden de columnas del CSV de vulns_ip(), para reconstruir la vista plana
+ORDEN_COLUMNAS = [
+    "IP", "Hostname", "Port", "Port Protocol", "CVSS", "NVT Name", "Summary",
+    "Specific Result", "CVEs", "Solution", "sistema_operativo", "Region",
+    "Country", "Scope", "Process", "Owner", "solucion_propuesta",
+    "issue_type_severity",
+]
+
+
+# Separador de columnas en la clave del NVT (no aparece en los textos de GMP)
+SEPARADOR = "\x1f"
+
+
+def nvt_id(*valores):
+    """Identificador estable de un NVT (12 caracteres hex del SHA-1 de sus columnas de catálogo)."""
+    return _hash(SEPARADOR.join("" if pd.isna(valor) else str(valor) for valor in valores))
+
+
+def _hash(clave):
+    return hashlib.sha1(clave.encode("utf-8")).hexdigest()[:12]
+
+
+def _claves(df, columnas):
+    """Clave de texto por fila con las columnas de catálogo (vacío para NaN/None)."""
+    textos = [df[columna].astype(object).where(df[columna].notna(), "").astype(str) for columna in columnas]
+    clave = textos[0]
+    for texto in textos[1:]:
+        clave = clave + SEPARADOR + texto
+    return clave
+
+
+def normalizar(df):
+    """
+    Separa un DataFrame plano en (catalogo, hallazgos).
+
+    Returns:
+        tuple (catalogo, hallazgos): catálogo con una fila por NVT y hallazgos
+        con la columna `nvt_id` en la posición de `NVT Name`
+    """
+    columnas_nvt = [columna for columna in COLUMNAS_NVT if columna in df.columns]
+    # El id se calcula una vez por combinación distinta de columnas, no por fila
+    codigos, claves = pd.factorize(_claves(df, columnas_nvt))
+    ids = pd.Index([_hash(clave) for clave in claves])
+    ids = ids.take(codigos).values if len(codigos) else []
+
+    catalogo = df[columnas_nvt].copy()
+    catalogo.insert(0, "nvt_id", ids)
+    catalogo = catalogo.drop_duplicates("nvt_id").reset_index(drop=True)
+
+    hallazgos = df.drop(columns=columnas_nvt)
+    hallazgos.insert(list(df.columns).index("NVT Name"), "nvt_id", ids)
+    return catalogo, hallazgos
+
+
+def rehidratar(hallazgos, catalogo):
+    """Reconstruye la vista plana a partir de hallazgos + catálogo de NVT."""
+    df = hallazgos.merge(catalogo, on="nvt_id", how="left", sort=False)
+    orden = [columna for columna in ORDEN_COLUMNAS if columna in df.columns]
+    resto = [columna for columna in df.columns if columna not in orden and columna != "nvt_id"]
+    return df[orden + resto]
+
+
+def rutas_normalizadas(nombre_archivo):
+    """Rutas (hallazgos, catálogo) para un CSV plano `<base>.csv`."""
+    return (nombre_archivo.replace(".csv", "_hallazgos.csv"),
+            nombre_archivo.replace(".csv", "_nvt.csv"))
+
+
+def escribir_normalizado(df, nombre_archivo, catalogo_archivo=None):
+    """
+    Escribe la exportación normalizada junto a `nombre_archivo` (un .csv).
+
+    Args:
+        df: DataFrame plano (tipos ya serializables)
+        nombre_archivo: ruta del CSV plano equivalente
+        catalogo_archivo: si se indica, los hallazgos referencian ese catálogo
+            y no se escribe uno nuevo (p. ej. los ficheros _CVE y _Misconfigs
+            usan el catálogo del CSV unificado)
+
+    Returns:
+        list con las rutas escritas (hallazgos y, si se generó, catálogo)
+    """
+    fichero_hallazgos, fichero_catalogo = rutas_normalizadas(nombre_archivo)
+    catalogo, hallazgos = normalizar(df)
+    hallazgos.to_csv(fichero_hallazgos, index=False)
+    ficheros = [fichero_hallazgos]
+    if catalogo_archivo is None:
+        catalogo.to_csv(fichero_catalogo, index=False)
+        ficheros.append(fichero_catalogo)
+
+    if os.path.exists(nombre_archivo):
+        plano = os.path.getsize(nombre_archivo)
+        normalizado = sum(os.path.getsize(fichero) for fichero in ficheros)
+        print(f"[INFO] Exportación normalizada: {len(catalogo)} NVT, "
+              f"{plano / 1024 / 1024:.1f} MB → {normalizado / 1024 / 1024:.1f} MB")
+    return ficheros
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstruye el CSV plano de una exportación normalizada")
+    parser.add_argument("hallazgos", help="Fichero <base>_hallazgos.csv")
+    parser.add_argument("catalogo", help="Fichero <base>_nvt.csv")
+    parser.add_argument("-o", "--output", required=True, help="CSV plano de salida")
+    args = parser.parse_args()
+
+    plano = rehidratar(pd.read_csv(args.hallazgos), pd.read_csv(args.catalogo))
+    plano.to_csv(args.output, index=False)
+    print(f"[OK] {len(plano)} hallazgos escritos en {args.output}")
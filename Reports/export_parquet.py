@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Exportación columnar (Parquet) de los hallazgos.
+
+Escribe los hallazgos en un dataset Parquet particionado por fecha y país:
+
+    /opt/gvm/Reports/exports/parquet/fecha=2026-01-30/pais=COLOMBIA/hallazgos_1030_0.parquet
+
+Las columnas de texto repetitivo (NVT Name, Summary, Solution, ...) se guardan
+con codificación de diccionario. Así los consumidores pueden cargar solo las
+columnas que necesitan, por ejemplo:
+
+    pd.read_parquet(PARQUET_DIR, columns=["IP", "CVSS", "NVT Name"])
+
+pyarrow es opcional: si no está instalado se avisa y se sigue solo con CSV.
+"""
+import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+PARQUET_DIR = "/opt/gvm/Reports/exports/parquet"
+
+# Columnas con pocos valores distintos repetidos en millones de filas
+COLUMNAS_DICCIONARIO = [
+    "NVT Name", "Summary", "Solution", "solucion_propuesta", "CVEs",
+    "Hostname", "Port Protocol", "sistema_operativo",
+    "Region", "Country", "Scope", "Process", "issue_type_severity",
+]
+
+
+def exportar_parquet(df, pais, destino=PARQUET_DIR, fecha=None):
+    """
+    Escribe el DataFrame de hallazgos en el dataset Parquet particionado.
+
+    Args:
+        df: DataFrame con los hallazgos (mismas columnas que el CSV)
+        pais: País de la partición (normalmente configuracion['pais'])
+        destino: Directorio raíz del dataset
+        fecha: datetime de la exportación (por defecto, ahora)
+
+    Returns:
+        str: Directorio raíz del dataset o None si no se pudo escribir
+    """
+    if pa is None:
+        print("[WARNING] pyarrow no está instalado, se omite la exportación Parquet")
+        return None
+
+    fecha = fecha or datetime.datetime.now()
+    tabla_df = df.copy()
+    tabla_df["fecha"] = fecha.strftime("%Y-%m-%d")
+    tabla_df["pais"] = str(pais or "DESCONOCIDO")
+
+    columnas_dic = [c for c in COLUMNAS_DICCIONARIO if c in tabla_df.columns]
+    for columna in columnas_dic:
+        # Las categorías de pandas se convierten en arrays de diccionario de Arrow
+        tabla_df[columna] = tabla_df[columna].astype("category")
+
+    try:
+        tabla = pa.Table.from_pandas(tabla_df, preserve_index=False)
+        pq.write_to_dataset(
+            tabla,
+            root_path=destino,
+            partition_cols=["fecha", "pais"],
+            basename_template=f"hallazgos_{fecha:%H%M}_{{i}}.parquet",
+            use_dictionary=columnas_dic,
+            compression="zstd",
+        )
+    except Exception as e:
+        print(f"[ERROR] Fallo exportación Parquet: {e}")
+        return None
+
+    print(f"[INFO] Hallazgos exportados a Parquet en {destino} ({len(tabla_df)} filas)")
+    return destino
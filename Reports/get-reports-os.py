@@ -14,6 +14,9 @@ import base64
 import csv, json
 import os
 import datetime
+from export_parquet import exportar_parquet
+from inventario_hosts import sincronizar as sincronizar_inventario, cargar_mapa
+from perfilado import desde_argv as perfilado_desde_argv, etapa
 import subprocess
 import shutil
 import smtplib
@@ -180,52 +183,14 @@ def get_reportformat(connection, username, password):
             if name == "CSV Results":
                 return id
 
-def get_hosts(origen, destino):
+def get_hosts(connection, user, password):
     """
-    Extrae información de hosts y sistemas operativos desde PostgreSQL.
-    Intenta primero con docker exec, luego con conexión local.
+    Obtiene el inventario host/SO como diccionario {ip: sistema_operativo}.
+    Sincroniza de forma incremental el inventario local (SQLite) con gvmd y
+    lo lee; si gvmd no es accesible se usa el último inventario sincronizado.
     """
-    if os.path.exists(origen):
-        comando = f'rm -f {origen}'
-        subprocess.run(comando, shell=True)
-    if os.path.exists(destino):
-        os.remove(destino)
-    
-    # Intentar con docker exec primero (PostgreSQL dentro del contenedor)
-    comando_docker = f"""
-    docker exec openvas sudo -u postgres psql -U postgres -d gvmd -c \
-    "\\copy (SELECT DISTINCT hosts.name AS IP, oss.name AS sistema_operativo \
-    FROM host_oss \
-    JOIN hosts ON host_oss.host = hosts.id \
-    JOIN oss ON host_oss.os = oss.id) TO '/tmp/hosts.csv' WITH CSV HEADER;"
-    """
-    
-    result = subprocess.run(comando_docker, shell=True, capture_output=True, text=True)
-    
-    if result.returncode == 0:
-        # Copiar el archivo desde el contenedor
-        subprocess.run(f"docker cp openvas:/tmp/hosts.csv {destino}", shell=True)
-        print(f"✓ Información de hosts extraída exitosamente desde el contenedor")
-    else:
-        # Fallback: intentar conexión local (si PostgreSQL está disponible localmente)
-        comando_postgresql = f"""
-        sudo -u postgres -H sh -c "psql -U postgres -d gvmd -c \
-        '\\copy (SELECT DISTINCT hosts.name AS IP, oss.name AS sistema_operativo \
-        FROM host_oss \
-        JOIN hosts ON host_oss.host = hosts.id \
-        JOIN oss ON host_oss.os = oss.id) TO '{origen}' WITH CSV HEADER;'"
-        """
-        result_local = subprocess.run(comando_postgresql, shell=True, capture_output=True, text=True)
-        
-        if result_local.returncode == 0:
-            shutil.copyfile(origen, destino)
-            print(f"✓ Información de hosts extraída exitosamente desde PostgreSQL local")
-        else:
-            print(f"⚠ No se pudo extraer información de SO desde PostgreSQL")
-            print(f"  Los reportes se generarán sin información de sistema operativo")
-            # Crear archivo vacío con headers
-            with open(destino, 'w') as f:
-                f.write("ip,sistema_operativo\n")
+    sincronizar_inventario(connection, user, password, configuracion)
+    return cargar_mapa()
 
 def vulns_ip(vulns,host):
     export = '/opt/gvm/Reports/exports/vulns_host'
@@ -238,28 +203,22 @@ def vulns_ip(vulns,host):
     nombre_archivo_csv = f"{export}/{year:04d}_{month:02d}_{day:02d}_{hour:02d}_{minute:02d}.csv"
     nombre_archivo_xlsx = f"{export}/{year:04d}_{month:02d}_{day:02d}_{hour:02d}_{minute:02d}.xlsx"
     df_ips = pd.read_csv(vulns)
-    df_sistemas = pd.read_csv(host)
-    sistemas_operativos = []
-    for ip in df_ips['IP']:
-        sistema = df_sistemas[df_sistemas['ip'] == ip]['sistema_operativo'].values
-        if len(sistema) > 0:
-            sistemas_operativos.append(sistema[0])
-        else:
-            sistemas_operativos.append('No encontrado')
-    df_ips['sistema_operativo'] = sistemas_operativos
+    df_ips['sistema_operativo'] = df_ips['IP'].map(host).fillna('No encontrado')
     df_ips.to_csv(nombre_archivo_csv, index=False)
     df_ips.to_excel(nombre_archivo_xlsx, index=False)
+    exportar_parquet(df_ips, configuracion.get('pais'), fecha=now)
     return nombre_archivo_csv
 
 if __name__ == "__main__":
-    origen='/tmp/hosts.csv'
-    destino='/opt/gvm/Reports/hosts.csv'
+    perfilado_desde_argv("get-reports-os")
     configuracion = leer_configuracion()
     username = configuracion.get('user')
     password = configuracion.get('password')
     connection = connect_gvm()
-    get_hosts(origen,destino)
+    with etapa("inventario"):
+        hosts = get_hosts(connection, username, password)
     reportformat = get_reportformat(connection, username, password)
-    ready_report(connection, username, password, reportformat,destino)
+    with etapa("ready_report"):
+        ready_report(connection, username, password, reportformat,hosts)
     #email(configuracion)
     
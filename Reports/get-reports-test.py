@@ -8,6 +8,22 @@ import base64
 import csv, json
 import os, glob
 import datetime
+from export_parquet import exportar_parquet
+from ingesta_xml import leer_reporte
+from tipos_hallazgos import leer_csv, concatenar, compactar, para_serializar, ip_a_texto
+from historico import registrar_ciclo, escribir_deltas
+from indice_cve import indexar
+from enriquecimiento import enriquecer
+from subida_share import subir_fichero as subir_sharepoint
+from bandeja_subidas import enviar as enviar_bandeja
+from despacho_subidas import throughput
+from compresion import metodo as metodo_compresion, ruta_csv, ruta_plana, escribir_csv, escribir_texto, resumen as resumen_compresion
+from export_normalizado import escribir_normalizado, normalizar, rutas_normalizadas
+from inventario_hosts import sincronizar as sincronizar_inventario, cargar_mapa
+from metricas import configurar as configurar_metricas, cronometro, incrementar, fijar
+from registro import GmpRegistrado, configurar as configurar_registro, tramo
+from perfilado import desde_argv as perfilado_desde_argv, etapa as etapa_perfil
+from contextlib import contextmanager
 import subprocess
 import shutil
 import smtplib
@@ -76,6 +92,14 @@ def email(configuracion):
         # Cierra la conexión
         smtp.quit()
 
+# Etapa de la exportación: métrica de duración, tramo en el registro estructurado
+# y, con --profile, pico de memoria de la etapa
+@contextmanager
+def etapa(nombre, **campos):
+    with cronometro("openvas_exportacion_segundos", etapa=nombre), etapa_perfil(nombre), \
+            tramo(f"exportacion.{nombre}", **campos) as datos:
+        yield datos
+
 # Función para conectarse a GVM
 def connect_gvm():
     # Usar TLS en lugar de Unix Socket (compatible con Docker)
@@ -86,7 +110,11 @@ def connect_gvm():
 def ready_report(connection, user, password, reportformat, host):
     export = "/opt/gvm/Reports/exports"
     files = []
+    # "xml": resultados tipados desde el XML nativo, sin pasar por CSV Results
+    ingesta_xml = configuracion.get('ingesta', 'csv') == 'xml'
+    dataframes = []
     with Gmp(connection=connection) as gmp:
+        gmp = GmpRegistrado(gmp)
         response = gmp.get_version()
         root = ET.fromstring(response)
         status = root.get("status")
@@ -117,23 +145,35 @@ def ready_report(connection, user, password, reportformat, host):
             name = value["task_name"]
             reportFormatID = reportformat
             print("########{0}-{1}########".format(reportID, name))
-            reportscv = gmp.get_report(
-                report_id=reportID,
-                report_format_id=reportFormatID,
-                filter_string="apply_overrides=1 min_qod=70 severity>0",
-                ignore_pagination=True,
-                details=True,
-            )
-            obj = untangle.parse(reportscv)
-            resultID = obj.get_reports_response.report["id"]
-            base64CVSData = obj.get_reports_response.report.cdata
-            data = str(base64.b64decode(base64CVSData), "utf-8")
-            fichero = "{0}/{1}.csv".format(export, resultID)
+            if ingesta_xml:
+                with etapa("descarga", report_id=reportID) as datos:
+                    columnas = leer_reporte(gmp, reportID, "apply_overrides=1 min_qod=70 severity>0")
+                    datos["filas"] = len(columnas)
+                print(f"[INFO] {len(columnas)} resultados leídos en XML")
+                dataframes.append(columnas.a_dataframe())
+                continue
+            with etapa("descarga", report_id=reportID) as datos:
+                reportscv = gmp.get_report(
+                    report_id=reportID,
+                    report_format_id=reportFormatID,
+                    filter_string="apply_overrides=1 min_qod=70 severity>0",
+                    ignore_pagination=True,
+                    details=True,
+                )
+                datos["bytes"] = len(reportscv)
+            incrementar("openvas_bytes_descargados_total", len(reportscv), formato="csv")
+            with etapa("decodificacion", report_id=reportID) as datos:
+                obj = untangle.parse(reportscv)
+                resultID = obj.get_reports_response.report["id"]
+                base64CVSData = obj.get_reports_response.report.cdata
+                data = str(base64.b64decode(base64CVSData), "utf-8")
+                datos["bytes"] = len(data)
+            fichero = ruta_csv("{0}/{1}.csv".format(export, resultID), metodo_compresion(configuracion))
             if noexiste(fichero):
                 guardar(fichero, data)
                 files.append(fichero)
-        if files:
-            delete_duplicates(files, export, host)
+        if files or dataframes:
+            delete_duplicates(files, export, host, dataframes)
         else:
             print("No hay ficheros que unificar")
 
@@ -149,35 +189,54 @@ def noexiste(fichero):
 def guardar(fichero, data):
     # Crear directorio si no existe
     os.makedirs(os.path.dirname(fichero), exist_ok=True)
+    if fichero.endswith(('.gz', '.zst')):
+        escribir_texto(fichero, data)
+        return
     with open(fichero, "w") as f:
         f.write(data)
 
-def get_excluded_ips(gmp, target_id):
-    """Obtiene las IPs excluidas de un target."""
-    respuesta_target = gmp.get_target(target_id=target_id)
-    root_target = ET.fromstring(respuesta_target)
-
+def parse_excluded_ips(target_elem):
+    """Extrae las IPs excluidas de un elemento <target>."""
     exclusions = []
     for tag in ["exclude", "exclude_hosts", "hosts_excluded"]:
-        exclusions_elem = root_target.find(f".//{tag}")
+        exclusions_elem = target_elem.find(f".//{tag}")
         if exclusions_elem is not None and exclusions_elem.text:
             exclusions.extend([ip.strip() for ip in exclusions_elem.text.split(',') if ip.strip()])
     return exclusions
 
+def get_excluded_ips_by_target(gmp, page_size=1000):
+    """
+    Obtiene las IPs excluidas de todos los targets con llamadas paginadas a
+    get_targets, en lugar de un get_target por tarea.
+    Devuelve un diccionario {target_id: [ips excluidas]}.
+    """
+    exclusions_by_target = {}
+    start = 1
+    while True:
+        respuesta = gmp.get_targets(filter_string=f"first={start} rows={page_size}")
+        root = ET.fromstring(respuesta)
+        targets = root.findall("target")
+        for target_elem in targets:
+            exclusions_by_target[target_elem.get("id")] = parse_excluded_ips(target_elem)
+        if len(targets) < page_size:
+            break
+        start += page_size
+    return exclusions_by_target
+
 def load_existing_records():
-    """Carga los registros existentes del CSV."""
-    existing_records = []
+    """Carga los registros existentes del CSV como conjunto (task_name, excluded_ips)."""
+    existing_records = set()
     if os.path.exists(CSV_FILE):
         with open(CSV_FILE, 'r') as csvfile:
             reader = csv.DictReader(csvfile)
             for row in reader:
-                existing_records.append((row['task_name'], row['excluded_ips']))
+                existing_records.add((row['task_name'], row['excluded_ips']))
     return existing_records
 
 
 
 # Función para eliminar duplicados y unificar archivos
-def delete_duplicates(files, export, host):
+def delete_duplicates(files, export, host, dataframes=None):
     configuracion = leer_configuracion()
     pais =  configuracion.get("pais")
     now = datetime.datetime.now()
@@ -187,54 +246,85 @@ def delete_duplicates(files, export, host):
     hour = now.hour
     minute = now.minute
     nombre_archivo = f"{export}/{year:04d}_{month:02d}_{day:02d}_{hour:02d}_{minute:02d}.csv"
-    dataframes = []
-    for file in files:
-        dataframes.append(pd.read_csv(file))
-    columnas = ["IP", "Hostname", "Port", "Port Protocol", "CVSS", "NVT Name", "Summary", "Specific Result", "CVEs", "Solution"]
-    dataframe = pd.concat(dataframes, ignore_index=True)[columnas]
-    dataframe = dataframe.drop_duplicates()
-    dataframe.to_csv(nombre_archivo, index=False)
-    file_unif, file_excel = vulns_ip(nombre_archivo, host)
+    nombre_archivo = ruta_csv(nombre_archivo, metodo_compresion(configuracion))
+    # Representación compacta (categorías, IP entera, CVSS float32) hasta serializar
+    with etapa("unificacion", ficheros=len(files)) as datos:
+        dataframes = list(dataframes or [])
+        for file in files:
+            dataframes.append(leer_csv(file))
+        columnas = ["IP", "Hostname", "Port", "Port Protocol", "CVSS", "NVT Name", "Summary", "Specific Result", "CVEs", "Solution"]
+        dataframe = concatenar([df[columnas] for df in dataframes])
+        dataframe = dataframe.drop_duplicates()
+        escribir_csv(para_serializar(dataframe), nombre_archivo)
+        datos["filas"] = len(dataframe)
+        datos["bytes"] = os.path.getsize(nombre_archivo)
+    with etapa("vulns_ip", filas=len(dataframe)):
+        file_unif, file_excel, ficheros_delta, ficheros_normalizados = vulns_ip(dataframe, host)
     
     #solo para la externa
     #print("Lanzamos subida a balbix")
     #subprocess.run(["python3", "/opt/gvm/Reports/upload-reports.py"] + [file_unif])
     #fin externa
-    #enviamos sharepoint
-    print(f"[INFO] Subiendo {file_unif} a SharePoint...")
-    result = subprocess.run(["python3", "/opt/gvm/Reports/subida_share.py", "-f", file_unif, 
-    "-p", pais, 
-    "-a", 'Openvas_Interno'], capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"[ERROR] Fallo subida CSV: {result.stderr}")
-    else:
-        print(result.stdout)
-    
-    print(f"[INFO] Subiendo {file_excel} a SharePoint...")
-    result = subprocess.run(["python3", "/opt/gvm/Reports/subida_share.py", "-f", file_excel,  
-    "-p", pais,
-    "-a", 'Openvas_Interno'], capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"[ERROR] Fallo subida Excel: {result.stderr}")
+    #enviamos sharepoint (solo el delta del ciclo si "subida_delta" está activo)
+    if configuracion.get('subida_delta'):
+        ficheros_share = ficheros_delta
+    elif ficheros_normalizados:
+        ficheros_share = ficheros_normalizados
     else:
-        print(result.stdout)
-    separar_cve(file_unif)
+        ficheros_share = [file_unif, file_excel]
+    subidas = [{"destino": "sharepoint", "fichero": fichero, "carpeta": 'Openvas_Interno'}
+               for fichero in ficheros_share]
+    #ficheros _CVE/_Misconfigs para Valbix (S3)
+    # Si la separación falla no hay ficheros para S3, pero SharePoint se sube igualmente
+    with etapa("separar_cve"):
+        ficheros_s3 = separar_cve(file_unif, normalizado=bool(ficheros_normalizados)) or []
+    if not ficheros_s3:
+        print("[ERROR] Sin ficheros _CVE/_Misconfigs para Valbix; se suben solo los de SharePoint")
+    subidas += [{"destino": "s3", "fichero": fichero} for fichero in ficheros_s3]
+    # Bandeja de salida: primer intento en paralelo ahora, reintentos en segundo plano.
+    # delete-files.py solo se ejecuta cuando todos los destinos han confirmado
+    with etapa("subida", ficheros=len(subidas)):
+        enviar_bandeja(subidas, configuracion)
+    resumen_compresion(throughput())
 
-# Función para separar CVEs y misconfiguraciones
-def separar_cve(nombre_archivo):
+# Función para separar CVEs y misconfiguraciones (devuelve los ficheros a subir a Valbix)
+def separar_cve(nombre_archivo, normalizado=False):
     try:
-        df = pd.read_csv(nombre_archivo)
+        df = leer_csv(nombre_archivo)
         con_info = df[df['CVEs'].notnull()]
         sin_info = df[df['CVEs'].isnull()]
-        con_info.to_csv(nombre_archivo.replace('.csv', '_CVE.csv'), index=False)
-        sin_info.to_csv(nombre_archivo.replace('.csv', '_Misconfigs.csv'), index=False)
-        ficheros = [nombre_archivo.replace('.csv', '_CVE.csv'), nombre_archivo.replace('.csv', '_Misconfigs.csv')]
+        # Los ficheros de S3 llevan su propia compresión (por defecto CSV plano)
+        compresion_s3 = metodo_compresion(configuracion, "s3")
+        plano = ruta_plana(nombre_archivo)
+        fichero_cve = ruta_csv(plano.replace('.csv', '_CVE.csv'), compresion_s3)
+        fichero_misconfigs = ruta_csv(plano.replace('.csv', '_Misconfigs.csv'), compresion_s3)
+        if normalizado:
+            # Ambos ficheros referencian el catálogo de NVT del CSV unificado; si
+            # SharePoint usa otra compresión se escribe una copia con la de S3
+            catalogo = rutas_normalizadas(ruta_csv(plano, compresion_s3))[1]
+            if not os.path.exists(catalogo):
+                escribir_csv(normalizar(para_serializar(df))[0], catalogo)
+            ficheros = [catalogo]
+            for datos, fichero in ((con_info, fichero_cve), (sin_info, fichero_misconfigs)):
+                ficheros += escribir_normalizado(para_serializar(datos), fichero, catalogo_archivo=catalogo)
+        else:
+            escribir_csv(para_serializar(con_info), fichero_cve)
+            escribir_csv(para_serializar(sin_info), fichero_misconfigs)
+            ficheros = [fichero_cve, fichero_misconfigs]
+        # Índice CVE → hallazgo (incremental, en la base de datos del histórico).
+        # Un fallo del índice no debe impedir la subida de los ficheros ya escritos
+        try:
+            indexar(para_serializar(con_info))
+        except Exception as e:
+            print(f"⚠ No se pudo actualizar el índice CVE: {e}")
         print("Ya no sube a Balbix, se mantiene para la subida a Valbix")
-        subprocess.run(["python3", "/opt/gvm/Reports/upload-reports.py"] + ficheros)
+        return ficheros
     except pd.errors.ParserError as pe:
         print(f"Error de análisis al procesar el archivo CSV: {pe}")
+        return []
     except Exception as e:
         print(f"Error general al procesar el archivo CSV: {e}")
+        return []
 
 # Función para obtener el formato de reporte
 def get_reportformat(connection, username, password):
@@ -250,21 +340,14 @@ def get_reportformat(connection, username, password):
                 return id
 
 # Función para obtener los hosts
-def get_hosts(origen, destino):
-    if os.path.exists(origen):
-        comando = f'sudo rm {origen}'
-        subprocess.run(comando, shell=True)
-    if os.path.exists(destino):
-        os.remove(destino)
-    comando_postgresql = f"""
-    sudo -u postgres -H sh -c "psql -U postgres -d gvmd -c \
-    '\\copy (SELECT DISTINCT hosts.name AS IP, oss.name AS sistema_operativo \
-    FROM host_oss \
-    JOIN hosts ON host_oss.host = hosts.id \
-    JOIN oss ON host_oss.os = oss.id) TO '{origen}' WITH CSV HEADER;'"
+def get_hosts(connection, user, password):
+    """
+    Obtiene el inventario host/SO como diccionario {ip: sistema_operativo}.
+    Sincroniza de forma incremental el inventario local (SQLite) con gvmd y
+    lo lee; si gvmd no es accesible se usa el último inventario sincronizado.
     """
-    subprocess.run(comando_postgresql, shell=True)
-    shutil.copyfile(origen, destino)
+    sincronizar_inventario(connection, user, password, configuracion)
+    return cargar_mapa()
 
 # Función para cargar rangos de IP y países desde un archivo CSV
 def cargar_rangos_ip(archivo):
@@ -288,22 +371,17 @@ def consultar_pais(ip, rangos_ip):
 
 # Función para determinar la severidad basada en el CVSS
 def determinar_severidad(cvss):
-    try:
-        cvss = float(cvss)
-        if cvss >= 9:
-            return 'Critical'
-        elif cvss >= 7:
-            return 'High'
-        elif cvss >= 4:
-            return 'Medium'
-        elif cvss >= 1:
-            return 'Low'
-        else:
-            return 'Info'
-    except ValueError:
-        return 'Info'
+    """
+    Clasifica una columna completa de CVSS por tramos:
+    Critical >= 9, High >= 7, Medium >= 4, Low >= 1 y el resto Info.
+    Los valores no numéricos se clasifican como Info.
+    """
+    cvss = pd.to_numeric(cvss, errors='coerce')
+    severidad = pd.cut(cvss, bins=[float('-inf'), 1, 4, 7, 9, float('inf')], right=False,
+                       labels=['Info', 'Low', 'Medium', 'High', 'Critical'])
+    return severidad.fillna('Info')
 
-def vulns_ip(vulns, host):
+def vulns_ip(df_ips, host):
     export = '/opt/gvm/Reports/exports/vulns_host'
     # Crear directorio si no existe
     os.makedirs(export, exist_ok=True)
@@ -316,13 +394,9 @@ def vulns_ip(vulns, host):
     minute = now.minute
     nombre_archivo_csv = f"{export}/{year:04d}_{month:02d}_{day:02d}_{hour:02d}_{minute:02d}.csv"
     nombre_archivo_xlsx = f"{export}/{year:04d}_{month:02d}_{day:02d}_{hour:02d}_{minute:02d}.xlsx"
-    df_ips = pd.read_csv(vulns)
-    df_sistemas = pd.read_csv(host)
-    sistemas_operativos = []
+    # Con "compresion" el CSV se escribe ya comprimido (.csv.zst / .csv.gz)
+    nombre_archivo_csv = ruta_csv(nombre_archivo_csv, metodo_compresion(configuracion))
     #rangos_ip = cargar_rangos_ip('/opt/gvm/Targets_Tasks/openvas_externa.csv')  # Cambia esta ruta al archivo CSV con los rangos de IP y países
-    paises = []
-    severidades = []
-    regiones = []
     pais_region_map = {
             'COLOMBIA': 'SUR',
             'PERU': 'SUR',
@@ -338,32 +412,37 @@ def vulns_ip(vulns, host):
             'INTERFILE': 'BRASIL',
             'BRASIL': 'BRASIL'
         }
-    for ip, cvss in zip(df_ips['IP'], df_ips['CVSS']):
-        sistema = df_sistemas[df_sistemas['ip'] == ip]['sistema_operativo'].values
-        if len(sistema) > 0:
-            sistemas_operativos.append(sistema[0])
-        else:
-            sistemas_operativos.append('No encontrado')
-        #pais = consultar_pais(ip, rangos_ip)
-        #pais = pais.strip()
-        pais = configuracion.get('pais')
-        paises.append(pais)
-        severidad = determinar_severidad(cvss)
-        severidades.append(severidad)
-        regiones.append(pais_region_map[pais.upper()])
-    
-    df_ips['sistema_operativo'] = sistemas_operativos
-    df_ips['Region'] = configuracion.get('region')
-    df_ips['Country'] = configuracion.get('pais')
+    # Columnas derivadas calculadas sobre la columna completa (sin bucle por fila)
+    pais = configuracion.get('pais')
+    region = configuracion.get('region') or pais_region_map.get(str(pais).upper())
+    ips = ip_a_texto(df_ips['IP'])
+    #paises = ips.map({ip: consultar_pais(ip, rangos_ip) for ip in ips.unique()})
+    # El inventario está indexado por IP en texto
+    df_ips['sistema_operativo'] = ips.map(host).fillna('No encontrado').values
+    df_ips['Region'] = region
+    df_ips['Country'] = pais
     df_ips['Scope'] = configuracion.get('scope')
     df_ips['Process'] = 'redteam-scan'
     df_ips['Owner'] = ''
     df_ips['solucion_propuesta'] = df_ips['Solution']
-    df_ips['issue_type_severity'] = severidades
-    df_ips = df_ips.drop(columns=['Solution'])
-    df_ips.to_csv(nombre_archivo_csv, index=False)
-    df_ips.to_excel(nombre_archivo_xlsx, index=False)
-    return nombre_archivo_csv,nombre_archivo_xlsx
+    df_ips['issue_type_severity'] = determinar_severidad(df_ips['CVSS']).values
+    # Vector CVSS, fecha de publicación y avisos CERT desde la caché SCAP/CERT de gvmd
+    if configuracion.get('enriquecimiento'):
+        df_ips = enriquecer(df_ips, connect_gvm(), configuracion.get('user'), configuracion.get('password'))
+    df_ips = compactar(df_ips.drop(columns=['Solution']))
+    # Solo aquí se vuelve a los tipos del CSV (IP en texto, CVSS con un decimal)
+    salida = para_serializar(df_ips)
+    escribir_csv(salida, nombre_archivo_csv)
+    salida.to_excel(nombre_archivo_xlsx, index=False)
+    exportar_parquet(salida, configuracion.get('pais'), fecha=now)
+    # Histórico de hallazgos: delta nuevos/corregidos/persistentes respecto al ciclo anterior
+    delta = registrar_ciclo(salida, fecha=now)
+    ficheros_delta = escribir_deltas(salida, delta, nombre_archivo_csv)
+    # Exportación normalizada: catálogo de NVT + hallazgos con nvt_id
+    ficheros_normalizados = []
+    if configuracion.get('export_normalizado'):
+        ficheros_normalizados = escribir_normalizado(salida, nombre_archivo_csv)
+    return nombre_archivo_csv, nombre_archivo_xlsx, ficheros_delta, ficheros_normalizados
 
 def get_tasks_and_exclusions(connection, user, password, pais):
     """Obtiene las tareas y extrae las IPs excluidas de sus targets asociados."""
@@ -377,16 +456,18 @@ def get_tasks_and_exclusions(connection, user, password, pais):
         respuesta = gmp.get_tasks(filter_string='rows=-1')
         root = ET.fromstring(respuesta)
 
+        # Obtener las exclusiones de todos los targets en bloque
+        exclusions_by_target = get_excluded_ips_by_target(gmp)
+
         # Preparar nuevos registros
         new_records = []
         for task_elem in root.findall(".//task"):
             name = task_elem.findtext("name")
             
-            # Obtener target asociado
+            # Cruzar con el target asociado en memoria
             target_elem = task_elem.find(".//target")
             if target_elem is not None:
-                target_id = target_elem.get("id")
-                excluded_ips = get_excluded_ips(gmp, target_id)
+                excluded_ips = exclusions_by_target.get(target_elem.get("id"), [])
             else:
                 excluded_ips = []
 
@@ -395,6 +476,7 @@ def get_tasks_and_exclusions(connection, user, password, pais):
                 ips_str = ', '.join(sorted(excluded_ips))  # Ordenamos para consistencia
                 # Comprobar si ya existe este registro
                 if (name, ips_str) not in existing_records:
+                    existing_records.add((name, ips_str))
                     new_records.append({
                         'task_name': name,
                         'excluded_ips': ips_str,
@@ -416,13 +498,7 @@ def get_tasks_and_exclusions(connection, user, password, pais):
                 writer.writerows(new_records)
                 
         print(f"[INFO] Subiendo {CSV_FILE} a SharePoint...")
-        result = subprocess.run(["python3", "/opt/gvm/Reports/subida_share.py", "-f", CSV_FILE, 
-        "-p", pais, 
-        "-a", 'Targets_Export'], capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"[ERROR] Fallo subida exclusion.csv: {result.stderr}")
-        else:
-            print(result.stdout)
+        subir_sharepoint(CSV_FILE, pais, 'Targets_Export', leer_configuracion())
     
     # Exportar y subir targets actuales a SharePoint
     print(f"[INFO] Exportando targets actuales...")
@@ -436,25 +512,29 @@ def get_tasks_and_exclusions(connection, user, password, pais):
         print(f"[ERROR] Fallo export de targets: {result.stderr}")
 
 if __name__ == "__main__":
+    perfilado_desde_argv("get-reports-test")
     dir_csv = '/opt/gvm/Reports/exports/'
-    csv_files = glob.glob(os.path.join(dir_csv, '*.csv'))
+    csv_files = glob.glob(os.path.join(dir_csv, '*.csv*'))
     for csv_file in csv_files:
         try:
             os.remove(csv_file)
             print(f'Se ha borrado el archivo: {csv_file}')
         except OSError as e:
             print(f'Error al borrar el archivo {csv_file}: {e.strerror}')
-    origen = '/tmp/hosts.csv'
-    destino = '/opt/gvm/Reports/hosts.csv'
     configuracion = leer_configuracion()
+    configurar_metricas(configuracion)
+    configurar_registro(configuracion=configuracion, eco=False)
+    fijar("openvas_ultima_ejecucion_timestamp", datetime.datetime.now().timestamp(), script="get-reports-test")
     username = configuracion.get('user')
     password = configuracion.get('password')
     pais = configuracion.get('pais')
     connection = connect_gvm()
-    get_hosts(origen, destino)
-    get_tasks_and_exclusions(connection, username, password, pais)
+    with etapa_perfil("inventario"):
+        hosts = get_hosts(connection, username, password)
+    with etapa_perfil("exclusiones"):
+        get_tasks_and_exclusions(connection, username, password, pais)
     reportformat = get_reportformat(connection, username, password)
-    ready_report(connection, username, password, reportformat, destino)
+    ready_report(connection, username, password, reportformat, hosts)
     #email(configuracion)
     print("finalizado")
 
@@ -14,6 +14,9 @@ import base64
 import csv, json
 import os, glob
 import datetime
+from export_parquet import exportar_parquet
+from inventario_hosts import sincronizar as sincronizar_inventario, cargar_mapa
+from perfilado import iniciar as iniciar_perfilado, etapa
 import subprocess
 import shutil
 import smtplib
@@ -26,6 +29,8 @@ import argparse
 
 parser = argparse.ArgumentParser(description="Para extraer un solo reporte")
 parser.add_argument("name", type=str, help="Pasa el ID de la task o el nombre completo ")
+parser.add_argument("--profile", action="store_true",
+                    help="Perfila la ejecución (cProfile + tracemalloc) y guarda el perfil junto a las exportaciones")
 
 # Función para leer la configuración
 def leer_configuracion():
@@ -215,52 +220,14 @@ def get_reportformat(connection, username, password):
                 return id
 
 # Función para obtener los hosts
-def get_hosts(origen, destino):
+def get_hosts(connection, user, password):
     """
-    Extrae información de hosts y sistemas operativos desde PostgreSQL.
-    Intenta primero con docker exec, luego con conexión local.
+    Obtiene el inventario host/SO como diccionario {ip: sistema_operativo}.
+    Sincroniza de forma incremental el inventario local (SQLite) con gvmd y
+    lo lee; si gvmd no es accesible se usa el último inventario sincronizado.
     """
-    if os.path.exists(origen):
-        comando = f'rm -f {origen}'
-        subprocess.run(comando, shell=True)
-    if os.path.exists(destino):
-        os.remove(destino)
-    
-    # Intentar con docker exec primero (PostgreSQL dentro del contenedor)
-    comando_docker = f"""
-    docker exec openvas sudo -u postgres psql -U postgres -d gvmd -c \
-    "\\copy (SELECT DISTINCT hosts.name AS IP, oss.name AS sistema_operativo \
-    FROM host_oss \
-    JOIN hosts ON host_oss.host = hosts.id \
-    JOIN oss ON host_oss.os = oss.id) TO '/tmp/hosts.csv' WITH CSV HEADER;"
-    """
-    
-    result = subprocess.run(comando_docker, shell=True, capture_output=True, text=True)
-    
-    if result.returncode == 0:
-        # Copiar el archivo desde el contenedor
-        subprocess.run(f"docker cp openvas:/tmp/hosts.csv {destino}", shell=True)
-        print(f"✓ Información de hosts extraída exitosamente desde el contenedor")
-    else:
-        # Fallback: intentar conexión local (si PostgreSQL está disponible localmente)
-        comando_postgresql = f"""
-        sudo -u postgres -H sh -c "psql -U postgres -d gvmd -c \
-        '\\copy (SELECT DISTINCT hosts.name AS IP, oss.name AS sistema_operativo \
-        FROM host_oss \
-        JOIN hosts ON host_oss.host = hosts.id \
-        JOIN oss ON host_oss.os = oss.id) TO '{origen}' WITH CSV HEADER;'"
-        """
-        result_local = subprocess.run(comando_postgresql, shell=True, capture_output=True, text=True)
-        
-        if result_local.returncode == 0:
-            shutil.copyfile(origen, destino)
-            print(f"✓ Información de hosts extraída exitosamente desde PostgreSQL local")
-        else:
-            print(f"⚠ No se pudo extraer información de SO desde PostgreSQL")
-            print(f"  Los reportes se generarán sin información de sistema operativo")
-            # Crear archivo vacío con headers
-            with open(destino, 'w') as f:
-                f.write("ip,sistema_operativo\n")
+    sincronizar_inventario(connection, user, password, configuracion)
+    return cargar_mapa()
 
 # Función para cargar rangos de IP y países desde un archivo CSV
 def cargar_rangos_ip(archivo):
@@ -284,20 +251,15 @@ def consultar_pais(ip, rangos_ip):
 
 # Función para determinar la severidad basada en el CVSS
 def determinar_severidad(cvss):
-    try:
-        cvss = float(cvss)
-        if cvss >= 9:
-            return 'Critical'
-        elif cvss >= 7:
-            return 'High'
-        elif cvss >= 4:
-            return 'Medium'
-        elif cvss >= 1:
-            return 'Low'
-        else:
-            return 'Info'
-    except ValueError:
-        return 'Info'
+    """
+    Clasifica una columna completa de CVSS por tramos:
+    Critical >= 9, High >= 7, Medium >= 4, Low >= 1 y el resto Info.
+    Los valores no numéricos se clasifican como Info.
+    """
+    cvss = pd.to_numeric(cvss, errors='coerce')
+    severidad = pd.cut(cvss, bins=[float('-inf'), 1, 4, 7, 9, float('inf')], right=False,
+                       labels=['Info', 'Low', 'Medium', 'High', 'Critical'])
+    return severidad.fillna('Info')
 
 def vulns_ip(vulns, host):
     export = '/opt/gvm/Reports/exports/vulns_host'
@@ -310,12 +272,7 @@ def vulns_ip(vulns, host):
     nombre_archivo_csv = f"{export}/{year:04d}_{month:02d}_{day:02d}_{hour:02d}_{minute:02d}.csv"
     nombre_archivo_xlsx = f"{export}/{year:04d}_{month:02d}_{day:02d}_{hour:02d}_{minute:02d}.xlsx"
     df_ips = pd.read_csv(vulns)
-    df_sistemas = pd.read_csv(host)
-    sistemas_operativos = []
     #rangos_ip = cargar_rangos_ip('/opt/gvm/Targets_Tasks/openvas_externa.csv')  # Cambia esta ruta al archivo CSV con los rangos de IP y países
-    paises = []
-    severidades = []
-    regiones = []
     #esto es para la externa
     pais_region_map = {
             'COLOMBIA': 'SUR',
@@ -333,35 +290,28 @@ def vulns_ip(vulns, host):
             'BRASIL': 'BRASIL'
         }
     #fin de regiones de la externa
-    for ip, cvss in zip(df_ips['IP'], df_ips['CVSS']):
-        sistema = df_sistemas[df_sistemas['ip'] == ip]['sistema_operativo'].values
-        if len(sistema) > 0:
-            sistemas_operativos.append(sistema[0])
-        else:
-            sistemas_operativos.append('No encontrado')
-        #pais = consultar_pais(ip, rangos_ip)
-        #pais = pais.strip()
-        pais = configuracion.get('pais')
-        paises.append(pais)
-        severidad = determinar_severidad(cvss)
-        severidades.append(severidad)
-        regiones.append(pais_region_map[pais.upper()])
-    
-    df_ips['sistema_operativo'] = sistemas_operativos
-    df_ips['Region'] = configuracion.get('region')
-    df_ips['Country'] = configuracion.get('pais')
+    # Columnas derivadas calculadas sobre la columna completa (sin bucle por fila)
+    pais = configuracion.get('pais')
+    region = configuracion.get('region') or pais_region_map.get(str(pais).upper())
+    #paises = df_ips['IP'].map({ip: consultar_pais(ip, rangos_ip) for ip in df_ips['IP'].unique()})
+    df_ips['sistema_operativo'] = df_ips['IP'].map(host).fillna('No encontrado')
+    df_ips['Region'] = region
+    df_ips['Country'] = pais
     df_ips['Scope'] = configuracion.get('scope')
     df_ips['Process'] = 'redteam-scan'
     df_ips['Owner'] = ''
     df_ips['solucion_propuesta'] = df_ips['Solution']
-    df_ips['issue_type_severity'] = severidades
+    df_ips['issue_type_severity'] = determinar_severidad(df_ips['CVSS'])
     df_ips = df_ips.drop(columns=['Solution'])
     df_ips.to_csv(nombre_archivo_csv, index=False)
     df_ips.to_excel(nombre_archivo_xlsx, index=False)
+    exportar_parquet(df_ips, configuracion.get('pais'), fecha=now)
     return nombre_archivo_csv
 
 if __name__ == "__main__":
     args = parser.parse_args()
+    if args.profile:
+        iniciar_perfilado("get-reports-unico")
     dir_csv = '/opt/gvm/Reports/exports/'
     csv_files = glob.glob(os.path.join(dir_csv, '*.csv'))
     for csv_file in csv_files:
@@ -370,14 +320,14 @@ if __name__ == "__main__":
             print(f'Se ha borrado el archivo: {csv_file}')
         except OSError as e:
             print(f'Error al borrar el archivo {csv_file}: {e.strerror}')
-    origen = '/tmp/hosts.csv'
-    destino = '/opt/gvm/Reports/hosts.csv'
     configuracion = leer_configuracion()
     username = configuracion.get('user')
     password = configuracion.get('password')
     connection = connect_gvm()
-    get_hosts(origen, destino)
+    with etapa("inventario"):
+        hosts = get_hosts(connection, username, password)
     reportformat = get_reportformat(connection, username, password)
-    ready_report(connection, username, password, reportformat, destino, args.name)
+    with etapa("ready_report"):
+        ready_report(connection, username, password, reportformat, hosts, args.name)
     print("Finalizado, informe en /opt/gvm/Reports/exports/vulns_host")
     #email(configuracion)
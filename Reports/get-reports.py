@@ -14,6 +14,7 @@ import base64
 import csv, json
 from os import path
 import datetime
+from perfilado import desde_argv as perfilado_desde_argv, etapa
 
 def get_pass():
     password = getpass.getpass(prompt="Enter password: ")
@@ -138,7 +139,9 @@ def get_reportformat(connection, username, password):
 if __name__ == "__main__":
     username = "admin"
     password = get_pass()
+    perfilado_desde_argv("get-reports")
     connection = connect_gvm()
     reportformat = get_reportformat(connection, username, password)
-    ready_report(connection, username, password, reportformat)
+    with etapa("ready_report"):
+        ready_report(connection, username, password, reportformat)
     
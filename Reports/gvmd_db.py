@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Acceso directo a la base de datos de gvmd (PostgreSQL).
+
+Sustituye al `docker exec ... psql \\copy` + `docker cp` que usaban los
+scripts de reportes para obtener el inventario host/SO:
+
+- Conexión con pool (psycopg2) reutilizada durante todo el proceso
+- La consulta host/SO se lee con un cursor de servidor, en lotes, y se
+  entrega directamente a la fase de enriquecimiento (sin ficheros intermedios)
+- Solo se leen los hosts cuyo SO cambió desde una marca de agua (watermark),
+  ver inventario_hosts.py
+- Si la base de datos no es accesible (o psycopg2 no está instalado) se usa
+  la API de assets de GMP (`get_hosts`) como alternativa
+
+Los parámetros de conexión se leen de la clave opcional "gvmd_db" de
+/opt/gvm/Config/config.json, por ejemplo:
+
+    "gvmd_db": {"host": "127.0.0.1", "port": 5432, "user": "gvm", "password": ""}
+"""
+import datetime
+import time
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+
+try:
+    import psycopg2
+    from psycopg2 import pool as pg_pool
+except ImportError:
+    psycopg2 = None
+    pg_pool = None
+
+DB_DEFAULTS = {
+    "host": "/var/run/postgresql",
+    "port": 5432,
+    "dbname": "gvmd",
+    "user": "gvm",
+    "connect_timeout": 5,
+}
+
+# modification_time de host_oss cambia cuando gvmd (re)detecta el SO de un host
+CONSULTA_HOSTS_OS = """
+    SELECT hosts.name AS ip, oss.name AS sistema_operativo,
+           max(host_oss.modification_time) AS modification_time
+    FROM host_oss
+    JOIN hosts ON host_oss.host = hosts.id
+    JOIN oss ON host_oss.os = oss.id
+    WHERE host_oss.modification_time > %s
+    GROUP BY hosts.name, oss.name
+"""
+
+_pool = None
+
+
+def parametros_db(configuracion=None):
+    """Combina los valores por defecto con la clave 'gvmd_db' del config."""
+    parametros = dict(DB_DEFAULTS)
+    if configuracion:
+        parametros.update(configuracion.get("gvmd_db") or {})
+    return parametros
+
+
+def get_pool(configuracion=None, maxconn=4):
+    """Devuelve el pool de conexiones del proceso, creándolo la primera vez."""
+    global _pool
+    if psycopg2 is None:
+        raise RuntimeError("psycopg2 no está instalado")
+    if _pool is None:
+        _pool = pg_pool.ThreadedConnectionPool(1, maxconn, **parametros_db(configuracion))
+    return _pool
+
+
+def cerrar_pool():
+    """Cierra todas las conexiones del pool."""
+    global _pool
+    if _pool is not None:
+        _pool.closeall()
+        _pool = None
+
+
+@contextmanager
+def conexion(configuracion=None):
+    """Presta una conexión del pool y la devuelve al terminar."""
+    pool = get_pool(configuracion)
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        # Solo lectura: se descarta cualquier transacción abierta
+        conn.rollback()
+        pool.putconn(conn)
+
+
+def iter_hosts_os_db(configuracion=None, desde=0, lote=5000):
+    """
+    Recorre las tuplas (ip, sistema_operativo, modification_time) de gvmd con
+    un cursor de servidor, solo las modificadas después de `desde` (epoch).
+
+    Las filas llegan en bloques de `lote`, sin cargar el resultado completo.
+    """
+    with conexion(configuracion) as conn:
+        with conn.cursor(name="hosts_os") as cur:
+            cur.itersize = lote
+            cur.execute(CONSULTA_HOSTS_OS, (desde,))
+            for ip, sistema, modificado in cur:
+                yield ip, sistema, int(modificado or 0)
+
+
+def iter_hosts_os_gmp(gmp, desde=0, page_size=1000):
+    """
+    Recorre las tuplas (ip, sistema_operativo, modification_time) usando la API
+    de assets de GMP, solo los hosts modificados después de `desde` (epoch).
+
+    Usa el detalle `best_os_cpe` de cada host, que es el mismo CPE que guarda
+    la tabla `oss` de gvmd.
+    """
+    filtro = ""
+    if desde:
+        filtro = time.strftime("modified>%Y-%m-%dT%H:%M:%S ", time.gmtime(desde))
+    start = 1
+    while True:
+        respuesta = gmp.get_hosts(filter_string=f"{filtro}first={start} rows={page_size}", details=True)
+        root = ET.fromstring(respuesta)
+        assets = root.findall("asset")
+        for asset in assets:
+            ip = asset.findtext("name")
+            modificado = _epoch(asset.findtext("modification_time"))
+            sistema = None
+            for detail in asset.findall("host/detail"):
+                if detail.findtext("name") == "best_os_cpe":
+                    sistema = detail.findtext("value")
+                    break
+            if ip and sistema and modificado > desde:
+                yield ip, sistema, modificado
+        if len(assets) < page_size:
+            break
+        start += page_size
+
+
+def _epoch(fecha_iso):
+    """Convierte una fecha ISO 8601 de GMP (2026-01-30T10:00:00Z) a epoch."""
+    if not fecha_iso:
+        return 0
+    try:
+        fecha = datetime.datetime.fromisoformat(fecha_iso.replace("Z", "+00:00"))
+        return int(fecha.timestamp())
+    except ValueError:
+        return 0
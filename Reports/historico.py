@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Histórico de hallazgos entre ciclos (SQLite) y cálculo de deltas.
+
+Cada hallazgo se identifica por una huella estable de (IP, Port, Port Protocol,
+NVT Name) y guarda first_seen / last_seen. En cada ciclo completo se calcula:
+
+- nuevos: hallazgos que no estaban abiertos en el ciclo anterior
+- corregidos: hallazgos abiertos que ya no aparecen
+- persistentes: hallazgos que siguen apareciendo
+
+y se escriben como ficheros `<base>_nuevos.csv`, `<base>_corregidos.csv` y
+`<base>_persistentes.csv` junto al CSV unificado.
+
+La tabla `apariciones` guarda el CVSS de cada hallazgo en cada ciclo, con
+índices por IP y NVT para consultar tendencias:
+
+    python3 historico.py --host 10.0.0.1
+    python3 historico.py --nvt "SSL/TLS: Deprecated TLSv1.0 and TLSv1.1 Protocol Detection"
+
+Solo debe alimentarse con exportaciones completas (get-reports-test.py): con un
+reporte parcial todo lo que no aparece se marcaría como corregido.
+"""
+import argparse
+import datetime
+import hashlib
+import sqlite3
+
+import pandas as pd
+
+HISTORICO_DB = "/opt/gvm/Reports/historico_hallazgos.db"
+
+COLUMNAS_HUELLA = ["IP", "Port", "Port Protocol", "NVT Name"]
+
+
+def abrir_historico(ruta=HISTORICO_DB):
+    """Abre (y crea si no existe) la base de datos del histórico."""
+    conn = sqlite3.connect(ruta)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS hallazgos (
+            huella TEXT PRIMARY KEY,
+            ip TEXT NOT NULL,
+            port TEXT,
+            protocolo TEXT,
+            nvt TEXT,
+            cvss REAL,
+            first_seen TEXT NOT NULL,
+            last_seen TEXT NOT NULL,
+            fixed_at TEXT,
+            estado TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_hallazgos_ip ON hallazgos (ip);
+        CREATE INDEX IF NOT EXISTS idx_hallazgos_nvt ON hallazgos (nvt);
+        CREATE INDEX IF NOT EXISTS idx_hallazgos_estado ON hallazgos (estado);
+        CREATE TABLE IF NOT EXISTS apariciones (
+            huella TEXT NOT NULL,
+            ciclo TEXT NOT NULL,
+            cvss REAL,
+            PRIMARY KEY (huella, ciclo)
+        );
+        CREATE INDEX IF NOT EXISTS idx_apariciones_ciclo ON apariciones (ciclo);
+        CREATE TABLE IF NOT EXISTS ciclos (
+            ciclo TEXT PRIMARY KEY,
+            nuevos INTEGER,
+            corregidos INTEGER,
+            persistentes INTEGER
+        );
+    """)
+    return conn
+
+
+def _texto(valor):
+    """Normaliza un valor para la huella (NaN y floats enteros de pandas)."""
+    if pd.isna(valor):
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor).strip()
+
+
+def calcular_huellas(df):
+    """Devuelve una Serie con la huella SHA-1 de (IP, Port, Port Protocol, NVT Name)."""
+    claves = zip(*(df[columna].map(_texto) for columna in COLUMNAS_HUELLA))
+    return pd.Series(
+        [hashlib.sha1("|".join(clave).encode("utf-8")).hexdigest() for clave in claves],
+        index=df.index,
+    )
+
+
+def registrar_ciclo(df, fecha=None, ruta=HISTORICO_DB):
+    """
+    Registra los hallazgos de un ciclo completo y calcula el delta.
+
+    Args:
+        df: DataFrame de hallazgos (columnas IP, Port, Port Protocol, NVT Name, CVSS)
+        fecha: datetime del ciclo (por defecto, ahora)
+
+    Returns:
+        dict con 'huellas' (Serie alineada con df), 'nuevos' y 'persistentes'
+        (conjuntos de huellas) y 'corregidos' (DataFrame desde el histórico)
+    """
+    ciclo = (fecha or datetime.datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+    huellas = calcular_huellas(df)
+    actual = pd.DataFrame({
+        "huella": huellas,
+        "ip": df["IP"].map(_texto),
+        "port": df["Port"].map(_texto),
+        "protocolo": df["Port Protocol"].map(_texto),
+        "nvt": df["NVT Name"].map(_texto),
+        "cvss": pd.to_numeric(df["CVSS"], errors="coerce"),
+    })
+    # Un hallazgo puede venir repetido con distinto "Specific Result"
+    actual = actual.sort_values("cvss", ascending=False).drop_duplicates("huella")
+
+    conn = abrir_historico(ruta)
+    try:
+        with conn:
+            conn.execute("""
+                CREATE TEMP TABLE ciclo_actual (
+                    huella TEXT PRIMARY KEY, ip TEXT, port TEXT,
+                    protocolo TEXT, nvt TEXT, cvss REAL)
+            """)
+            conn.executemany(
+                "INSERT INTO ciclo_actual VALUES (?, ?, ?, ?, ?, ?)",
+                (tuple(None if pd.isna(v) else v for v in fila)
+                 for fila in actual.itertuples(index=False)),
+            )
+            nuevos = {fila[0] for fila in conn.execute("""
+                SELECT c.huella FROM ciclo_actual c
+                LEFT JOIN hallazgos h ON h.huella = c.huella
+                WHERE h.huella IS NULL OR h.estado != 'abierto'
+            """)}
+            corregidos = pd.read_sql_query("""
+                SELECT ip AS "IP", port AS "Port", protocolo AS "Port Protocol",
+                       nvt AS "NVT Name", cvss AS "CVSS", first_seen, last_seen
+                FROM hallazgos
+                WHERE estado = 'abierto'
+                  AND huella NOT IN (SELECT huella FROM ciclo_actual)
+            """, conn)
+            persistentes = set(actual["huella"]) - nuevos
+
+            conn.execute("""
+                INSERT INTO hallazgos (huella, ip, port, protocolo, nvt, cvss,
+                                       first_seen, last_seen, fixed_at, estado)
+                SELECT huella, ip, port, protocolo, nvt, cvss, ?, ?, NULL, 'abierto'
+                FROM ciclo_actual WHERE true
+                ON CONFLICT (huella) DO UPDATE SET
+                    cvss = excluded.cvss,
+                    last_seen = excluded.last_seen,
+                    fixed_at = NULL,
+                    estado = 'abierto'
+            """, (ciclo, ciclo))
+            conn.execute("""
+                UPDATE hallazgos SET estado = 'corregido', fixed_at = ?
+                WHERE estado = 'abierto'
+                  AND huella NOT IN (SELECT huella FROM ciclo_actual)
+            """, (ciclo,))
+            conn.execute("""
+                INSERT OR REPLACE INTO apariciones (huella, ciclo, cvss)
+                SELECT huella, ?, cvss FROM ciclo_actual
+            """, (ciclo,))
+            conn.execute(
+                "INSERT OR REPLACE INTO ciclos VALUES (?, ?, ?, ?)",
+                (ciclo, len(nuevos), len(corregidos), len(persistentes)),
+            )
+            conn.execute("DROP TABLE ciclo_actual")
+    finally:
+        conn.close()
+
+    print(f"[INFO] Delta del ciclo: {len(nuevos)} nuevos, "
+          f"{len(corregidos)} corregidos, {len(persistentes)} persistentes")
+    return {
+        "huellas": huellas,
+        "nuevos": nuevos,
+        "corregidos": corregidos,
+        "persistentes": persistentes,
+    }
+
+
+def escribir_deltas(df, delta, nombre_archivo):
+    """
+    Escribe los ficheros de delta junto a `nombre_archivo` (un .csv).
+    Nuevos y persistentes conservan todas las columnas de `df`.
+
+    Returns:
+        list con las rutas [nuevos, corregidos, persistentes]
+    """
+    huellas = delta["huellas"]
+    ficheros = []
+    for sufijo, datos in (
+        ("nuevos", df[huellas.isin(delta["nuevos"])]),
+        ("corregidos", delta["corregidos"]),
+        ("persistentes", df[huellas.isin(delta["persistentes"])]),
+    ):
+        fichero = nombre_archivo.replace(".csv", f"_{sufijo}.csv")
+        datos.to_csv(fichero, index=False)
+        ficheros.append(fichero)
+    return ficheros
+
+
+def tendencia(host=None, nvt=None, ruta=HISTORICO_DB):
+    """Hallazgos y CVSS máximo por ciclo para una IP y/o un NVT."""
+    condiciones, parametros = [], []
+    if host:
+        condiciones.append("h.ip = ?")
+        parametros.append(host)
+    if nvt:
+        condiciones.append("h.nvt = ?")
+        parametros.append(nvt)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    conn = abrir_historico(ruta)
+    try:
+        return pd.read_sql_query(f"""
+            SELECT a.ciclo, count(*) AS hallazgos, max(a.cvss) AS cvss_max
+            FROM apariciones a
+            JOIN hallazgos h ON h.huella = a.huella
+            {where}
+            GROUP BY a.ciclo
+            ORDER BY a.ciclo
+        """, conn, params=parametros)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consulta la tendencia de hallazgos por host o NVT")
+    parser.add_argument("--host", help="IP del host")
+    parser.add_argument("--nvt", help="Nombre del NVT")
+    args = parser.parse_args()
+    print(tendencia(args.host, args.nvt).to_string(index=False))
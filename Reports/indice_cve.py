@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Índice CVE → hallazgo (SQLite) construido a partir de separar_cve().
+
+La columna `CVEs` de gvmd es una lista separada por comas; en el índice se
+guarda una fila por (CVE, hallazgo), con la IP, el NVT, el CVSS y la
+severidad, e índices por CVE, host y severidad. Los hallazgos se identifican
+con la misma huella que el histórico (historico.py) y la tabla vive en la
+misma base de datos, así que cada entrada puede cruzarse con su estado
+(abierto/corregido).
+
+Se actualiza de forma incremental en cada ciclo: solo se insertan o actualizan
+los hallazgos del reporte recibido.
+
+    python3 indice_cve.py --cve CVE-2021-44228
+    python3 indice_cve.py --host 10.0.0.1 --severidad Critical --abiertos
+"""
+import argparse
+import datetime
+
+import pandas as pd
+
+from historico import HISTORICO_DB, abrir_historico, calcular_huellas, _texto
+
+
+def abrir_indice(ruta=HISTORICO_DB):
+    """Abre la base de datos del histórico y crea la tabla del índice si no existe."""
+    conn = abrir_historico(ruta)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS cve_hallazgos (
+            cve TEXT NOT NULL,
+            huella TEXT NOT NULL,
+            ip TEXT NOT NULL,
+            nvt TEXT,
+            cvss REAL,
+            severidad TEXT,
+            last_seen TEXT NOT NULL,
+            PRIMARY KEY (cve, huella)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_cve_ip ON cve_hallazgos (ip, cve);
+        CREATE INDEX IF NOT EXISTS idx_cve_severidad ON cve_hallazgos (severidad, cve);
+        CREATE INDEX IF NOT EXISTS idx_cve_huella ON cve_hallazgos (huella);
+    """)
+    return conn
+
+
+def explotar_cves(df):
+    """
+    Devuelve un DataFrame con una fila por (CVE, hallazgo) a partir de la
+    columna `CVEs` ("CVE-2021-1,CVE-2021-2").
+    """
+    con_cve = df[df["CVEs"].notnull()]
+    filas = pd.DataFrame({
+        "huella": calcular_huellas(con_cve),
+        "ip": con_cve["IP"].map(_texto),
+        "nvt": con_cve["NVT Name"].map(_texto),
+        "cvss": pd.to_numeric(con_cve["CVSS"], errors="coerce"),
+        "severidad": (con_cve["issue_type_severity"].astype(object)
+                      if "issue_type_severity" in con_cve else None),
+        "cve": con_cve["CVEs"].astype(str).str.split(","),
+    })
+    filas = filas.explode("cve")
+    filas["cve"] = filas["cve"].str.strip().str.upper()
+    filas = filas[filas["cve"] != ""]
+    return filas.drop_duplicates(["cve", "huella"])
+
+
+def indexar(df, fecha=None, ruta=HISTORICO_DB):
+    """
+    Añade al índice los CVE de los hallazgos de `df` (inserta los nuevos y
+    actualiza CVSS, severidad y last_seen de los existentes).
+
+    Returns:
+        int con el número de entradas (CVE, hallazgo) procesadas
+    """
+    ciclo = (fecha or datetime.datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+    filas = explotar_cves(df)
+    conn = abrir_indice(ruta)
+    try:
+        with conn:
+            conn.executemany("""
+                INSERT INTO cve_hallazgos (cve, huella, ip, nvt, cvss, severidad, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (cve, huella) DO UPDATE SET
+                    cvss = excluded.cvss,
+                    severidad = excluded.severidad,
+                    last_seen = excluded.last_seen
+            """, (
+                (cve, huella, ip, nvt, None if pd.isna(cvss) else float(cvss),
+                 None if pd.isna(severidad) else severidad, ciclo)
+                for cve, huella, ip, nvt, cvss, severidad in filas[
+                    ["cve", "huella", "ip", "nvt", "cvss", "severidad"]
+                ].itertuples(index=False)
+            ))
+    finally:
+        conn.close()
+    print(f"[INFO] Índice CVE actualizado: {len(filas)} entradas, {filas['cve'].nunique()} CVE")
+    return len(filas)
+
+
+def consultar(cve=None, host=None, severidad=None, abiertos=False, ruta=HISTORICO_DB):
+    """Hallazgos del índice filtrados por CVE, host y/o severidad."""
+    condiciones, parametros = [], []
+    if cve:
+        condiciones.append("c.cve = ?")
+        parametros.append(cve.strip().upper())
+    if host:
+        condiciones.append("c.ip = ?")
+        parametros.append(host)
+    if severidad:
+        condiciones.append("c.severidad = ?")
+        parametros.append(severidad)
+    if abiertos:
+        condiciones.append("h.estado = 'abierto'")
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    conn = abrir_indice(ruta)
+    try:
+        return pd.read_sql_query(f"""
+            SELECT c.cve, c.ip, c.nvt, c.cvss, c.severidad, c.last_seen, h.estado
+            FROM cve_hallazgos c
+            LEFT JOIN hallazgos h ON h.huella = c.huella
+            {where}
+            ORDER BY c.cve, c.ip
+        """, conn, params=parametros)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consulta el índice CVE → hallazgo")
+    parser.add_argument("--cve", help="Identificador CVE (CVE-2021-44228)")
+    parser.add_argument("--host", help="IP del host")
+    parser.add_argument("--severidad", choices=["Critical", "High", "Medium", "Low", "Info"],
+                        help="Severidad del hallazgo")
+    parser.add_argument("--abiertos", action="store_true",
+                        help="Solo hallazgos abiertos según el histórico")
+    args = parser.parse_args()
+    print(consultar(args.cve, args.host, args.severidad, args.abiertos).to_string(index=False))
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Ingesta tipada de resultados desde el XML nativo de GMP.
+
+Alternativa al flujo "CSV Results": en lugar de pedir a gvmd que genere un
+CSV en base64, decodificarlo, guardarlo y volver a parsearlo con pandas, se
+piden los resultados del reporte en XML, paginados y con los filtros aplicados
+en el servidor, y se extraen solo las diez columnas que usan los scripts.
+
+El XML se recorre con un parser incremental (XMLPullParser): cada <result> se
+convierte a columnas y se descarta, sin construir el árbol completo. Las
+columnas se acumulan en arrays tipados:
+
+- IP como entero (uint32) mientras todas las direcciones sean IPv4
+- CVSS como float32 (NaN si falta) y Port como entero (-1 cuando el puerto
+  es "general")
+- Columnas de texto codificadas como diccionario (códigos + valores únicos)
+
+Se activa con "ingesta": "xml" en /opt/gvm/Config/config.json.
+"""
+import ipaddress
+import xml.etree.ElementTree as ET
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from tipos_hallazgos import COLUMNAS_CATEGORIA
+
+FILTRO_RESULTADOS = "apply_overrides=1 min_qod=70 severity>0"
+
+COLUMNAS = ["IP", "Hostname", "Port", "Port Protocol", "CVSS", "NVT Name",
+            "Summary", "Specific Result", "CVEs", "Solution"]
+COLUMNAS_TEXTO = ["Hostname", "Port Protocol", "NVT Name", "Summary",
+                  "Specific Result", "CVEs", "Solution"]
+
+
+class _Diccionario:
+    """Columna de texto codificada como diccionario (valores únicos + códigos)."""
+
+    def __init__(self):
+        self.valores = []
+        self.indice = {}
+        self.codigos = array("i")
+
+    def append(self, valor):
+        if not valor:
+            self.codigos.append(-1)
+            return
+        codigo = self.indice.get(valor)
+        if codigo is None:
+            codigo = len(self.valores)
+            self.indice[valor] = codigo
+            self.valores.append(valor)
+        self.codigos.append(codigo)
+
+    def a_categorical(self):
+        return pd.Categorical.from_codes(np.frombuffer(self.codigos, dtype=np.int32),
+                                         categories=self.valores)
+
+
+class ColumnasResultados:
+    """Acumulador columnar de los resultados de uno o varios reportes."""
+
+    def __init__(self):
+        self.ip = array("I")
+        self.ip_texto = _Diccionario()
+        self.solo_ipv4 = True
+        self.port = array("i")
+        self.cvss = array("f")
+        self.texto = {columna: _Diccionario() for columna in COLUMNAS_TEXTO}
+
+    def __len__(self):
+        return len(self.cvss)
+
+    def agregar(self, result):
+        """Extrae las columnas de un elemento <result> de GMP."""
+        host = result.find("host")
+        ip = (host.text or "").strip() if host is not None else ""
+        self.ip_texto.append(ip)
+        try:
+            direccion = ipaddress.ip_address(ip)
+        except ValueError:
+            direccion = None
+        if direccion is not None and direccion.version == 4:
+            self.ip.append(int(direccion))
+        else:
+            self.solo_ipv4 = False
+            self.ip.append(0)
+
+        puerto, _, protocolo = (result.findtext("port") or "").partition("/")
+        self.port.append(int(puerto) if puerto.isdigit() else -1)
+
+        try:
+            self.cvss.append(float(result.findtext("severity")))
+        except (TypeError, ValueError):
+            self.cvss.append(float("nan"))  # como la celda vacía del CSV
+
+        nvt = result.find("nvt")
+        tags = _parse_tags(nvt.findtext("tags") if nvt is not None else None)
+        solucion = nvt.findtext("solution") if nvt is not None else None
+        cves = []
+        if nvt is not None:
+            cves = [ref.get("id") for ref in nvt.iterfind("refs/ref") if ref.get("type") == "cve"]
+
+        self.texto["Hostname"].append(host.findtext("hostname") if host is not None else None)
+        self.texto["Port Protocol"].append(protocolo)
+        self.texto["NVT Name"].append(nvt.findtext("name") if nvt is not None else None)
+        self.texto["Summary"].append(tags.get("summary"))
+        self.texto["Specific Result"].append(result.findtext("description"))
+        self.texto["CVEs"].append(",".join(cves))
+        self.texto["Solution"].append(solucion or tags.get("solution"))
+
+    def a_dataframe(self):
+        """
+        Construye el DataFrame compacto: IP uint32 (si todas son IPv4),
+        CVSS float32, Port Int32 y columnas de texto como categorías, con
+        los mismos tipos que leer_csv (Specific Result queda como texto).
+        """
+        df = pd.DataFrame({
+            "IP": (np.frombuffer(self.ip, dtype=np.uint32) if self.solo_ipv4
+                   else self.ip_texto.a_categorical()),
+            "Port": pd.array(np.frombuffer(self.port, dtype=np.int32), dtype="Int32"),
+            "CVSS": np.frombuffer(self.cvss, dtype=np.float32),
+        })
+        df.loc[df["Port"] < 0, "Port"] = pd.NA
+        for columna, diccionario in self.texto.items():
+            valores = diccionario.a_categorical()
+            df[columna] = valores if columna in COLUMNAS_CATEGORIA else valores.astype(object)
+        return df[COLUMNAS]
+
+
+def _parse_tags(tags):
+    """Convierte 'summary=...|insight=...|solution=...' en diccionario."""
+    resultado = {}
+    if not tags:
+        return resultado
+    for parte in tags.split("|"):
+        clave, sep, valor = parte.partition("=")
+        if sep:
+            resultado[clave] = valor
+    return resultado
+
+
+def iter_resultados(trozos):
+    """
+    Recorre con un parser incremental el XML que llega en `trozos` (str o
+    bytes) y devuelve uno a uno los <result> de report/results. Cada elemento
+    se vacía en cuanto el consumidor pide el siguiente.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    pila = []
+    for datos in trozos:
+        parser.feed(datos)
+        for evento, elem in parser.read_events():
+            if evento == "start":
+                pila.append(elem.tag)
+                continue
+            pila.pop()
+            # Solo los <result> hijos directos de <results> (no los de notas/overrides)
+            if elem.tag == "result" and pila and pila[-1] == "results":
+                yield elem
+                elem.clear()
+            elif elem.tag == "results":
+                elem.clear()
+    parser.close()
+
+
+def _parsear_pagina(respuesta, columnas, trozo=65536):
+    """
+    Recorre una respuesta get_reports con un parser incremental y agrega los
+    <result> de report/results. Devuelve cuántos resultados tenía la página.
+    """
+    total = 0
+    trozos = (respuesta[inicio:inicio + trozo] for inicio in range(0, len(respuesta), trozo))
+    for result in iter_resultados(trozos):
+        columnas.agregar(result)
+        total += 1
+    return total
+
+
+def leer_reporte(gmp, report_id, filtro=FILTRO_RESULTADOS, page_size=1000, columnas=None):
+    """
+    Descarga los resultados de un reporte en XML nativo, paginados y con el
+    filtro aplicado en gvmd, y los acumula en `columnas`.
+
+    Returns:
+        ColumnasResultados con los resultados (el recibido o uno nuevo)
+    """
+    columnas = columnas if columnas is not None else ColumnasResultados()
+    start = 1
+    while True:
+        respuesta = gmp.get_report(
+            report_id=report_id,
+            filter_string=f"{filtro} first={start} rows={page_size}",
+            ignore_pagination=False,
+            details=True,
+        )
+        if isinstance(respuesta, bytes):
+            respuesta = respuesta.decode("utf-8")
+        recibidos = _parsear_pagina(respuesta, columnas)
+        if recibidos < page_size:
+            break
+        start += page_size
+    return columnas
+
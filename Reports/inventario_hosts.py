@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Inventario local host/SO (SQLite) con sincronización incremental.
+
+En lugar de volver a exportar en cada ejecución todos los pares host/SO que
+gvmd ha visto alguna vez, se guarda una copia local indexada por IP y solo se
+traen los hosts cuyo SO cambió desde la última sincronización (marca de agua
+sobre `host_oss.modification_time`).
+
+Los scripts get-reports-*.py leen el SO de este inventario. Si gvmd no está
+accesible se sigue usando el último inventario sincronizado.
+
+Uso manual:
+    python3 inventario_hosts.py            # sincronización incremental
+    python3 inventario_hosts.py --completo # vuelve a traer todo el inventario
+"""
+import argparse
+import json
+import sqlite3
+
+from gvm.connections import TLSConnection
+from gvm.protocols.gmp import Gmp
+
+from gvmd_db import iter_hosts_os_db, iter_hosts_os_gmp
+
+INVENTARIO_DB = "/opt/gvm/Reports/inventario_hosts.db"
+
+
+def abrir_inventario(ruta=INVENTARIO_DB):
+    """Abre (y crea si no existe) la base de datos del inventario."""
+    conn = sqlite3.connect(ruta)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS hosts_os (
+            ip TEXT NOT NULL,
+            sistema_operativo TEXT NOT NULL,
+            modification_time INTEGER NOT NULL,
+            PRIMARY KEY (ip, sistema_operativo)
+        );
+        CREATE INDEX IF NOT EXISTS idx_hosts_os_ip
+            ON hosts_os (ip, modification_time);
+        CREATE TABLE IF NOT EXISTS sincronizacion (
+            clave TEXT PRIMARY KEY,
+            watermark INTEGER NOT NULL
+        );
+    """)
+    return conn
+
+
+def leer_watermark(conn):
+    fila = conn.execute(
+        "SELECT watermark FROM sincronizacion WHERE clave = 'hosts_os'"
+    ).fetchone()
+    return fila[0] if fila else 0
+
+
+def _aplicar_cambios(conn, filas, desde):
+    """
+    Inserta/actualiza las filas recibidas y avanza la marca de agua.
+    Todo en una transacción: si la lectura falla a medias no se guarda nada.
+    """
+    watermark = desde
+    total = 0
+    with conn:
+        for ip, sistema, modificado in filas:
+            conn.execute(
+                "INSERT INTO hosts_os (ip, sistema_operativo, modification_time) "
+                "VALUES (?, ?, ?) "
+                "ON CONFLICT (ip, sistema_operativo) "
+                "DO UPDATE SET modification_time = excluded.modification_time",
+                (ip, sistema, modificado),
+            )
+            watermark = max(watermark, modificado)
+            total += 1
+        conn.execute(
+            "INSERT OR REPLACE INTO sincronizacion (clave, watermark) VALUES ('hosts_os', ?)",
+            (watermark,),
+        )
+    return total
+
+
+def sincronizar(connection, user, password, configuracion=None, ruta=INVENTARIO_DB, completo=False):
+    """
+    Trae de gvmd los hosts cuyo SO cambió desde la última sincronización.
+
+    Usa PostgreSQL de gvmd y, si no es accesible, la API de assets de GMP.
+    Devuelve el número de filas actualizadas (0 si no se pudo sincronizar).
+    """
+    conn = abrir_inventario(ruta)
+    try:
+        desde = 0 if completo else leer_watermark(conn)
+        try:
+            total = _aplicar_cambios(conn, iter_hosts_os_db(configuracion, desde), desde)
+            print(f"✓ Inventario de hosts sincronizado desde PostgreSQL ({total} cambios)")
+            return total
+        except Exception as e:
+            print(f"⚠ No se pudo consultar PostgreSQL de gvmd ({e}), se usa la API de GMP")
+
+        try:
+            with Gmp(connection=connection) as gmp:
+                gmp.authenticate(user, password)
+                total = _aplicar_cambios(conn, iter_hosts_os_gmp(gmp, desde), desde)
+            print(f"✓ Inventario de hosts sincronizado desde GMP ({total} cambios)")
+            return total
+        except Exception as e:
+            print(f"⚠ No se pudo sincronizar el inventario de hosts: {e}")
+            print(f"  Se usa el último inventario local disponible")
+            return 0
+    finally:
+        conn.close()
+
+
+def cargar_mapa(ruta=INVENTARIO_DB):
+    """
+    Devuelve el inventario como diccionario {ip: sistema_operativo}.
+    Si una IP tiene varios SO se queda con la detección más reciente.
+    """
+    conn = abrir_inventario(ruta)
+    try:
+        filas = conn.execute(
+            "SELECT ip, sistema_operativo FROM hosts_os ORDER BY ip, modification_time"
+        )
+        return {ip: sistema for ip, sistema in filas}
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sincroniza el inventario local host/SO de gvmd")
+    parser.add_argument("-c", "--config", default="/opt/gvm/Config/config.json",
+                        help="Ruta al fichero config.json")
+    parser.add_argument("--completo", action="store_true",
+                        help="Ignora la marca de agua y vuelve a traer todo el inventario")
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        configuracion = json.load(f)
+    connection = TLSConnection(hostname="127.0.0.1", port=9390)
+    sincronizar(connection, configuracion.get("user"), configuracion.get("password"),
+                configuracion, completo=args.completo)
+    print(f"[OK] {len(cargar_mapa())} hosts en {INVENTARIO_DB}")
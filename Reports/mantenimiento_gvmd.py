@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Mantenimiento de la base de datos de gvmd tras borrados masivos de reportes.
+
+Cada ciclo borra cientos de reportes (delete-files.py y el reseteo de tareas
+interrumpidas de run-task.py) y las tablas de PostgreSQL de gvmd se quedan
+infladas: `get_tasks`/`get_reports` van siendo más lentos mes a mes.
+
+Los borrados se acumulan en un contador; cuando superan "min_borrados" y no
+hay tareas en ejecución, se ejecuta el mantenimiento:
+
+- `gvmd --optimize=<modo>` para cada modo configurado (por defecto vacuum y
+  analyze), dentro del contenedor si se indica "contenedor" (docker exec) o
+  en local con `sudo -u gvm`
+- o bien, con "metodo": "sql", `VACUUM ANALYZE` directo en PostgreSQL
+- mientras dura se crea /opt/gvm/.maintenance.lock y run-task.py no lanza
+  tareas nuevas (código 3); si el proceso que lo creó ya no existe o el lock
+  supera el timeout (SIGKILL, OOM, reinicio del contenedor) se considera
+  obsoleto y se elimina (`lock_activo`)
+- se mide la latencia de varias consultas GMP antes y después, y el
+  resultado se guarda en Reports/mantenimiento_gvmd.jsonl
+
+Configuración opcional en /opt/gvm/Config/config.json:
+
+    "mantenimiento_gvmd": {"contenedor": "openvas", "metodo": "gvmd",
+                           "modos": ["vacuum", "analyze"], "min_borrados": 50}
+
+    python3 mantenimiento_gvmd.py --forzar      # ejecuta ya (si no hay tareas activas)
+    python3 mantenimiento_gvmd.py --historial   # efecto de los mantenimientos anteriores
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import time
+import xml.etree.ElementTree as ET
+
+from retencion_reportes import conectar
+
+MANTENIMIENTO_DEFECTO = {
+    "contenedor": "",
+    "metodo": "gvmd",
+    "modos": ["vacuum", "analyze"],
+    "min_borrados": 50,
+    "timeout": 7200,
+}
+
+PENDIENTE = "/opt/gvm/Reports/.mantenimiento_pendiente.json"
+HISTORIAL = "/opt/gvm/Reports/mantenimiento_gvmd.jsonl"
+LOCK_MANTENIMIENTO = "/opt/gvm/.maintenance.lock"
+
+# Consultas GMP cuya latencia se mide antes y después
+CONSULTAS = {
+    "get_tasks": lambda gmp: gmp.get_tasks(filter_string="rows=100"),
+    "get_reports": lambda gmp: gmp.get_reports(filter_string="rows=100", details=False),
+    "get_results": lambda gmp: gmp.get_results(filter_string="rows=100"),
+}
+
+
+def reglas_mantenimiento(configuracion):
+    reglas = dict(MANTENIMIENTO_DEFECTO)
+    reglas.update((configuracion or {}).get("mantenimiento_gvmd") or {})
+    return reglas
+
+
+def _leer_pendiente():
+    try:
+        with open(PENDIENTE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"borrados": 0, "desde": None}
+
+
+def registrar_borrados(borrados):
+    """Suma `borrados` al contador de reportes borrados desde el último mantenimiento."""
+    pendiente = _leer_pendiente()
+    if borrados:
+        pendiente["borrados"] += borrados
+        pendiente["desde"] = pendiente["desde"] or datetime.datetime.now().isoformat(timespec="seconds")
+        with open(PENDIENTE, "w") as f:
+            json.dump(pendiente, f)
+    return pendiente["borrados"]
+
+
+def tareas_activas(gmp):
+    respuesta = gmp.get_tasks(filter_string='status="Running" status="Requested" status="Queued"')
+    return len(ET.fromstring(respuesta).findall("task"))
+
+
+def medir_latencia(gmp, repeticiones=3):
+    """Mediana (ms) de cada consulta de CONSULTAS."""
+    latencias = {}
+    for nombre, consulta in CONSULTAS.items():
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            consulta(gmp)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        latencias[nombre] = round(statistics.median(tiempos), 1)
+    return latencias
+
+
+def comandos(reglas):
+    """Comandos a ejecutar según el método y los modos configurados."""
+    contenedor = reglas["contenedor"]
+    if reglas["metodo"] == "sql":
+        if not contenedor:
+            return []  # se ejecuta con gvmd_db, ver _vacuum_sql()
+        return [["docker", "exec", "-u", "postgres", contenedor,
+                 "psql", "-d", "gvmd", "-c", "VACUUM ANALYZE"]]
+    prefijo = ["docker", "exec", "-u", "gvm", contenedor] if contenedor else ["sudo", "-u", "gvm"]
+    return [prefijo + ["gvmd", f"--optimize={modo}"] for modo in reglas["modos"]]
+
+
+def _vacuum_sql(configuracion):
+    """VACUUM ANALYZE con la conexión directa de gvmd_db.py (fuera de transacción)."""
+    from gvmd_db import conexion
+    with conexion(configuracion) as conn:
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("VACUUM ANALYZE")
+        finally:
+            conn.autocommit = False
+
+
+def _pid_vivo(pid):
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # existe, pero es de otro usuario
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def lock_activo(configuracion=None):
+    """
+    True si hay un mantenimiento en curso. Un lock obsoleto (su pid ya no
+    existe o es más antiguo que el timeout de todos los modos) se elimina y
+    se devuelve False, para que run-task.py no quede bloqueado para siempre.
+    """
+    reglas = reglas_mantenimiento(configuracion)
+    try:
+        with open(LOCK_MANTENIMIENTO, "r") as f:
+            datos = json.load(f)
+    except FileNotFoundError:
+        return False
+    except (json.JSONDecodeError, OSError):
+        datos = {}
+    try:
+        inicio = datetime.datetime.fromisoformat(datos["timestamp"])
+    except (KeyError, TypeError, ValueError):
+        try:
+            inicio = datetime.datetime.fromtimestamp(os.path.getmtime(LOCK_MANTENIMIENTO))
+        except FileNotFoundError:
+            return False
+    limite = reglas["timeout"] * max(1, len(reglas["modos"]))
+    edad = (datetime.datetime.now() - inicio).total_seconds()
+    if edad > limite:
+        motivo = f"creado hace {edad / 3600:.1f} h, más que el timeout de {limite / 3600:.1f} h"
+    elif datos.get("pid") is not None and not _pid_vivo(datos["pid"]):
+        motivo = f"el proceso {datos['pid']} ya no existe"
+    else:
+        return True
+    print(f"⚠ Lock de mantenimiento obsoleto ({motivo}), se elimina {LOCK_MANTENIMIENTO}")
+    try:
+        os.remove(LOCK_MANTENIMIENTO)
+    except FileNotFoundError:
+        pass
+    return False
+
+
+def _ejecutar(configuracion, reglas):
+    """Ejecuta el mantenimiento con el lock de mantenimiento creado."""
+    with open(LOCK_MANTENIMIENTO, "w") as f:
+        json.dump({"timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+                   "pid": os.getpid(), "status": "running"}, f)
+    try:
+        lista = comandos(reglas)
+        if not lista:
+            print("[INFO] VACUUM ANALYZE en la BD de gvmd")
+            _vacuum_sql(configuracion)
+        for comando in lista:
+            print(f"[INFO] {' '.join(comando)}")
+            resultado = subprocess.run(comando, capture_output=True, text=True, timeout=reglas["timeout"])
+            if resultado.returncode != 0:
+                raise RuntimeError(f"{' '.join(comando)}: {resultado.stderr.strip() or resultado.returncode}")
+    finally:
+        os.remove(LOCK_MANTENIMIENTO)
+
+
+def mantener(configuracion, borrados=0, forzar=False):
+    """
+    Registra `borrados` y, si se alcanza "min_borrados" (o `forzar`) y no hay
+    tareas activas, ejecuta el mantenimiento midiendo la latencia GMP.
+
+    Returns:
+        dict con el registro del mantenimiento, o None si no se ejecutó
+    """
+    reglas = reglas_mantenimiento(configuracion)
+    acumulados = registrar_borrados(borrados)
+    if not forzar and acumulados < reglas["min_borrados"]:
+        if borrados:
+            print(f"[INFO] {acumulados} reportes borrados desde el último mantenimiento de gvmd "
+                  f"(se ejecuta a partir de {reglas['min_borrados']})")
+        return None
+
+    user, password = configuracion.get("user"), configuracion.get("password")
+    gmp = conectar(user, password)
+    try:
+        activas = tareas_activas(gmp)
+        if activas:
+            print(f"[INFO] Mantenimiento de gvmd aplazado: {activas} tareas en ejecución")
+            return None
+        antes = medir_latencia(gmp)
+    finally:
+        gmp.disconnect()
+
+    print(f"[INFO] Mantenimiento de gvmd tras {acumulados} reportes borrados")
+    inicio = time.perf_counter()
+    registro = {"fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+                "borrados": acumulados, "metodo": reglas["metodo"], "modos": reglas["modos"],
+                "antes_ms": antes, "despues_ms": None, "segundos": None, "error": None}
+    try:
+        _ejecutar(configuracion, reglas)
+    except Exception as e:
+        registro["error"] = str(e)
+        print(f"[ERROR] Fallo en el mantenimiento de gvmd: {e}")
+    registro["segundos"] = round(time.perf_counter() - inicio, 1)
+
+    gmp = conectar(user, password)
+    try:
+        registro["despues_ms"] = medir_latencia(gmp)
+    finally:
+        gmp.disconnect()
+
+    with open(HISTORIAL, "a") as f:
+        f.write(json.dumps(registro) + "\n")
+    if registro["error"] is None and os.path.exists(PENDIENTE):
+        os.remove(PENDIENTE)
+    imprimir_registro(registro)
+    return registro
+
+
+def imprimir_registro(registro):
+    estado = "✓" if registro["error"] is None else "⚠"
+    print(f"{estado} {registro['fecha']}  {registro['borrados']} borrados, "
+          f"{registro['metodo']} {','.join(registro['modos'])}, {registro['segundos']} s"
+          + (f"  ({registro['error']})" if registro["error"] else ""))
+    for consulta, antes in registro["antes_ms"].items():
+        despues = (registro["despues_ms"] or {}).get(consulta)
+        if despues is None:
+            continue
+        cambio = f" ({(despues - antes) / antes * 100:+.0f}%)" if antes else ""
+        print(f"    {consulta:<12} {antes:8.1f} ms → {despues:8.1f} ms{cambio}")
+
+
+def historial():
+    try:
+        with open(HISTORIAL, "r") as f:
+            for linea in f:
+                imprimir_registro(json.loads(linea))
+    except FileNotFoundError:
+        print("[INFO] Todavía no hay mantenimientos registrados")
+    pendiente = _leer_pendiente()
+    print(f"[INFO] Pendientes: {pendiente['borrados']} reportes borrados"
+          + (f" desde {pendiente['desde']}" if pendiente["desde"] else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mantenimiento de la base de datos de gvmd")
+    parser.add_argument("-c", "--config", default="/opt/gvm/Config/config.json",
+                        help="Ruta al fichero config.json")
+    grupo = parser.add_mutually_exclusive_group(required=True)
+    grupo.add_argument("--forzar", action="store_true",
+                       help="Ejecuta el mantenimiento aunque no se alcance min_borrados")
+    grupo.add_argument("--pendiente", action="store_true",
+                       help="Ejecuta el mantenimiento solo si se alcanza min_borrados (para cron)")
+    grupo.add_argument("--historial", action="store_true", help="Muestra los mantenimientos anteriores")
+    args = parser.parse_args()
+
+    if args.historial:
+        historial()
+    else:
+        with open(args.config, "r", encoding="utf-8") as f:
+            registro = mantener(json.load(f), forzar=args.forzar)
+        raise SystemExit(1 if registro and registro["error"] else 0)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Métricas estilo Prometheus del planificador y del pipeline de exportación.
+
+Los scripts (run-task.py, get-reports-test.py, la bandeja de subidas,
+upload-reports.py...) son procesos cortos lanzados por cron, así que las
+métricas se acumulan en memoria durante el proceso y se vuelcan una sola vez
+al terminar (atexit):
+
+- el estado acumulado se guarda en Reports/metricas/estado.json (con flock,
+  varios procesos pueden volcar a la vez)
+- se regenera de forma atómica el fichero de texto en formato Prometheus
+  Reports/metricas/openvas.prom, listo para el textfile collector de
+  node_exporter
+- `python3 metricas.py --servir 9109` sirve ese fichero en /metrics para que
+  Prometheus lo recoja directamente
+
+Tipos: contadores (`incrementar`), gauges (`fijar`, `reemplazar`) y
+resúmenes `_sum`/`_count` (`observar`, `cronometro`). Registrar una métrica
+solo actualiza un diccionario; el coste de E/S es el volcado final.
+
+Rutas configurables con la clave opcional "metricas" de config.json:
+
+    "metricas": {"directorio": "/opt/gvm/Reports/metricas"}
+"""
+import argparse
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DIRECTORIO = "/opt/gvm/Reports/metricas"
+
+# nombre -> (tipo, ayuda)
+DEFINICIONES = {
+    "openvas_tareas": ("gauge", "Tareas de gvmd por estado"),
+    "openvas_interrupciones_total": ("counter", "Tareas detectadas como Stopped/Interrupted"),
+    "openvas_escaneo_segundos": ("gauge", "Duración del último escaneo de cada tarea"),
+    "openvas_hosts_por_hora": ("gauge", "Hosts del target por hora de escaneo en el último escaneo"),
+    "openvas_exportacion_segundos": ("summary", "Duración de cada etapa de la exportación de reportes"),
+    "openvas_bytes_descargados_total": ("counter", "Bytes de reportes descargados de gvmd"),
+    "openvas_bytes_subidos_total": ("counter", "Bytes subidos por destino"),
+    "openvas_subidas_total": ("counter", "Subidas por destino y resultado"),
+    "openvas_subida_segundos": ("summary", "Duración de las subidas por destino"),
+    "openvas_bandeja_pendientes": ("gauge", "Subidas pendientes en la bandeja de salida"),
+    "openvas_ultima_ejecucion_timestamp": ("gauge", "Epoch de la última ejecución de cada script"),
+}
+
+_bloqueo = threading.Lock()
+_contadores = {}    # (nombre, etiquetas) -> incremento
+_gauges = {}        # (nombre, etiquetas) -> valor
+_resumenes = {}     # (nombre, etiquetas) -> [suma, cuenta]
+_reemplazos = {}    # nombre -> {etiquetas: valor} (sustituye todas las series)
+_directorio = [DIRECTORIO]
+_registrado = [False]
+
+
+def configurar(configuracion):
+    """Toma el directorio de la clave "metricas" del config (opcional)."""
+    _directorio[0] = ((configuracion or {}).get("metricas") or {}).get("directorio", DIRECTORIO)
+
+
+def _etiquetas(etiquetas):
+    """Etiquetas en formato Prometheus, ordenadas: 'a="x",b="y"'."""
+    return ",".join(
+        '{0}="{1}"'.format(clave, str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for clave, valor in sorted(etiquetas.items()))
+
+
+def _registrar_volcado():
+    if not _registrado[0]:
+        _registrado[0] = True
+        atexit.register(volcar)
+
+
+def incrementar(nombre, valor=1, **etiquetas):
+    with _bloqueo:
+        clave = (nombre, _etiquetas(etiquetas))
+        _contadores[clave] = _contadores.get(clave, 0) + valor
+        _registrar_volcado()
+
+
+def fijar(nombre, valor, **etiquetas):
+    with _bloqueo:
+        _gauges[(nombre, _etiquetas(etiquetas))] = valor
+        _registrar_volcado()
+
+
+def reemplazar(nombre, series):
+    """Sustituye todas las series de un gauge: `series` es una lista de (etiquetas, valor)."""
+    with _bloqueo:
+        _reemplazos[nombre] = {_etiquetas(etiquetas): valor for etiquetas, valor in series}
+        _registrar_volcado()
+
+
+def observar(nombre, valor, **etiquetas):
+    with _bloqueo:
+        resumen = _resumenes.setdefault((nombre, _etiquetas(etiquetas)), [0.0, 0])
+        resumen[0] += valor
+        resumen[1] += 1
+        _registrar_volcado()
+
+
+@contextmanager
+def cronometro(nombre, **etiquetas):
+    """Observa en `nombre` los segundos que tarda el bloque."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(nombre, time.perf_counter() - inicio, **etiquetas)
+
+
+def volcar():
+    """Suma lo acumulado en el proceso al estado compartido y regenera el .prom."""
+    with _bloqueo:
+        if not (_contadores or _gauges or _resumenes or _reemplazos):
+            return
+        pendientes = (dict(_contadores), dict(_gauges),
+                      {clave: list(valor) for clave, valor in _resumenes.items()}, dict(_reemplazos))
+        _contadores.clear()
+        _gauges.clear()
+        _resumenes.clear()
+        _reemplazos.clear()
+    contadores, gauges, resumenes, reemplazos = pendientes
+    directorio = _directorio[0]
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        with open(os.path.join(directorio, ".estado.lock"), "w") as bloqueo:
+            fcntl.flock(bloqueo, fcntl.LOCK_EX)
+            estado = leer_estado(directorio)
+            for (nombre, etiquetas), valor in contadores.items():
+                series = estado.setdefault(nombre, {})
+                series[etiquetas] = series.get(etiquetas, 0) + valor
+            for (nombre, etiquetas), valor in gauges.items():
+                estado.setdefault(nombre, {})[etiquetas] = valor
+            for nombre, series in reemplazos.items():
+                estado[nombre] = dict(series)
+            for (nombre, etiquetas), (suma, cuenta) in resumenes.items():
+                series = estado.setdefault(nombre, {})
+                previo = series.get(etiquetas, [0.0, 0])
+                series[etiquetas] = [previo[0] + suma, previo[1] + cuenta]
+            _escribir_atomico(os.path.join(directorio, "estado.json"), json.dumps(estado))
+            _escribir_atomico(os.path.join(directorio, "openvas.prom"), formatear(estado))
+    except OSError as e:
+        print(f"⚠ No se pudieron guardar las métricas en {directorio}: {e}")
+
+
+def leer_estado(directorio=None):
+    try:
+        with open(os.path.join(directorio or _directorio[0], "estado.json"), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _escribir_atomico(ruta, texto):
+    temporal = ruta + ".tmp"
+    with open(temporal, "w") as f:
+        f.write(texto)
+    os.replace(temporal, ruta)
+
+
+def _numero(valor):
+    # Sin notación científica: los contadores de bytes pierden precisión con %g
+    return str(valor) if isinstance(valor, int) else repr(float(valor))
+
+
+def formatear(estado):
+    """Texto en formato de exposición de Prometheus."""
+    lineas = []
+    for nombre in sorted(estado):
+        tipo, ayuda = DEFINICIONES.get(nombre, ("untyped", nombre))
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} {tipo}")
+        for etiquetas, valor in sorted(estado[nombre].items()):
+            sufijo = "{" + etiquetas + "}" if etiquetas else ""
+            if tipo == "summary":
+                lineas.append(f"{nombre}_sum{sufijo} {_numero(valor[0])}")
+                lineas.append(f"{nombre}_count{sufijo} {valor[1]}")
+            else:
+                lineas.append(f"{nombre}{sufijo} {_numero(valor)}")
+    return "\n".join(lineas) + "\n"
+
+
+def servir(puerto, directorio=None, host="127.0.0.1"):
+    """Sirve el fichero .prom en http://host:puerto/metrics."""
+    ruta = os.path.join(directorio or _directorio[0], "openvas.prom")
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            try:
+                with open(ruta, "rb") as f:
+                    cuerpo = f.read()
+            except FileNotFoundError:
+                cuerpo = b""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    print(f"[INFO] Métricas en http://{host}:{puerto}/metrics ({ruta})")
+    ThreadingHTTPServer((host, puerto), Manejador).serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Métricas Prometheus de OpenVAS")
+    parser.add_argument("-c", "--config", default="/opt/gvm/Config/config.json",
+                        help="Ruta al fichero config.json")
+    grupo = parser.add_mutually_exclusive_group(required=True)
+    grupo.add_argument("--servir", type=int, metavar="PUERTO", help="Sirve /metrics en 127.0.0.1:PUERTO")
+    grupo.add_argument("--mostrar", action="store_true", help="Imprime las métricas actuales")
+    args = parser.parse_args()
+
+    try:
+        with open(args.config, "r", encoding="utf-8") as f:
+            configurar(json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    if args.mostrar:
+        print(formatear(leer_estado()), end="")
+    else:
+        servir(args.servir)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Muestreo ligero de recursos de los procesos de OpenVAS leyendo /proc.
+
+Sustituye al bucle de Cron/procesos.sh (`ps -eo command` + `diff` sin pausa,
+que dejaba un núcleo al 100 % en un contenedor limitado a 2 CPU). Cada
+`intervalo` segundos se leen /proc/<pid>/stat, status e io y se agrega por
+grupo de procesos:
+
+- CPU (% de un núcleo), RSS (MB), lectura/escritura en disco (KB/s) y número
+  de procesos de gvmd, ospd-openvas, openvas, redis-server y postgres
+- CPU, memoria disponible y carga del sistema; si hay cgroup v2, el tiempo
+  de CPU limitado (throttling) del contenedor
+- eventos de arranque y fin de los procesos vigilados (con su duración)
+
+Las muestras se guardan en un buffer circular en memoria (resumen al recibir
+SIGUSR1 o al terminar) y en un fichero JSON lines rotativo
+(Reports/recursos.jsonl), una línea compacta por muestra o evento.
+
+    python3 muestreo_recursos.py                  # muestrea cada 10 s
+    python3 muestreo_recursos.py -i 5 --todos     # eventos de todos los procesos
+    python3 muestreo_recursos.py --resumen        # medias y máximos del fichero
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+GRUPOS = ("gvmd", "ospd-openvas", "openvas", "redis-server", "postgres")
+FICHERO = "/opt/gvm/Reports/recursos.jsonl"
+TAMANO_FICHERO = 5 * 1024 * 1024
+COPIAS_FICHERO = 5
+CGROUP_CPU = "/sys/fs/cgroup/cpu.stat"
+
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+PAGINA = os.sysconf("SC_PAGE_SIZE")
+
+
+def _leer(ruta):
+    try:
+        with open(ruta, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def grupo_de(comm, cmdline):
+    """Grupo vigilado al que pertenece un proceso (None si no es de OpenVAS)."""
+    if comm in GRUPOS:
+        return comm
+    # ospd-openvas es un proceso python; gvmd y postgres cambian su título
+    primero = cmdline.split(b"\0", 1)[0].decode("utf-8", "replace")
+    nombre = os.path.basename(primero.split(":", 1)[0].split(" ", 1)[0])
+    if nombre in GRUPOS:
+        return nombre
+    if b"ospd-openvas" in cmdline:
+        return "ospd-openvas"
+    return None
+
+
+def leer_proceso(pid):
+    """
+    Lee los contadores de un proceso.
+
+    Returns:
+        dict con comm, cmdline, inicio, ticks, rss, lectura, escritura (o None si terminó)
+    """
+    stat = _leer(f"/proc/{pid}/stat")
+    if not stat:
+        return None
+    # comm va entre paréntesis y puede contener espacios
+    cierre = stat.rfind(b")")
+    comm = stat[stat.find(b"(") + 1:cierre].decode("utf-8", "replace")
+    campos = stat[cierre + 2:].split()
+    cmdline = _leer(f"/proc/{pid}/cmdline") or b""
+    proceso = {
+        "comm": comm,
+        "cmdline": cmdline,
+        "kernel": not cmdline,
+        "inicio": int(campos[19]),
+        "ticks": int(campos[11]) + int(campos[12]),
+        "rss": int(campos[21]) * PAGINA,
+        "lectura": None,
+        "escritura": None,
+    }
+    io = _leer(f"/proc/{pid}/io")
+    if io:
+        for linea in io.split(b"\n"):
+            if linea.startswith(b"read_bytes:"):
+                proceso["lectura"] = int(linea.split()[1])
+            elif linea.startswith(b"write_bytes:"):
+                proceso["escritura"] = int(linea.split()[1])
+    return proceso
+
+
+def leer_sistema():
+    """CPU total (ticks), memoria disponible, carga y throttling del cgroup."""
+    sistema = {}
+    cpu = (_leer("/proc/stat") or b"").split(b"\n", 1)[0].split()[1:]
+    if cpu:
+        valores = [int(valor) for valor in cpu]
+        sistema["ticks_total"] = sum(valores)
+        sistema["ticks_libres"] = valores[3] + (valores[4] if len(valores) > 4 else 0)
+    for linea in (_leer("/proc/meminfo") or b"").split(b"\n"):
+        if linea.startswith(b"MemAvailable:"):
+            sistema["mem_disponible"] = int(linea.split()[1]) * 1024
+    carga = (_leer("/proc/loadavg") or b"").split()
+    if carga:
+        sistema["carga"] = float(carga[0])
+    for linea in (_leer(CGROUP_CPU) or b"").split(b"\n"):
+        if linea.startswith(b"throttled_usec"):
+            sistema["throttled_usec"] = int(linea.split()[1])
+    return sistema
+
+
+class Muestreador:
+    """Toma muestras periódicas y detecta arranques/finales de procesos."""
+
+    def __init__(self, intervalo=10.0, capacidad=360, todos=False, registro=None):
+        self.intervalo = intervalo
+        self.buffer = deque(maxlen=capacidad)
+        self.todos = todos
+        self.registro = registro
+        self.anterior = {}          # (pid, inicio) -> proceso de la muestra anterior
+        self.sistema_anterior = None
+        self.instante_anterior = None
+
+    def _escribir(self, datos):
+        if self.registro is not None:
+            self.registro.info(json.dumps(datos, separators=(",", ":")))
+
+    def _vigilado(self, proceso):
+        return grupo_de(proceso["comm"], proceso["cmdline"])
+
+    def muestrear(self):
+        """Toma una muestra; la primera solo inicializa los contadores."""
+        ahora = time.time()
+        actuales = {}
+        for entrada in os.listdir("/proc"):
+            if not entrada.isdigit():
+                continue
+            proceso = leer_proceso(entrada)
+            if proceso is None or proceso["kernel"]:
+                continue
+            proceso["grupo"] = self._vigilado(proceso)
+            if proceso["grupo"] or self.todos:
+                actuales[(int(entrada), proceso["inicio"])] = proceso
+        sistema = leer_sistema()
+
+        if self.instante_anterior is not None:
+            self._eventos(ahora, actuales)
+            muestra = self._agregar(ahora, actuales, sistema)
+            self.buffer.append(muestra)
+            self._escribir(muestra)
+        self.anterior = actuales
+        self.sistema_anterior = sistema
+        self.instante_anterior = ahora
+
+    def _eventos(self, ahora, actuales):
+        arrancados = actuales.keys() - self.anterior.keys()
+        terminados = self.anterior.keys() - actuales.keys()
+        for clave in sorted(arrancados):
+            proceso = actuales[clave]
+            self._escribir({"t": round(ahora), "evento": "inicio", "pid": clave[0],
+                            "grupo": proceso["grupo"], "cmd": _cmd(proceso)})
+        for clave in sorted(terminados):
+            proceso = self.anterior[clave]
+            self._escribir({"t": round(ahora), "evento": "fin", "pid": clave[0],
+                            "grupo": proceso["grupo"], "cmd": _cmd(proceso),
+                            "cpu_s": round(proceso["ticks"] / CLK_TCK, 1)})
+
+    def _agregar(self, ahora, actuales, sistema):
+        segundos = max(ahora - self.instante_anterior, 0.001)
+        grupos = {grupo: [0.0, 0, 0, 0, 0] for grupo in GRUPOS}
+        for clave, proceso in actuales.items():
+            if not proceso["grupo"]:
+                continue
+            previo = self.anterior.get(clave)
+            datos = grupos[proceso["grupo"]]
+            datos[4] += 1
+            datos[1] += proceso["rss"]
+            if previo is None:
+                continue
+            datos[0] += (proceso["ticks"] - previo["ticks"]) / CLK_TCK
+            if proceso["lectura"] is not None and previo["lectura"] is not None:
+                datos[2] += proceso["lectura"] - previo["lectura"]
+                datos[3] += proceso["escritura"] - previo["escritura"]
+        muestra = {"t": round(ahora), "g": {
+            # [CPU %, RSS MB, lectura KB/s, escritura KB/s, procesos]
+            grupo: [round(cpu / segundos * 100, 1), round(rss / 1048576, 1),
+                    round(lectura / 1024 / segundos, 1), round(escritura / 1024 / segundos, 1), n]
+            for grupo, (cpu, rss, lectura, escritura, n) in grupos.items() if n
+        }}
+        previo = self.sistema_anterior or {}
+        resumen = {}
+        if "ticks_total" in sistema and "ticks_total" in previo:
+            total = sistema["ticks_total"] - previo["ticks_total"]
+            libres = sistema["ticks_libres"] - previo["ticks_libres"]
+            resumen["cpu"] = round((1 - libres / total) * 100, 1) if total else 0.0
+        if "mem_disponible" in sistema:
+            resumen["mem_mb"] = round(sistema["mem_disponible"] / 1048576)
+        if "carga" in sistema:
+            resumen["carga"] = sistema["carga"]
+        if "throttled_usec" in sistema and "throttled_usec" in previo:
+            resumen["throttled_ms"] = round((sistema["throttled_usec"] - previo["throttled_usec"]) / 1000)
+        muestra["s"] = resumen
+        return muestra
+
+    def ejecutar(self):
+        """Muestrea hasta recibir SIGTERM/SIGINT; SIGUSR1 imprime el resumen del buffer."""
+        activo = [True]
+
+        def parar(*_):
+            activo[0] = False
+
+        signal.signal(signal.SIGTERM, parar)
+        signal.signal(signal.SIGINT, parar)
+        signal.signal(signal.SIGUSR1, lambda *_: imprimir_resumen(self.buffer))
+        print(f"[INFO] Muestreo de recursos cada {self.intervalo:g} s (PID {os.getpid()})")
+        siguiente = time.monotonic()
+        while activo[0]:
+            self.muestrear()
+            siguiente += self.intervalo
+            # time.sleep se interrumpe con las señales; se recalcula la espera
+            while activo[0] and time.monotonic() < siguiente:
+                time.sleep(max(siguiente - time.monotonic(), 0))
+        imprimir_resumen(self.buffer)
+
+
+def _cmd(proceso):
+    texto = proceso["cmdline"].replace(b"\0", b" ").decode("utf-8", "replace").strip()
+    return (texto or proceso["comm"])[:120]
+
+
+def imprimir_resumen(muestras):
+    """Media y máximo por grupo de CPU, RSS y E/S de las muestras dadas."""
+    muestras = [muestra for muestra in muestras if "g" in muestra]
+    if not muestras:
+        print("[INFO] Sin muestras")
+        return
+    desde = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(muestras[0]["t"]))
+    hasta = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(muestras[-1]["t"]))
+    print(f"[INFO] {len(muestras)} muestras de {desde} a {hasta}")
+    print(f"  {'grupo':<14} {'CPU% med/máx':>14} {'RSS MB med/máx':>16} {'lect KB/s':>10} {'escr KB/s':>10}")
+    for grupo in GRUPOS:
+        valores = [muestra["g"][grupo] for muestra in muestras if grupo in muestra["g"]]
+        if not valores:
+            continue
+        columna = list(zip(*valores))
+        media = [sum(serie) / len(valores) for serie in columna]
+        print(f"  {grupo:<14} {media[0]:6.1f}/{max(columna[0]):6.1f} {media[1]:7.0f}/{max(columna[1]):7.0f} "
+              f"{media[2]:10.0f} {media[3]:10.0f}")
+    throttled = [muestra["s"].get("throttled_ms", 0) for muestra in muestras]
+    cpu = [muestra["s"]["cpu"] for muestra in muestras if "cpu" in muestra["s"]]
+    if cpu:
+        print(f"  sistema: CPU media {sum(cpu) / len(cpu):.1f}% (máx {max(cpu):.1f}%), "
+              f"throttling del cgroup {sum(throttled) / 1000:.1f} s")
+
+
+def leer_fichero(ruta=FICHERO, desde=None):
+    """Muestras del fichero y sus rotaciones, en orden cronológico."""
+    muestras = []
+    for numero in range(COPIAS_FICHERO, -1, -1):
+        nombre = f"{ruta}.{numero}" if numero else ruta
+        if not os.path.exists(nombre):
+            continue
+        with open(nombre, "r") as f:
+            for linea in f:
+                muestra = json.loads(linea)
+                if desde is None or muestra["t"] >= desde:
+                    muestras.append(muestra)
+    return muestras
+
+
+def crear_registro(ruta=FICHERO, tamano=TAMANO_FICHERO, copias=COPIAS_FICHERO):
+    registro = logging.getLogger("muestreo_recursos")
+    registro.setLevel(logging.INFO)
+    registro.propagate = False
+    manejador = RotatingFileHandler(ruta, maxBytes=tamano, backupCount=copias)
+    manejador.setFormatter(logging.Formatter("%(message)s"))
+    registro.addHandler(manejador)
+    return registro
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Muestreo de recursos de los procesos de OpenVAS")
+    parser.add_argument("-i", "--intervalo", type=float, default=10.0,
+                        help="Segundos entre muestras (por defecto: 10)")
+    parser.add_argument("-o", "--output", default=FICHERO, help=f"Fichero rotativo (por defecto: {FICHERO})")
+    parser.add_argument("--capacidad", type=int, default=360,
+                        help="Muestras en el buffer circular en memoria (por defecto: 360)")
+    parser.add_argument("--todos", action="store_true",
+                        help="Registrar arranques/finales de todos los procesos, no solo los de OpenVAS")
+    parser.add_argument("--resumen", action="store_true", help="Resume las muestras del fichero y sale")
+    parser.add_argument("--horas", type=float, help="Con --resumen, solo las últimas N horas")
+    args = parser.parse_args()
+
+    if args.resumen:
+        desde = time.time() - args.horas * 3600 if args.horas else None
+        imprimir_resumen(leer_fichero(args.output, desde))
+    else:
+        Muestreador(args.intervalo, args.capacidad, args.todos, crear_registro(args.output)).ejecutar()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Modo de perfilado (`--profile`) común a los scripts de OpenVAS.
+
+Cuando una exportación tarda horas no se sabe si el tiempo se va en gvmd, en
+decodificar base64, en pandas, en openpyxl o en las subidas. Con `--profile`
+el script se ejecuta con cProfile y tracemalloc activos y, al terminar:
+
+- guarda junto a las exportaciones (Reports/exports/perfiles por defecto):
+  `<script>_<fecha>.prof` (pstats, se abre con `python3 -m pstats` o
+  snakeviz), `<script>_<fecha>.tracemalloc` (snapshot de memoria) y
+  `<script>_<fecha>_etapas.json` (duración y pico de memoria por etapa)
+- imprime el top-N de funciones por tiempo propio y acumulado, las líneas
+  que más memoria tenían reservada (en el final de etapa con más memoria en
+  uso, o al terminar) y la tabla de etapas
+
+Las etapas se marcan con `etapa("nombre")` (sin coste si no se perfila) y
+pueden anidarse: el pico de una etapa incluye el de sus etapas internas.
+cProfile solo mide el hilo principal: el tiempo de los pools de subida
+aparece como espera en la etapa que los lanza.
+
+    perfil = desde_argv("run-task")       # quita --profile de sys.argv
+    with etapa("descarga"):
+        ...
+
+tracemalloc ralentiza bastante la ejecución: es un modo de diagnóstico.
+"""
+import atexit
+import cProfile
+import datetime
+import json
+import os
+import pstats
+import re
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PERFILES = "/opt/gvm/Reports/exports/perfiles"
+
+# Funciones y líneas de memoria que se muestran en el resumen
+TOP = 20
+
+_activo = [None]
+
+
+class Perfil:
+    """Sesión de perfilado del proceso (cProfile + tracemalloc + etapas)."""
+
+    def __init__(self, nombre, directorio=PERFILES, top=TOP):
+        self.nombre = nombre
+        self.directorio = directorio
+        self.top = top
+        self.etapas = []       # [{"etapa", "segundos", "pico_mb"}] en orden de fin
+        self._pila = []        # picos acumulados de las etapas abiertas
+        self._pico = 0         # pico global (reset_peak lo reinicia en cada etapa)
+        self._snapshot = None  # (etapa, bytes en uso, snapshot) con más memoria en uso
+        self._inicio = time.perf_counter()
+        self._perfil = cProfile.Profile()
+
+    def iniciar(self):
+        tracemalloc.start()
+        self._perfil.enable()
+
+    @contextmanager
+    def etapa(self, nombre):
+        # El pico de la etapa exterior hasta ahora se conserva antes de reiniciarlo
+        if self._pila:
+            self._pila[-1] = max(self._pila[-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        self._pila.append(0)
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            actual, pico = tracemalloc.get_traced_memory()
+            pico = max(self._pila.pop(), pico)
+            self._pico = max(self._pico, pico)
+            if self._snapshot is None or actual > self._snapshot[1]:
+                self._snapshot = (nombre, actual, tracemalloc.take_snapshot())
+            self.etapas.append({"etapa": nombre, "segundos": round(time.perf_counter() - inicio, 3),
+                                "pico_mb": round(pico / 1024 / 1024, 1)})
+            if self._pila:
+                self._pila[-1] = max(self._pila[-1], pico)
+
+    def finalizar(self):
+        """Para el perfilado, guarda los ficheros e imprime el resumen."""
+        self._perfil.disable()
+        actual, pico = tracemalloc.get_traced_memory()
+        pico = max(self._pico, pico)
+        if self._snapshot is None or actual > self._snapshot[1]:
+            self._snapshot = ("fin", actual, tracemalloc.take_snapshot())
+        momento, _, snapshot = self._snapshot
+        self._snapshot = None
+        tracemalloc.stop()
+        segundos = time.perf_counter() - self._inicio
+
+        base = os.path.join(self.directorio,
+                            f"{self.nombre}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            self._perfil.dump_stats(base + ".prof")
+            snapshot.dump(base + ".tracemalloc")
+            with open(base + "_etapas.json", "w") as f:
+                json.dump({"script": self.nombre, "segundos": round(segundos, 3),
+                           "pico_mb": round(pico / 1024 / 1024, 1), "etapas": self.etapas}, f, indent=2)
+        except OSError as e:
+            print(f"⚠ No se pudo guardar el perfil en {self.directorio}: {e}")
+            base = None
+
+        print(f"\n[INFO] Perfil de {self.nombre}: {segundos:.1f} s, pico de memoria "
+              f"{pico / 1024 / 1024:.1f} MB (al terminar {actual / 1024 / 1024:.1f} MB)")
+        self._imprimir_funciones()
+        self._imprimir_memoria(snapshot, momento)
+        self._imprimir_etapas()
+        if base:
+            print(f"[INFO] Perfil guardado en {base}.prof / .tracemalloc / _etapas.json")
+
+    def _imprimir_funciones(self):
+        estadisticas = pstats.Stats(self._perfil).stats
+        filas = [(funcion, llamadas, propio, acumulado)
+                 for funcion, (_, llamadas, propio, acumulado, _) in estadisticas.items()]
+        for titulo, indice in (("tiempo propio", 2), ("tiempo acumulado", 3)):
+            print(f"\nTop {self.top} funciones por {titulo}:")
+            print(f"  {'llamadas':>10} {'propio s':>9} {'acum. s':>9}  función")
+            for funcion, llamadas, propio, acumulado in sorted(filas, key=lambda f: -f[indice])[:self.top]:
+                print(f"  {llamadas:>10} {propio:>9.2f} {acumulado:>9.2f}  {_nombre_funcion(funcion)}")
+
+    def _imprimir_memoria(self, snapshot, momento):
+        snapshot = snapshot.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),
+                                           tracemalloc.Filter(False, __file__)))
+        cuando = "al terminar" if momento == "fin" else f"al final de la etapa {momento}"
+        print(f"\nTop {self.top} líneas por memoria reservada {cuando}:")
+        for estadistica in snapshot.statistics("lineno")[:self.top]:
+            marco = estadistica.traceback[0]
+            print(f"  {estadistica.size / 1024 / 1024:>9.1f} MB {estadistica.count:>9} bloques  "
+                  f"{_ruta_corta(marco.filename)}:{marco.lineno}")
+
+    def _imprimir_etapas(self):
+        if not self.etapas:
+            return
+        print("\nEtapas:")
+        print(f"  {'etapa':<24} {'segundos':>9} {'pico MB':>9}")
+        for etapa in self.etapas:
+            print(f"  {etapa['etapa']:<24} {etapa['segundos']:>9.1f} {etapa['pico_mb']:>9.1f}")
+
+
+def _ruta_corta(ruta):
+    # pandas/core/... o base64.py en lugar de la ruta completa del entorno
+    return re.sub(r"^.*/(site-packages|lib/python[0-9.]+)/", "", ruta)
+
+
+def _nombre_funcion(funcion):
+    fichero, linea, nombre = funcion
+    if fichero == "~":
+        return nombre  # funciones en C: {method 'read' of ...}
+    return f"{_ruta_corta(fichero)}:{linea}({nombre})"
+
+
+def iniciar(nombre, directorio=PERFILES, top=TOP):
+    """Activa el perfilado hasta el final del proceso (una sola vez por proceso)."""
+    if _activo[0] is None:
+        _activo[0] = Perfil(nombre, directorio, top)
+        atexit.register(_activo[0].finalizar)
+        _activo[0].iniciar()
+        print(f"[INFO] Perfilado activo (cProfile + tracemalloc) para {nombre}")
+    return _activo[0]
+
+
+def desde_argv(nombre, directorio=PERFILES, top=TOP):
+    """Si el script se lanzó con --profile, lo quita de sys.argv e inicia el perfilado."""
+    if "--profile" not in sys.argv[1:]:
+        return None
+    sys.argv.remove("--profile")
+    return iniciar(nombre, directorio, top)
+
+
+def activo():
+    return _activo[0] is not None
+
+
+def etapa(nombre):
+    """Marca una etapa (duración y pico de memoria) si el perfilado está activo."""
+    if _activo[0] is None:
+        return _sin_perfil()
+    return _activo[0].etapa(nombre)
+
+
+@contextmanager
+def _sin_perfil():
+    yield
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Registro estructurado (JSON lines) compartido por los scripts de OpenVAS.
+
+Sustituye a los `write_log()` de run-task.py y upload-reports.py, que abrían
+el fichero, añadían una línea y lo cerraban por cada mensaje:
+
+- una línea JSON por evento: fecha, nivel, script, pid, mensaje y campos
+- escritura en búfer: se vuelca a disco cada 64 KB, cada 2 s, con cada error
+  y al terminar el proceso (atexit)
+- rotación por tamaño (10 MB × 5 copias por defecto), con flock para que
+  varios procesos puedan escribir en el mismo fichero
+- tramos cronometrados (`tramo`): duración en ms, bytes de la respuesta y
+  resultado de cada llamada GMP, descarga, transformación o subida
+- `GmpRegistrado` envuelve una sesión GMP y registra un tramo por llamada
+  (sin volcar el XML de la respuesta, solo su tamaño)
+
+    log = configurar("/opt/gvm/taskslog.txt")
+    log.info("Arrancamos la tarea", task_id=task_id)
+    with log.tramo("exportacion.decodificacion") as datos:
+        ...
+        datos["bytes"] = len(data)
+
+    python3 registro.py /opt/gvm/taskslog.txt   # tramos más lentos
+
+Tamaños configurables con la clave opcional "registro" de config.json:
+
+    "registro": {"max_mb": 10, "copias": 5}
+"""
+import argparse
+import atexit
+import datetime
+import fcntl
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+REGISTRO = "/opt/gvm/Reports/registro.jsonl"
+
+REGISTRO_DEFECTO = {
+    "max_mb": 10,
+    "copias": 5,
+}
+
+# Volcado del búfer: por tamaño y por antigüedad
+BUFFER_BYTES = 64 * 1024
+INTERVALO = 2.0
+
+# Argumentos de GMP que se copian al tramo (nunca credenciales)
+CAMPOS_GMP = ("filter_string", "report_id", "task_id", "target_id", "report_format_id")
+# Métodos GMP cuyo primer argumento posicional es el id del objeto
+CON_ID = ("start_task", "stop_task", "get_task", "get_report", "delete_report", "get_target")
+
+
+class Registro:
+    """Fichero de registro JSON lines con búfer y rotación por tamaño."""
+
+    def __init__(self, ruta, max_mb=REGISTRO_DEFECTO["max_mb"], copias=REGISTRO_DEFECTO["copias"],
+                 eco=True):
+        self.ruta = ruta
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.copias = copias
+        self.eco = eco
+        self._script = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else "python"
+        self._bloqueo = threading.Lock()
+        self._buffer = []
+        self._pendientes = 0
+        self._ultimo_volcado = time.monotonic()
+        atexit.register(self.vaciar)
+
+    def evento(self, mensaje=None, nivel="INFO", **campos):
+        linea = {"fecha": datetime.datetime.now().isoformat(timespec="milliseconds"),
+                 "nivel": nivel, "script": self._script, "pid": os.getpid()}
+        if mensaje is not None:
+            linea["mensaje"] = str(mensaje)
+            if self.eco:
+                print(f"{linea['fecha']} - {mensaje}")
+        linea.update(campos)
+        texto = json.dumps(linea, ensure_ascii=False, default=str) + "\n"
+        with self._bloqueo:
+            self._buffer.append(texto)
+            self._pendientes += len(texto)
+            volcar = (nivel == "ERROR" or self._pendientes >= BUFFER_BYTES
+                      or time.monotonic() - self._ultimo_volcado >= INTERVALO)
+        if volcar:
+            self.vaciar()
+
+    def info(self, mensaje, **campos):
+        self.evento(mensaje, "INFO", **campos)
+
+    def aviso(self, mensaje, **campos):
+        self.evento(mensaje, "WARNING", **campos)
+
+    def error(self, mensaje, **campos):
+        self.evento(mensaje, "ERROR", **campos)
+
+    @contextmanager
+    def tramo(self, operacion, **campos):
+        """
+        Registra la duración del bloque como un evento "tramo". El bloque
+        puede añadir campos al diccionario que recibe (p. ej. "bytes").
+        Las excepciones se registran y se propagan.
+        """
+        datos = dict(campos)
+        inicio = time.perf_counter()
+        try:
+            yield datos
+        except BaseException as e:
+            datos["ok"] = False
+            datos["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            datos.setdefault("ok", True)
+            ms = round((time.perf_counter() - inicio) * 1000, 1)
+            self.evento(None, "INFO" if datos["ok"] else "ERROR",
+                        tramo=operacion, ms=ms, **datos)
+
+    def medir(self, operacion, funcion, *args, **kwargs):
+        """Ejecuta `funcion` dentro de un tramo y anota el tamaño del resultado."""
+        with self.tramo(operacion) as datos:
+            resultado = funcion(*args, **kwargs)
+            datos["bytes"] = tamano(resultado)
+        return resultado
+
+    def vaciar(self):
+        """Escribe el búfer en disco (una sola escritura), rotando si hace falta."""
+        with self._bloqueo:
+            if not self._buffer:
+                return
+            datos = "".join(self._buffer).encode("utf-8")
+            self._buffer.clear()
+            self._pendientes = 0
+            self._ultimo_volcado = time.monotonic()
+            try:
+                directorio = os.path.dirname(self.ruta)
+                if directorio:
+                    os.makedirs(directorio, exist_ok=True)
+                with open(self.ruta, "ab") as f:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    if self.max_bytes and os.fstat(f.fileno()).st_size + len(datos) > self.max_bytes:
+                        self._rotar()
+                        with open(self.ruta, "ab") as nuevo:
+                            nuevo.write(datos)
+                    else:
+                        f.write(datos)
+            except OSError as e:
+                print(f"⚠ No se pudo escribir el registro {self.ruta}: {e}")
+
+    def _rotar(self):
+        # ruta.N-1 -> ruta.N, ..., ruta -> ruta.1
+        for indice in range(self.copias - 1, 0, -1):
+            origen = f"{self.ruta}.{indice}"
+            if os.path.exists(origen):
+                os.replace(origen, f"{self.ruta}.{indice + 1}")
+        if self.copias:
+            os.replace(self.ruta, f"{self.ruta}.1")
+        else:
+            os.remove(self.ruta)
+
+
+def tamano(valor):
+    """Bytes de una respuesta (str/bytes); None si no es medible."""
+    if isinstance(valor, str):
+        return len(valor.encode("utf-8")) if not valor.isascii() else len(valor)
+    if isinstance(valor, (bytes, bytearray)):
+        return len(valor)
+    return None
+
+
+class GmpRegistrado:
+    """Envuelve una sesión GMP: cada llamada queda registrada como tramo "gmp.<método>"."""
+
+    def __init__(self, gmp, registro=None):
+        self._gmp = gmp
+        self._registro = registro
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._gmp, nombre)
+        if nombre.startswith("_") or not callable(atributo):
+            return atributo
+
+        def llamada(*args, **kwargs):
+            campos = {campo: kwargs[campo] for campo in CAMPOS_GMP if campo in kwargs}
+            if args and nombre in CON_ID:
+                campos["id"] = args[0]
+            with (self._registro or actual()).tramo(f"gmp.{nombre}", **campos) as datos:
+                respuesta = atributo(*args, **kwargs)
+                datos["bytes"] = tamano(respuesta)
+            return respuesta
+        return llamada
+
+
+_actual = [None]
+
+
+def configurar(ruta=REGISTRO, configuracion=None, eco=True):
+    """Crea el registro del proceso (el que usan `actual()` y las funciones del módulo)."""
+    ajustes = dict(REGISTRO_DEFECTO)
+    ajustes.update((configuracion or {}).get("registro") or {})
+    if _actual[0] is not None:
+        _actual[0].vaciar()
+    _actual[0] = Registro(ruta, ajustes["max_mb"], ajustes["copias"], eco)
+    return _actual[0]
+
+
+def actual():
+    """Registro del proceso; si ningún script lo configuró, REGISTRO."""
+    if _actual[0] is None:
+        configurar()
+    return _actual[0]
+
+
+def info(mensaje, **campos):
+    actual().info(mensaje, **campos)
+
+
+def error(mensaje, **campos):
+    actual().error(mensaje, **campos)
+
+
+def tramo(operacion, **campos):
+    return actual().tramo(operacion, **campos)
+
+
+def leer(ruta):
+    """Eventos del registro y de sus copias rotadas, de más antiguo a más reciente."""
+    copias = sorted((f for f in os.listdir(os.path.dirname(ruta) or ".")
+                     if f.startswith(os.path.basename(ruta) + ".") and f.rsplit(".", 1)[1].isdigit()),
+                    key=lambda f: -int(f.rsplit(".", 1)[1]))
+    for fichero in [os.path.join(os.path.dirname(ruta), f) for f in copias] + [ruta]:
+        try:
+            with open(fichero, "r", encoding="utf-8") as f:
+                for linea in f:
+                    try:
+                        yield json.loads(linea)
+                    except json.JSONDecodeError:
+                        continue  # líneas del formato de texto anterior
+        except FileNotFoundError:
+            continue
+
+
+def resumen(ruta, limite=15):
+    """Tramos agrupados por operación, ordenados por tiempo total."""
+    operaciones = {}
+    for evento in leer(ruta):
+        if "tramo" not in evento:
+            continue
+        datos = operaciones.setdefault(evento["tramo"], {"n": 0, "ms": 0.0, "max": 0.0, "bytes": 0, "errores": 0})
+        datos["n"] += 1
+        datos["ms"] += evento.get("ms") or 0
+        datos["max"] = max(datos["max"], evento.get("ms") or 0)
+        datos["bytes"] += evento.get("bytes") or 0
+        datos["errores"] += not evento.get("ok", True)
+    if not operaciones:
+        print(f"[INFO] No hay tramos registrados en {ruta}")
+        return
+    print(f"{'operación':<32} {'n':>6} {'total s':>9} {'medio ms':>9} {'máx ms':>9} {'MB':>9} {'errores':>7}")
+    for operacion, datos in sorted(operaciones.items(), key=lambda o: -o[1]["ms"])[:limite]:
+        print(f"{operacion:<32} {datos['n']:>6} {datos['ms'] / 1000:>9.1f} {datos['ms'] / datos['n']:>9.1f} "
+              f"{datos['max']:>9.1f} {datos['bytes'] / 1024 / 1024:>9.1f} {datos['errores']:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resumen de tramos del registro estructurado")
+    parser.add_argument("ruta", nargs="?", default=REGISTRO, help=f"Fichero de registro (por defecto {REGISTRO})")
+    parser.add_argument("-n", "--limite", type=int, default=15, help="Operaciones a mostrar")
+    args = parser.parse_args()
+    resumen(args.ruta, args.limite)
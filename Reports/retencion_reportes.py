@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Motor de limpieza de reportes de gvmd con política de retención.
+
+Sustituye al bucle de Targets_Tasks/delete-files.py, que listaba `rows=1000`
+reportes y los borraba uno a uno (los que pasaban de 1000 se quedaban):
+
+- Recorre todos los reportes paginando `get_reports`
+- Aplica la retención: se conservan los N últimos reportes de cada tarea y/o
+  los más recientes que X días; el resto se borra
+- Borra en lotes, con varias sesiones GMP en paralelo y un límite de borrados
+  por segundo para que gvmd siga respondiendo al resto de scripts
+- Con "archivo_reportes": true, antes de borrar cada reporte se guarda su XML
+  comprimido en el archivo local (archivo_reportes.py); si falla, no se borra
+- Informa de los reportes borrados y de las filas y bytes liberados (medidos
+  en la base de datos de gvmd con gvmd_db.py si es accesible; si no, solo
+  las filas según GMP)
+
+La política se lee de la clave opcional "retencion_reportes" de
+/opt/gvm/Config/config.json:
+
+    "retencion_reportes": {"mantener_por_tarea": 0, "dias": 0, "hilos": 4,
+                           "lote": 20, "por_segundo": 10}
+
+Con los valores por defecto (0 y 0) se borran todos los reportes, como antes:
+run-task.py solo relanza las tareas en estado New, así que conservar reportes
+deja esas tareas fuera del siguiente ciclo.
+
+    python3 retencion_reportes.py --simular                 # qué se borraría
+    python3 retencion_reportes.py --mantener 2 --dias 30    # borra con otra política
+"""
+import argparse
+import datetime
+import json
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from gvm.connections import TLSConnection
+from gvm.protocols.gmp import Gmp
+
+from gvmd_db import _epoch
+
+RETENCION_DEFECTO = {
+    "mantener_por_tarea": 0,
+    "dias": 0,
+    "hilos": 4,
+    "lote": 20,
+    "por_segundo": 10,
+}
+
+# Filas y bytes de los resultados y detalles de host de cada reporte
+CONSULTA_TAMANO = """
+    SELECT r.uuid, count(res.id), coalesce(sum(pg_column_size(res.*)), 0)
+    FROM reports r JOIN results res ON res.report = r.id
+    WHERE r.uuid = ANY(%s) GROUP BY r.uuid
+    UNION ALL
+    SELECT r.uuid, count(d.id), coalesce(sum(pg_column_size(d.*)), 0)
+    FROM reports r JOIN report_hosts h ON h.report = r.id
+    JOIN report_host_details d ON d.report_host = h.id
+    WHERE r.uuid = ANY(%s) GROUP BY r.uuid
+"""
+
+
+def politica(configuracion, **cambios):
+    """Política de retención: valores por defecto + config + argumentos."""
+    resultado = dict(RETENCION_DEFECTO)
+    resultado.update((configuracion or {}).get("retencion_reportes") or {})
+    resultado.update({clave: valor for clave, valor in cambios.items() if valor is not None})
+    return resultado
+
+
+def conectar(user, password):
+    """Abre y autentica una sesión GMP. Se cierra con `disconnect()`."""
+    gmp = Gmp(connection=TLSConnection(hostname="127.0.0.1", port=9390, timeout=600)).__enter__()
+    gmp.authenticate(user, password)
+    return gmp
+
+
+def listar_reportes(gmp, page_size=1000):
+    """
+    Recorre todos los reportes de gvmd, página a página.
+
+    Returns:
+        list de dicts con id, task_id, task_name, fecha (epoch) y resultados
+    """
+    reportes = []
+    start = 1
+    while True:
+        respuesta = gmp.get_reports(filter_string=f"first={start} rows={page_size} sort=date",
+                                    details=False)
+        root = ET.fromstring(respuesta)
+        pagina = root.findall("report")
+        for report in pagina:
+            task = report.find("task")
+            resultados = (report.findtext("report/result_count/full") or "").strip()
+            reportes.append({
+                "id": report.get("id"),
+                "task_id": task.get("id") if task is not None else "",
+                "task_name": task.findtext("name") if task is not None else "",
+                "fecha": _epoch(report.findtext("creation_time")
+                                or report.findtext("report/timestamp")
+                                or report.findtext("report/scan_start")),
+                "resultados": int(resultados) if resultados.isdigit() else 0,
+            })
+        root.clear()
+        if len(pagina) < page_size:
+            break
+        start += page_size
+    return reportes
+
+
+def seleccionar(reportes, mantener_por_tarea=0, dias=0, ahora=None):
+    """
+    Aplica la retención y devuelve los reportes a borrar: se conserva un
+    reporte si está entre los `mantener_por_tarea` más recientes de su tarea
+    o si tiene menos de `dias` días. Con la política 0/0 se borra todo.
+
+    Un reporte sin fecha (o con fecha ilegible, epoch 0) cuenta como el más
+    antiguo de su tarea: `dias` nunca lo conserva, pero `mantener_por_tarea`
+    sí si su tarea no tiene N reportes más recientes.
+    """
+    ahora = ahora or time.time()
+    limite = ahora - dias * 86400 if dias else None
+    por_tarea = defaultdict(list)
+    for reporte in reportes:
+        por_tarea[reporte["task_id"]].append(reporte)
+    borrar = []
+    for lista in por_tarea.values():
+        lista.sort(key=lambda reporte: reporte["fecha"], reverse=True)
+        for posicion, reporte in enumerate(lista):
+            if posicion < mantener_por_tarea:
+                continue
+            if limite is not None and reporte["fecha"] >= limite:
+                continue
+            borrar.append(reporte)
+    return borrar
+
+
+def medir(configuracion, ids):
+    """
+    Filas y bytes que ocupan los reportes en la base de datos de gvmd.
+    Devuelve None si la base de datos no es accesible.
+    """
+    if not ids:
+        return {}
+    try:
+        from gvmd_db import conexion
+        with conexion(configuracion) as conn:
+            with conn.cursor() as cur:
+                cur.execute(CONSULTA_TAMANO, (list(ids), list(ids)))
+                tamanos = defaultdict(lambda: [0, 0])
+                for uuid, filas, tamano in cur.fetchall():
+                    tamanos[uuid][0] += filas
+                    tamanos[uuid][1] += tamano
+                return dict(tamanos)
+    except Exception as e:
+        print(f"⚠ No se pueden medir los bytes en la BD de gvmd ({e}); solo se cuentan filas")
+        return None
+
+
+def borrar(configuracion, reportes, hilos=4, lote=20, por_segundo=10):
+    """
+    Borra los reportes en lotes; cada lote se reparte entre `hilos` sesiones
+    GMP y no se superan `por_segundo` borrados por segundo.
+
+    Returns:
+        tuple (ids borrados, dict id -> error de los fallidos)
+    """
+    user, password = configuracion.get("user"), configuracion.get("password")
+    local = threading.local()
+    sesiones = []
+    sesiones_lock = threading.Lock()
+
+    def borrar_uno(report_id):
+        if not hasattr(local, "gmp"):
+            local.gmp = conectar(user, password)
+            with sesiones_lock:
+                sesiones.append(local.gmp)
+        respuesta = ET.fromstring(local.gmp.delete_report(report_id))
+        if not respuesta.get("status", "").startswith("2"):
+            raise RuntimeError(f"{respuesta.get('status')} {respuesta.get('status_text')}")
+
+    borrados, errores = [], {}
+    ids = [reporte["id"] for reporte in reportes]
+    with ThreadPoolExecutor(max_workers=max(hilos, 1), thread_name_prefix="retencion") as pool:
+        try:
+            for inicio_lote in range(0, len(ids), lote):
+                bloque = ids[inicio_lote:inicio_lote + lote]
+                inicio = time.perf_counter()
+                futuros = [(report_id, pool.submit(borrar_uno, report_id)) for report_id in bloque]
+                for report_id, futuro in futuros:
+                    try:
+                        futuro.result()
+                        borrados.append(report_id)
+                    except Exception as e:
+                        errores[report_id] = str(e)
+                        print(f"[ERROR] No se pudo borrar el reporte {report_id}: {e}")
+                print(f"[INFO] Borrados {len(borrados)}/{len(ids)} reportes")
+                # Límite de ritmo: el lote no puede durar menos de lote / por_segundo
+                if por_segundo and inicio_lote + lote < len(ids):
+                    espera = len(bloque) / por_segundo - (time.perf_counter() - inicio)
+                    if espera > 0:
+                        time.sleep(espera)
+        finally:
+            pool.shutdown(wait=True)
+            for sesion in sesiones:
+                sesion.disconnect()
+    return borrados, errores
+
+
+def limpiar(configuracion, simular=False, **cambios):
+    """
+    Lista todos los reportes, aplica la política de retención y borra el resto.
+
+    Returns:
+        dict resumen con listados, conservados, borrados, errores, filas, bytes
+        (None si no se pudo medir), segundos y simulado
+    """
+    reglas = politica(configuracion, **cambios)
+    inicio = time.perf_counter()
+    gmp = conectar(configuracion.get("user"), configuracion.get("password"))
+    try:
+        reportes = listar_reportes(gmp)
+    finally:
+        gmp.disconnect()
+    candidatos = seleccionar(reportes, reglas["mantener_por_tarea"], reglas["dias"])
+    print(f"[INFO] {len(reportes)} reportes en gvmd; se borran {len(candidatos)} "
+          f"(mantener_por_tarea={reglas['mantener_por_tarea']}, dias={reglas['dias']})")
+
+    tamanos = medir(configuracion, [reporte["id"] for reporte in candidatos])
+    resumen = {"listados": len(reportes), "conservados": len(reportes) - len(candidatos),
+               "simulado": simular, "errores": {}, "filas": 0, "bytes": None}
+    if simular:
+        for reporte in candidatos:
+            print(f"  {reporte['id']}  {reporte['task_name']}  "
+                  f"{datetime.datetime.fromtimestamp(reporte['fecha']):%Y-%m-%d %H:%M}")
+        borrados = [reporte["id"] for reporte in candidatos]
+    else:
+        if configuracion.get("archivo_reportes"):
+            # Solo se borran los reportes que ya están a salvo en el archivo local
+            from archivo_reportes import archivar_reportes
+            gmp = conectar(configuracion.get("user"), configuracion.get("password"))
+            try:
+                _, resumen["errores"] = archivar_reportes(gmp, candidatos)
+            finally:
+                gmp.disconnect()
+            candidatos = [reporte for reporte in candidatos if reporte["id"] not in resumen["errores"]]
+        borrados, errores = borrar(configuracion, candidatos, reglas["hilos"],
+                                   reglas["lote"], reglas["por_segundo"])
+        resumen["errores"].update(errores)
+
+    borrados = set(borrados)
+    resumen["borrados"] = len(borrados)
+    if tamanos is not None:
+        resumen["filas"] = sum(tamanos.get(report_id, (0, 0))[0] for report_id in borrados)
+        resumen["bytes"] = sum(tamanos.get(report_id, (0, 0))[1] for report_id in borrados)
+    else:
+        resumen["filas"] = sum(reporte["resultados"] for reporte in candidatos
+                               if reporte["id"] in borrados)
+    resumen["segundos"] = time.perf_counter() - inicio
+    imprimir_resumen(resumen)
+    return resumen
+
+
+def imprimir_resumen(resumen):
+    liberados = ("n/d" if resumen["bytes"] is None
+                 else f"{resumen['bytes'] / 1024 / 1024:.1f} MB")
+    accion = "Se borrarían" if resumen["simulado"] else "Borrados"
+    print(f"✓ {accion} {resumen['borrados']} reportes ({resumen['conservados']} conservados) en {resumen['segundos']:.1f} s: "
+          f"{resumen['filas']} filas, {liberados} liberados")
+    if resumen["errores"]:
+        print(f"⚠ {len(resumen['errores'])} reportes no se pudieron borrar")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Limpieza de reportes de gvmd con política de retención")
+    parser.add_argument("-c", "--config", default="/opt/gvm/Config/config.json",
+                        help="Ruta al fichero config.json")
+    parser.add_argument("--mantener", type=int, dest="mantener_por_tarea",
+                        help="Reportes más recientes a conservar por tarea")
+    parser.add_argument("--dias", type=int, help="Conservar los reportes de menos de X días")
+    parser.add_argument("--hilos", type=int, help="Sesiones GMP en paralelo")
+    parser.add_argument("--lote", type=int, help="Reportes por lote")
+    parser.add_argument("--por-segundo", type=float, dest="por_segundo",
+                        help="Máximo de borrados por segundo (0 = sin límite)")
+    parser.add_argument("--simular", action="store_true", help="Solo muestra qué se borraría")
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        configuracion = json.load(f)
+    resumen = limpiar(configuracion, simular=args.simular,
+                      mantener_por_tarea=args.mantener_por_tarea, dias=args.dias,
+                      hilos=args.hilos, lote=args.lote, por_segundo=args.por_segundo)
+    raise SystemExit(1 if resumen["errores"] else 0)
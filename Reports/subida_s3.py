@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Subida de ficheros al bucket S3 de Balbix/Valbix.
+
+Usado por upload-reports.py (línea de comandos) y por los scripts de reportes
+a través del despachador de subidas (despacho_subidas.py):
+
+- multipart ajustado (TRANSFER_CONFIG)
+- `HEAD` por fichero bajo el prefijo del conector: si el MD5/ETag coincide
+  con el fichero local no se vuelve a subir
+- un único cliente boto3 por proceso (es seguro entre hilos)
+"""
+import hashlib
+import os
+import time
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+from registro import tramo
+
+# Prefijo del conector de Balbix/Valbix en el bucket
+S3_PREFIX = "connectors/190/205/6d68d695-48f9-435a-90a7-8eada9b82f28/"
+
+# Multipart a partir de 8 MB, en partes de 16 MB y 8 hilos por fichero
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 16 * 1024 * 1024
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=MULTIPART_THRESHOLD,
+    multipart_chunksize=MULTIPART_CHUNKSIZE,
+    max_concurrency=8,
+    use_threads=True,
+)
+
+_cliente = None
+
+
+def awsConnect(aws_access_key_id, aws_secret_access_key):
+    awsconnect = boto3.client('s3', region_name='us-west-2', aws_access_key_id=aws_access_key_id,
+                              aws_secret_access_key=aws_secret_access_key)
+    return awsconnect
+
+
+def get_cliente(configuracion):
+    """Devuelve el cliente S3 del proceso, creándolo la primera vez."""
+    global _cliente
+    if _cliente is None:
+        _cliente = awsConnect(configuracion.get('aws_access_key_id'),
+                              configuracion.get('aws_secret_access_key'))
+    return _cliente
+
+
+def hashes_locales(file_name):
+    """
+    Devuelve (md5, etag) del fichero local. El ETag de S3 es el MD5 si se subió
+    en una sola parte, o el MD5 de los MD5 de cada parte + "-N" si fue multipart.
+    """
+    md5 = hashlib.md5()
+    partes = []
+    with open(file_name, 'rb') as f:
+        for bloque in iter(lambda: f.read(MULTIPART_CHUNKSIZE), b''):
+            md5.update(bloque)
+            partes.append(hashlib.md5(bloque).digest())
+    if os.path.getsize(file_name) < MULTIPART_THRESHOLD:
+        return md5.hexdigest(), md5.hexdigest()
+    etag = hashlib.md5(b''.join(partes)).hexdigest() + f"-{len(partes)}"
+    return md5.hexdigest(), etag
+
+
+def sin_cambios(s3, s3bucket, key, md5, etag):
+    """HEAD del objeto: True si ya existe con el mismo contenido."""
+    try:
+        cabecera = s3.head_object(Bucket=s3bucket, Key=key)
+    except ClientError as error:
+        if error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+    remoto = cabecera.get('ETag', '').strip('"')
+    return cabecera.get('Metadata', {}).get('md5') == md5 or remoto == etag
+
+
+def subir_fichero(s3bucket, file_name, s3, log=print):
+    """
+    Sube un fichero bajo el prefijo del conector si no está ya en el bucket.
+    Devuelve los bytes subidos (0 si se omitió); los errores se propagan.
+    """
+    key = S3_PREFIX + os.path.basename(file_name)
+    with tramo("s3.hash", fichero=os.path.basename(file_name)) as datos:
+        md5, etag = hashes_locales(file_name)
+        datos["bytes"] = os.path.getsize(file_name)
+    with tramo("s3.head_object", key=key):
+        omitir = sin_cambios(s3, s3bucket, key, md5, etag)
+    if omitir:
+        log(f"Sin cambios, se omite {file_name}")
+        return 0
+    tamano = os.path.getsize(file_name)
+    log(f"Subiendo fichero {file_name} ({tamano / 1024 / 1024:.1f} MB) ...")
+    inicio = time.perf_counter()
+    with tramo("s3.upload_file", key=key, bytes=tamano):
+        s3.upload_file(file_name, s3bucket, key, Config=TRANSFER_CONFIG,
+                       ExtraArgs={'Metadata': {'md5': md5}})
+    segundos = time.perf_counter() - inicio
+    log(f"Success {os.path.basename(file_name)}: {segundos:.1f} s, "
+        f"{tamano / 1024 / 1024 / max(segundos, 0.001):.1f} MB/s")
+    return tamano
@@ -1,15 +1,64 @@
 #!/usr/bin/env python3
+"""
+Subida de ficheros a SharePoint con Graph API (App-Only Auth).
+
+Se puede usar como script:
+
+    python3 subida_share.py -f archivo.csv -p PAIS -a carpeta_destino
+
+o importado desde los scripts de reportes, sin lanzar un proceso por fichero:
+
+    from subida_share import subir_fichero
+    subir_fichero("/ruta/archivo.csv", pais, "Openvas_Interno")
+
+El uploader se crea una vez por proceso y reutiliza:
+- el token de MSAL, con caché persistente en disco (TOKEN_CACHE) entre ejecuciones
+- el site-id y drive-id, guardados en IDS_CACHE (solo se piden a Graph la primera vez)
+- una `requests.Session` con conexiones persistentes
+
+Los ficheros de más de 4 MB se suben con una sesión de subida de Graph: se
+leen del disco por trozos de 10 MB (memoria constante), cada trozo se
+reintenta con espera exponencial y, si el proceso se interrumpe, la siguiente
+ejecución reanuda la sesión desde el último byte recibido.
+"""
 import sys
 import argparse
 import os
 from pathlib import Path
+import threading
+import time
 import requests
 import msal
 import os, json
 
-def lee_config(dato):
+CONFIG_PATH = "/opt/gvm/Config/config.json"
+
+# Cachés persistentes (contienen el token: solo legibles por el usuario)
+TOKEN_CACHE = "/opt/gvm/Config/.sharepoint_token_cache.json"
+IDS_CACHE = "/opt/gvm/Config/.sharepoint_ids.json"
+# Sesiones de subida en curso, para reanudar ficheros grandes interrumpidos
+SESIONES_CACHE = "/opt/gvm/Config/.sharepoint_sesiones.json"
+
+SITE_HOSTNAME = "atentoglobal.sharepoint.com"
+SITE_PATH = "/sites/RedTeam"   # Ruta de tu sitio
+GRAPH_URL = "https://graph.microsoft.com/v1.0"
+SCOPES = ["https://graph.microsoft.com/.default"]
+
+# Por encima de 4 MB, sesión de subida por trozos (múltiplos de 320 KiB)
+LIMITE_PUT_SIMPLE = 4 * 1024 * 1024
+TAMANO_TROZO = 32 * 320 * 1024
+REINTENTOS = 5
+
+
+class ErrorSharePoint(Exception):
+    """Error de autenticación o de Graph API durante la subida."""
+
+
+def lee_config(dato, configuracion=None):
+    if configuracion is not None:
+        return str(configuracion.get(dato, "SITE_NO_DEFINIDO"))
     try:
-        with open("/opt/gvm/Config/config.json", 'r') as archivo:
+        with open(CONFIG_PATH, 'r') as archivo:
             configuracion = json.load(archivo)
             return str(configuracion.get(dato, "SITE_NO_DEFINIDO"))
     except FileNotFoundError:
@@ -20,86 +69,245 @@ def lee_config(dato):
         return "ERROR_DESCONOCIDO"
 
 
+def _escribir_privado(ruta, contenido):
+    """Escribe un fichero de caché con permisos 600."""
+    descriptor = os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, "w") as f:
+        f.write(contenido)
 
-# ==== CONFIGURACIÓN ====
 
-SITE = (lee_config("site"))
-TENANT_ID = (lee_config("tenant_id"))
-CLIENT_ID = (lee_config("client_id"))
-CLIENT_SECRET = (lee_config("client_secret"))
+class SubidorSharePoint:
+    """Uploader a SharePoint reutilizable (token, ids y sesión HTTP compartidos)."""
 
-SITE_HOSTNAME = "atentoglobal.sharepoint.com"
-SITE_PATH = "/sites/RedTeam"   # Ruta de tu sitio
+    def __init__(self, configuracion=None, token_cache=TOKEN_CACHE, ids_cache=IDS_CACHE,
+                 sesiones=SESIONES_CACHE):
+        self.site = lee_config("site", configuracion)
+        self.tenant_id = lee_config("tenant_id", configuracion)
+        self.client_id = lee_config("client_id", configuracion)
+        self.client_secret = lee_config("client_secret", configuracion)
+        self.token_cache_path = token_cache
+        self.ids_cache_path = ids_cache
+        self.sesiones_path = sesiones
+        self.session = requests.Session()
+        self._app = None
+        self._cache = None
+        self._ids = None
+        self._bloqueo = threading.Lock()
 
+    # ==== AUTENTICACIÓN ====
+    def _aplicacion(self):
+        if self._app is None:
+            self._cache = msal.SerializableTokenCache()
+            if os.path.exists(self.token_cache_path):
+                with open(self.token_cache_path, "r") as f:
+                    self._cache.deserialize(f.read())
+            self._app = msal.ConfidentialClientApplication(
+                client_id=self.client_id,
+                client_credential=self.client_secret,
+                authority=f"https://login.microsoftonline.com/{self.tenant_id}",
+                token_cache=self._cache,
+            )
+        return self._app
 
-def informa(msg):
-    print (Color.GREEN + "[" + Color.RED + "+" + Color.GREEN + "] " +  msg)
-
-# ==== AUTENTICACIÓN ====
-def get_token():
-    """Obtiene un access_token con Client Credentials Flow"""
-    app = msal.ConfidentialClientApplication(
-        client_id=CLIENT_ID,
-        client_credential=CLIENT_SECRET,
-        authority=f"https://login.microsoftonline.com/{TENANT_ID}"
-    )
-    result = app.acquire_token_for_client(scopes=["https://graph.microsoft.com/.default"])
-    if "access_token" not in result:
-        print(f"[ERROR] No se pudo obtener token: {result}", file=sys.stderr)
-        sys.exit(1)
+    def get_token(self):
+        """Devuelve un access_token (de la caché de MSAL mientras no caduque)."""
+        result = self._aplicacion().acquire_token_for_client(scopes=SCOPES)
+        if "access_token" not in result:
+            raise ErrorSharePoint(f"No se pudo obtener token: {result}")
+        if self._cache.has_state_changed:
+            _escribir_privado(self.token_cache_path, self._cache.serialize())
+        return result["access_token"]
 
-    #print("Access_Token : " + result["access_token"])
-    return result["access_token"]
+    def _get(self, url):
+        resp = self.session.get(url, headers={"Authorization": f"Bearer {self.get_token()}"})
+        if resp.status_code != 200:
+            raise ErrorSharePoint(f"{url}: {resp.status_code} {resp.text}")
+        return resp.json()
 
-# ==== GRAPH HELPERS ====
-def get_site_id(token):
-    """Obtiene el site-id del sitio RedTeam"""
-    url = f"https://graph.microsoft.com/v1.0/sites/{SITE_HOSTNAME}:{SITE_PATH}"
-    resp = requests.get(url, headers={"Authorization": f"Bearer {token}"})
-    if resp.status_code != 200:
-        print(f"[ERROR] No se pudo obtener site-id: {resp.text}", file=sys.stderr)
-        sys.exit(1)
-    #print("Site_ID : " + resp.json()["id"])
-    return resp.json()["id"]
-
-def get_drive_id(token, site_id):
-    """Obtiene el drive-id de la biblioteca Documents"""
-    url = f"https://graph.microsoft.com/v1.0/sites/{site_id}/drives"
-    resp = requests.get(url, headers={"Authorization": f"Bearer {token}"})
-    if resp.status_code != 200:
-        print(f"[ERROR] No se pudo obtener drives: {resp.text}", file=sys.stderr)
-        sys.exit(1)
+    # ==== GRAPH HELPERS ====
+    def get_ids(self):
+        """Devuelve (site_id, drive_id), pidiéndolos a Graph solo si no están en caché."""
+        if self._ids is None and os.path.exists(self.ids_cache_path):
+            with open(self.ids_cache_path, "r") as f:
+                ids = json.load(f)
+            if ids.get("sitio") == f"{SITE_HOSTNAME}:{SITE_PATH}":
+                self._ids = (ids["site_id"], ids["drive_id"])
+        if self._ids is None:
+            site_id = self._get(f"{GRAPH_URL}/sites/{SITE_HOSTNAME}:{SITE_PATH}")["id"]
+            drives = self._get(f"{GRAPH_URL}/sites/{site_id}/drives").get("value", [])
+            drive_id = next((d["id"] for d in drives if d.get("name") in ["Documents"]), None)
+            if drive_id is None:
+                raise ErrorSharePoint("No se encontró la biblioteca 'Documents'")
+            self._ids = (site_id, drive_id)
+            _escribir_privado(self.ids_cache_path, json.dumps({
+                "sitio": f"{SITE_HOSTNAME}:{SITE_PATH}", "site_id": site_id, "drive_id": drive_id,
+            }))
+        return self._ids
 
-    drives = resp.json().get("value", [])
-    for d in drives:
-        if d.get("name") in ["Documents"]:
-            return d["id"]
+    def _olvidar_ids(self):
+        self._ids = None
+        if os.path.exists(self.ids_cache_path):
+            os.remove(self.ids_cache_path)
 
-    print("[ERROR] No se encontró la biblioteca 'Documents'", file=sys.stderr)
-    sys.exit(1)
- 
+    def _url_item(self, remote_path, file_name):
+        site_id, drive_id = self.get_ids()
+        return f"{GRAPH_URL}/sites/{site_id}/drives/{drive_id}/root:/{remote_path}/{file_name}:"
 
-def upload_file(token, site_id, drive_id, local_path, remote_path, overwrite=False):
-    """Sube archivo a SharePoint usando Graph API"""
-    file_name = Path(local_path).name
-    with open(local_path, "rb") as f:
-        data = f.read()
+    def _con_ids(self, peticion):
+        """
+        Ejecuta `peticion()`; si Graph devuelve 404 (ids en caché
+        obsoletos: sitio o biblioteca recreados) los pide de nuevo una vez.
+        """
+        resp = peticion()
+        if resp.status_code == 404:
+            self._olvidar_ids()
+            resp = peticion()
+        return resp
 
-    url = f"https://graph.microsoft.com/v1.0/sites/{site_id}/drives/{drive_id}/root:/{remote_path}/{file_name}:/content"
+    def upload_file(self, local_path, remote_path, overwrite=True):
+        """
+        Sube un archivo a `remote_path` y devuelve su webUrl.
+        Hasta LIMITE_PUT_SIMPLE se usa un PUT; por encima, una sesión de subida.
+        """
+        file_name = Path(local_path).name
+        conflicto = "replace" if overwrite else "fail"
+        if os.path.getsize(local_path) > LIMITE_PUT_SIMPLE:
+            return self._upload_sesion(local_path, remote_path, file_name, conflicto)
 
-    if not overwrite:
-        url += "?@microsoft.graph.conflictBehavior=fail"
-    else:
-        url += "?@microsoft.graph.conflictBehavior=replace"
+        def peticion():
+            url = f"{self._url_item(remote_path, file_name)}/content?@microsoft.graph.conflictBehavior={conflicto}"
+            with open(local_path, "rb") as f:
+                return self.session.put(url, headers={"Authorization": f"Bearer {self.get_token()}"}, data=f)
 
-    headers = {"Authorization": f"Bearer {token}"}
-    resp = requests.put(url, headers=headers, data=data)
+        resp = self._con_ids(peticion)
+        if resp.status_code not in (200, 201):
+            raise ErrorSharePoint(f"Falló subida: {resp.status_code} {resp.text}")
+        return resp.json()["webUrl"]
 
-    if resp.status_code not in (200, 201):
-        print(f"[ERROR] Falló subida: {resp.status_code} {resp.text}", file=sys.stderr)
-        sys.exit(1)
+    # ==== SESIONES DE SUBIDA (ficheros grandes) ====
+    def _leer_sesiones(self):
+        if not os.path.exists(self.sesiones_path):
+            return {}
+        with open(self.sesiones_path, "r") as f:
+            return json.load(f)
+
+    def _guardar_sesion(self, clave, upload_url):
+        # Varias subidas en paralelo comparten el fichero de sesiones
+        with self._bloqueo:
+            sesiones = self._leer_sesiones()
+            if upload_url is None:
+                sesiones.pop(clave, None)
+            else:
+                sesiones[clave] = upload_url
+            _escribir_privado(self.sesiones_path, json.dumps(sesiones))
+
+    def _siguiente_byte(self, upload_url):
+        """Primer byte pendiente de una sesión existente (None si ya no es válida)."""
+        try:
+            resp = self.session.get(upload_url, timeout=60)
+        except requests.RequestException:
+            return None
+        if resp.status_code != 200:
+            return None
+        rangos = resp.json().get("nextExpectedRanges") or ["0-"]
+        return int(rangos[0].split("-")[0])
+
+    def _crear_sesion(self, remote_path, file_name, conflicto):
+        cuerpo = {"item": {"@microsoft.graph.conflictBehavior": conflicto}}
+
+        def peticion():
+            return self.session.post(f"{self._url_item(remote_path, file_name)}/createUploadSession",
+                                     headers={"Authorization": f"Bearer {self.get_token()}"}, json=cuerpo)
+
+        resp = self._con_ids(peticion)
+        if resp.status_code != 200:
+            raise ErrorSharePoint(f"No se pudo crear la sesión de subida: {resp.status_code} {resp.text}")
+        return resp.json()["uploadUrl"]
+
+    def _enviar_trozo(self, upload_url, datos, inicio, total):
+        """PUT de un trozo con reintentos y espera exponencial. Devuelve la respuesta."""
+        fin = inicio + len(datos) - 1
+        cabeceras = {"Content-Length": str(len(datos)), "Content-Range": f"bytes {inicio}-{fin}/{total}"}
+        for intento in range(REINTENTOS):
+            try:
+                # La uploadUrl ya va firmada: no lleva cabecera Authorization
+                resp = self.session.put(upload_url, headers=cabeceras, data=datos, timeout=300)
+                if resp.status_code in (200, 201, 202):
+                    return resp
+                if resp.status_code not in (429, 500, 502, 503, 504):
+                    raise ErrorSharePoint(f"Falló el trozo {inicio}-{fin}: {resp.status_code} {resp.text}")
+                espera = int(resp.headers.get("Retry-After", 2 ** intento))
+            except requests.RequestException as e:
+                espera = 2 ** intento
+                print(f"[WARNING] Error de red en el trozo {inicio}-{fin} ({e})")
+            print(f"[INFO] Reintentando trozo {inicio}-{fin} en {espera} s ({intento + 1}/{REINTENTOS})")
+            time.sleep(espera)
+        raise ErrorSharePoint(f"Trozo {inicio}-{fin} sin respuesta tras {REINTENTOS} intentos")
+
+    def _upload_sesion(self, local_path, remote_path, file_name, conflicto):
+        """
+        Sube un fichero grande por trozos de TAMANO_TROZO leídos del disco.
+        Si una ejecución anterior quedó a medias, se reanuda su sesión.
+        """
+        total = os.path.getsize(local_path)
+        estado = os.stat(local_path)
+        clave = f"{remote_path}/{file_name}|{total}|{int(estado.st_mtime)}"
+
+        upload_url = self._leer_sesiones().get(clave)
+        inicio = self._siguiente_byte(upload_url) if upload_url else None
+        if inicio is None:
+            upload_url = self._crear_sesion(remote_path, file_name, conflicto)
+            inicio = 0
+        else:
+            print(f"[INFO] Reanudando subida de {file_name} desde {inicio / 1024 / 1024:.1f} MB")
+        self._guardar_sesion(clave, upload_url)
+
+        with open(local_path, "rb") as f:
+            while True:
+                f.seek(inicio)
+                datos = f.read(TAMANO_TROZO)
+                resp = self._enviar_trozo(upload_url, datos, inicio, total)
+                print(f"[INFO] {file_name}: {min(inicio + len(datos), total) * 100 // total}% "
+                      f"({min(inicio + len(datos), total) / 1024 / 1024:.1f}/{total / 1024 / 1024:.1f} MB)")
+                if resp.status_code in (200, 201):
+                    break
+                # Graph indica el siguiente rango que espera
+                rangos = resp.json().get("nextExpectedRanges") or [f"{inicio + len(datos)}-"]
+                inicio = int(rangos[0].split("-")[0])
+
+        self._guardar_sesion(clave, None)
+        return resp.json()["webUrl"]
+
+    def subir(self, local_path, pais, automatizacion, overwrite=True):
+        """Sube un archivo a General/Subidas/<pais>/<automatizacion>/<site>."""
+        remote_path = f"General/Subidas/{pais}/{automatizacion}/{self.site}"
+        return self.upload_file(str(local_path), remote_path, overwrite=overwrite)
+
+
+_subidor = None
+
+
+def get_subidor(configuracion=None):
+    """Devuelve el uploader del proceso, creándolo la primera vez."""
+    global _subidor
+    if _subidor is None:
+        _subidor = SubidorSharePoint(configuracion)
+    return _subidor
+
+
+def subir_fichero(local_path, pais, automatizacion, configuracion=None):
+    """
+    Sube un fichero a SharePoint desde otro script.
+    Devuelve True si se subió; los errores se imprimen y devuelven False.
+    """
+    try:
+        web_url = get_subidor(configuracion).subir(local_path, pais, automatizacion)
+        print(f"[OK] Archivo subido: {web_url}")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Fallo subida {os.path.basename(str(local_path))}: {e}", file=sys.stderr)
+        return False
 
-    print(f"[OK] Archivo subido: {resp.json()['webUrl']}")
 
 # ==== MAIN ====
 def main():
@@ -115,17 +323,8 @@ def main():
         print(f"[ERROR] Archivo no encontrado: {lp}", file=sys.stderr)
         sys.exit(1)
 
-    # Construir ruta de destino en SharePoint
-    remote_path = f"General/Subidas/{args.pais}/{args.automatizacion}/{SITE}"
-
-    # Obtener token y site/drive ids
-    token = get_token()
-    site_id = get_site_id(token)
-    drive_id = get_drive_id(token, site_id)
-
-    #print(f"[INFO] Subiendo {lp} a {remote_path} (site={site_id}, drive={drive_id})")
-    upload_file(token, site_id, drive_id, str(lp), remote_path, overwrite=True)
+    if not subir_fichero(lp, args.pais, args.automatizacion):
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
-
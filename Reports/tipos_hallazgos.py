@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Representación compacta en memoria de los DataFrames de hallazgos.
+
+Las columnas de texto repetitivo (NVT Name, Summary, Solution, Hostname,
+Region, Country...) se cargan y se mantienen como categorías, la IP como
+entero uint32 (si todas son IPv4) y el CVSS como float32. Solo se vuelve a
+los tipos del CSV de gvmd en el momento de serializar (para_serializar).
+
+Para medir memoria y tiempo de carga sobre una exportación real:
+
+    python3 tipos_hallazgos.py /opt/gvm/Reports/exports/2026_01_30_10_30.csv
+"""
+import ipaddress
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+COLUMNAS_CATEGORIA = [
+    "Hostname", "Port Protocol", "NVT Name", "Summary", "Solution", "CVEs",
+    "sistema_operativo", "Region", "Country", "Scope", "Process", "Owner",
+    "solucion_propuesta", "issue_type_severity", "cvss_vector", "cert_refs",
+]
+
+# Tipos para pd.read_csv de los CSV de gvmd ("CSV Results") y los unificados
+DTYPES_LECTURA = {columna: "category" for columna in COLUMNAS_CATEGORIA}
+DTYPES_LECTURA["CVSS"] = "float32"
+DTYPES_LECTURA["IP"] = "category"
+# Igual que la ingesta XML: entero con NA para el puerto "general"
+DTYPES_LECTURA["Port"] = "Int32"
+
+
+def ip_a_entero(serie):
+    """
+    Convierte una columna de IPs en texto a uint32.
+    Si alguna no es IPv4 se devuelve la columna como categoría.
+
+    Solo se convierten los valores únicos (categorías); las filas se
+    resuelven con sus códigos.
+    """
+    categorica = serie.astype("category")
+    codigos = categorica.cat.codes.to_numpy()
+    enteros = []
+    for ip in categorica.cat.categories:
+        try:
+            direccion = ipaddress.ip_address(str(ip).strip())
+        except ValueError:
+            return categorica
+        if direccion.version != 4:
+            return categorica
+        enteros.append(int(direccion))
+    if len(codigos) and codigos.min() < 0:
+        return categorica
+    valores = np.asarray(enteros, dtype=np.uint32)[codigos]
+    return pd.Series(valores, index=serie.index, dtype=np.uint32)
+
+
+def ip_a_texto(serie):
+    """Convierte una columna IP uint32 a texto (a.b.c.d) para serializar."""
+    if not pd.api.types.is_integer_dtype(serie):
+        return serie.astype(object)
+    unicos, inversa = np.unique(serie.to_numpy(dtype=np.uint32), return_inverse=True)
+    texto = np.array([str(ipaddress.IPv4Address(int(ip))) for ip in unicos], dtype=object)
+    return pd.Series(texto[inversa], index=serie.index, dtype=object)
+
+
+def compactar(df):
+    """Convierte un DataFrame de hallazgos a la representación compacta."""
+    df = df.copy()
+    for columna in COLUMNAS_CATEGORIA:
+        if columna in df.columns and not isinstance(df[columna].dtype, pd.CategoricalDtype):
+            df[columna] = df[columna].astype("category")
+    if "CVSS" in df.columns:
+        df["CVSS"] = pd.to_numeric(df["CVSS"], errors="coerce").astype(np.float32)
+    if "IP" in df.columns and not pd.api.types.is_integer_dtype(df["IP"]):
+        df["IP"] = ip_a_entero(df["IP"])
+    return df
+
+
+def leer_csv(fichero):
+    """Lee un CSV de hallazgos directamente en la representación compacta."""
+    df = pd.read_csv(fichero, dtype=DTYPES_LECTURA)
+    df["IP"] = ip_a_entero(df["IP"])
+    return df
+
+
+def concatenar(dataframes):
+    """
+    pd.concat que conserva las categorías: unifica antes las categorías de
+    cada columna (si no, pandas vuelve a object) y la representación de la IP.
+    """
+    dataframes = [df.copy() for df in dataframes]
+    if not all(pd.api.types.is_integer_dtype(df["IP"]) for df in dataframes if "IP" in df):
+        for df in dataframes:
+            if "IP" in df:
+                df["IP"] = ip_a_texto(df["IP"]).astype("category")
+    columnas = set(COLUMNAS_CATEGORIA) | {"IP"}
+    for columna in columnas:
+        series = [df[columna] for df in dataframes if columna in df]
+        if len(series) != len(dataframes) or len(series) < 2:
+            continue
+        if not all(isinstance(s.dtype, pd.CategoricalDtype) for s in series):
+            continue
+        categorias = union_categoricals([s.array for s in series]).categories
+        for df in dataframes:
+            df[columna] = df[columna].cat.set_categories(categorias)
+    return pd.concat(dataframes, ignore_index=True)
+
+
+def para_serializar(df):
+    """Devuelve una copia con IP en texto y CVSS con un decimal, como el CSV de gvmd."""
+    df = df.copy()
+    if "IP" in df.columns:
+        df["IP"] = ip_a_texto(df["IP"])
+    if "CVSS" in df.columns:
+        df["CVSS"] = df["CVSS"].astype(float).round(1)
+    return df
+
+
+def memoria_mb(df):
+    """Memoria real del DataFrame (incluye el contenido de los strings)."""
+    return df.memory_usage(deep=True).sum() / 1024 / 1024
+
+
+def medir(fichero):
+    """Compara memoria y tiempo de carga + deduplicado entre object y compacto."""
+    inicio = time.perf_counter()
+    original = pd.read_csv(fichero)
+    original = original.drop_duplicates()
+    tiempo_original = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    compacto = leer_csv(fichero)
+    compacto = compacto.drop_duplicates()
+    tiempo_compacto = time.perf_counter() - inicio
+
+    print(f"Filas: {len(original)}")
+    print(f"Original (object): {memoria_mb(original):9.1f} MB  {tiempo_original:6.2f} s")
+    print(f"Compacto:          {memoria_mb(compacto):9.1f} MB  {tiempo_compacto:6.2f} s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Uso: python3 tipos_hallazgos.py <export.csv>")
+        sys.exit(1)
+    medir(sys.argv[1])
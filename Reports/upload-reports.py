@@ -3,7 +3,7 @@
 import boto3
 import awscli
 import os, json
-from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import sys
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -12,6 +12,13 @@ from email import encoders
 import smtplib
 import subprocess
 import datetime
+import time
+from subida_s3 import awsConnect, subir_fichero
+from metricas import configurar as configurar_metricas, fijar, incrementar, observar
+from registro import configurar as configurar_registro
+
+# Ficheros subidos a la vez
+MAX_SUBIDAS = 4
 
 def leer_configuracion():
     try:
@@ -26,44 +33,32 @@ def leer_configuracion():
         print(f"Ocurrió un error: {e}")
 
 
-def write_log(mensaje, log):
-    mensaje_tiempo=f"{datetime.datetime.now()} - {mensaje}\n"
-    with open(log, "a") as archivo:
-        archivo.write(mensaje_tiempo)
-        print(mensaje_tiempo)
-
 def awsResource(aws_access_key_id, aws_secret_access_key): 
     session = boto3.Session(aws_access_key_id=aws_access_key_id,aws_secret_access_key=aws_secret_access_key)
     return session
 
-def awsConnect(aws_access_key_id, aws_secret_access_key):
-    #global accessKey, secretKey
-    awsconnect=boto3.client('s3',region_name='us-west-2',aws_access_key_id=aws_access_key_id,aws_secret_access_key=aws_secret_access_key)
-    return awsconnect
+def uploadfile(s3bucket, filelist, log, s3):
+    """Sube los ficheros en paralelo; devuelve la lista de ficheros con error."""
+    errores = []
 
-def listbucket(s3bucket, tasklog, session):
-    
-    s3 = session.resource('s3')
-    try:
-        my_bucket = s3.Bucket(s3bucket)
-        for my_bucket_object in my_bucket.objects.all():
-            #print(my_bucket_object.key)
-            for file_name in fileList:
-                file=os.path.basename(file_name)
-                if file in my_bucket_object.key:
-                    write_log(f"El fichero '{file}' se encuentra en el objeto '{my_bucket_object.key}'", tasklog)
-    except Exception as error:
-        print (error)  
-
-
-def uploadfile(s3bucket, filelist, tasklog, s3):
-    for file_name in filelist:
-        write_log(f"Subiendo fichero {file_name} ...", tasklog)
+    def subir(file_name):
+        inicio = time.perf_counter()
         try:
-            test = s3.upload_file(file_name,s3bucket,"connectors/190/205/6d68d695-48f9-435a-90a7-8eada9b82f28/"+os.path.basename(file_name))
-            write_log("Success", tasklog)    
-        except Exception as error:
-            print (error)
+            return subir_fichero(s3bucket, file_name, s3, log.info)
+        finally:
+            observar("openvas_subida_segundos", time.perf_counter() - inicio, destino="s3")
+
+    with ThreadPoolExecutor(max_workers=MAX_SUBIDAS) as executor:
+        futuros = {executor.submit(subir, file_name): file_name for file_name in filelist}
+        for futuro in as_completed(futuros):
+            try:
+                incrementar("openvas_bytes_subidos_total", futuro.result(), destino="s3")
+                incrementar("openvas_subidas_total", destino="s3", resultado="ok")
+            except Exception as error:
+                incrementar("openvas_subidas_total", destino="s3", resultado="error")
+                errores.append(futuros[futuro])
+                log.error(f"Error subiendo {futuros[futuro]}: {error}", fichero=futuros[futuro])
+    return errores
             
 def email(file1, configuracion):
     file_name=os.path.basename(file1)
@@ -116,21 +111,22 @@ def email(file1, configuracion):
         # Cierra la conexión
         smtp.quit()
 
-def procesarFicheros(s3bucket, tasklog, s3):
-    session = awsResource(aws_access_key_id, aws_secret_access_key)
-    listbucket(s3bucket, tasklog, session)
-    uploadfile(s3bucket, fileList, tasklog, s3)
+def procesarFicheros(s3bucket, log, s3):
+    return uploadfile(s3bucket, fileList, log, s3)
 
 if __name__ == '__main__':
     logbalbix='/opt/gvm/logbalbix.txt'
     configuracion=leer_configuracion()
+    log = configurar_registro(logbalbix, configuracion)
+    configurar_metricas(configuracion)
+    fijar("openvas_ultima_ejecucion_timestamp", time.time(), script="upload-reports")
     aws_access_key_id=configuracion.get('aws_access_key_id')
     aws_secret_access_key=configuracion.get('aws_secret_access_key')
     s3bucket=configuracion.get('s3bucket')
 
     fileList = sys.argv[1:]
     #fileList = ["/home/redteam/gvm/Reports/exports/vulns_host/2024_03_19_10_30_CVE.csv","/home/redteam/gvm/Reports/exports/vulns_host/2024_03_19_10_30_Misconfigs.csv"]
-    write_log(str(fileList), logbalbix)
+    log.info(f"{len(fileList)} ficheros a subir", ficheros=fileList)
     print(fileList)
     
     if not fileList:
@@ -139,8 +135,11 @@ if __name__ == '__main__':
     
 
     s3=awsConnect(aws_access_key_id, aws_secret_access_key)
-    procesarFicheros(s3bucket, logbalbix, s3)
-    #eliminamos ficheros
+    errores = procesarFicheros(s3bucket, log, s3)
+    #eliminamos ficheros (solo si todas las subidas se confirmaron)
+    if errores:
+        log.error(f"No se ejecuta delete-files.py: {len(errores)} ficheros sin subir", ficheros=errores)
+        sys.exit(1)
     subprocess.run(["python3", "/opt/gvm/Targets_Tasks/delete-files.py"])
     #email(logbalbix, configuracion)
 
@@ -1,10 +1,12 @@
-from gvm.connections import TLSConnection
-from gvm.protocols.gmp import Gmp
-import xml.etree.ElementTree as ET
 import getpass
-import os, glob
+import os, glob, sys
 import json
 
+# Motor de limpieza con retención (Reports/retencion_reportes.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Reports"))
+from retencion_reportes import limpiar
+from mantenimiento_gvmd import mantener
+
 def leer_configuracion():
     try:
         with open('/opt/gvm/Config/config.json', 'r') as archivo:
@@ -22,42 +24,30 @@ def get_pass():
     return password
 
 configuracion = leer_configuracion()
-user = configuracion.get('user')
-password = configuracion.get('password')
-# Usar TLS en lugar de Unix Socket (compatible con Docker)
-connection = TLSConnection(hostname="127.0.0.1", port=9390)
-
-# using the with statement to automatically connect and disconnect to gvmd
-with Gmp(connection=connection) as gmp:
-    response = gmp.get_version()
-    print(response)
-    gmp.authenticate(user,password)
-    respuesta = gmp.get_reports(filter_string='rows=1000')
-    root = ET.fromstring(respuesta)
-    reports = root.findall(".//report")
-    for report in reports:
-        report_id = report.get("id")
-        task = report.find(".//task")
-        task_id = task.get("id")
-        task_name = task.find("name").text
-        print("Reporte a borrar")
-        print("Report ID:", report_id)
-        print("Task ID:", task_id)
-        print("Task Name:", task_name)
-        respuesta= gmp.delete_report(report_id)
-        print(respuesta)
-    if os.path.exists('/opt/gvm/tasksend.txt'):
-        os.remove('/opt/gvm/tasksend.txt')
-    if os.path.exists('/opt/gvm/taskslog.txt'):
-        os.remove('/opt/gvm/taskslog.txt')
-    if os.path.exists('/opt/gvm/logbalbix.txt'):
-        os.remove('/opt/gvm/logbalbix.txt')
-    dir_csv = '/opt/gvm/Reports/exports/'
-    csv_files = glob.glob(os.path.join(dir_csv, '*.csv'))
-    for csv_file in csv_files:
-        try:
-            os.remove(csv_file)
-            print(f'Se ha borrado el archivo: {csv_file}')
-        except OSError as e:
-            print(f'Error al borrar el archivo {csv_file}: {e.strerror}')
 
+# Todos los reportes (paginados) según la política "retencion_reportes",
+# borrados en lotes paralelos con límite de ritmo
+resumen = limpiar(configuracion)
+
+# Tras el borrado masivo (ya sin tareas activas): mantenimiento de la BD de gvmd
+if resumen["borrados"]:
+    mantener(configuracion, borrados=resumen["borrados"])
+
+if os.path.exists('/opt/gvm/tasksend.txt'):
+    os.remove('/opt/gvm/tasksend.txt')
+if os.path.exists('/opt/gvm/taskslog.txt'):
+    os.remove('/opt/gvm/taskslog.txt')
+if os.path.exists('/opt/gvm/logbalbix.txt'):
+    os.remove('/opt/gvm/logbalbix.txt')
+dir_csv = '/opt/gvm/Reports/exports/'
+csv_files = glob.glob(os.path.join(dir_csv, '*.csv*'))
+for csv_file in csv_files:
+    try:
+        os.remove(csv_file)
+        print(f'Se ha borrado el archivo: {csv_file}')
+    except OSError as e:
+        print(f'Error al borrar el archivo {csv_file}: {e.strerror}')
+
+# Si quedaron reportes sin borrar, código 1: la bandeja de subidas reintentará la limpieza
+if resumen["errores"]:
+    sys.exit(1)
@@ -6,14 +6,55 @@ import xml.etree.ElementTree as ET
 import subprocess
 import sys
 import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-from gvm.connections import TLSConnection
-from gvm.protocols.gmp import Gmp
+# Módulos compartidos de Reports/ (subida a SharePoint, sesión GMP)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Reports"))
+from subida_share import subir_fichero
+from perfilado import iniciar as iniciar_perfilado, etapa
+from retencion_reportes import conectar
 
-def export_targets_csv(config_path: str, csv_path: str, page_size: int = 1000) -> None:
+
+def _filas_pagina(gmp, start: int, page_size: int):
+    """
+    Pide una página de targets y la convierte en filas Titulo;Rango;Desc.
+    El XML se descarta en cuanto se han extraído las filas.
+
+    Returns:
+        tuple (filas, número de targets de la página, total filtrado o None)
+    """
+    # sort=name: todas las conexiones ven el mismo orden al paginar en paralelo
+    filter_str = f"first={start} rows={page_size} sort=name"
+    root = ET.fromstring(gmp.get_targets(filter_string=filter_str))
+    targets = root.findall('target')
+    filas = []
+    for target in targets:
+        titulo = " ".join((target.findtext("name") or "").split())
+        rangos_str = (target.findtext("hosts") or "").strip()
+        desc = " ".join((target.findtext("comment") or "").split())
+
+        # Dividir rangos por comas y crear una fila por cada rango
+        rangos = [r.strip() for r in rangos_str.split(',') if r.strip()]
+        if rangos:
+            filas.extend([titulo, rango, desc] for rango in rangos)
+        else:
+            # Si no hay rangos, escribir una fila vacía
+            filas.append([titulo, "", desc])
+    total = root.findtext("target_count/filtered")
+    root.clear()
+    return filas, len(targets), int(total) if total else None
+
+
+def export_targets_csv(config_path: str, csv_path: str, page_size: int = 1000, workers: int = 4) -> int:
     """
     Exporta todos los targets de OpenVAS en formato CSV, evitando el límite de 1 000 filas
     mediante paginación. El CSV tendrá columnas Titulo;Rango;Desc.
+
+    La primera página da el total de targets (<target_count><filtered>); el resto
+    se piden en paralelo, una sesión GMP por hilo, y cada página se escribe en
+    orden en cuanto llega. En memoria solo hay unas pocas páginas a la vez.
     """
     # Cargar credenciales
     with open(config_path, 'r', encoding='utf-8') as f:
@@ -21,55 +62,71 @@ def export_targets_csv(config_path: str, csv_path: str, page_size: int = 1000) -
     user = config.get("user")
     password = config.get("password")
 
-    # Conexión TLS (compatible con Docker y entornos locales)
-    connection = TLSConnection(hostname="127.0.0.1", port=9390)
-
-    all_targets = []
-    with Gmp(connection=connection) as gmp:
-        gmp.authenticate(user, password)
-        start = 1
-        while True:
-            # Pedimos un bloque de targets con el filtro first/rows
-            filter_str = f"first={start} rows={page_size}"
-            response_xml = gmp.get_targets(filter_string=filter_str)
-            root = ET.fromstring(response_xml)
-            targets = root.findall('.//target')
-
-            # Añadir a la lista global
-            all_targets.extend(targets)
-            # Si recibimos menos de page_size, no hay más páginas
-            if len(targets) < page_size:
-                break
-            # Avanzar al siguiente bloque
-            start += page_size
-
-    # Escribir el CSV
+    total_targets = 0
     with open(csv_path, 'w', newline='', encoding='utf-8') as f_out:
         writer = csv.writer(f_out, delimiter=';')
         writer.writerow(["Titulo", "Rango", "Desc"])
-        for target in all_targets:
-            titulo = (target.findtext("name") or "").strip()
-            rangos_str = (target.findtext("hosts") or "").strip()
-            desc = (target.findtext("comment") or "").strip()
-            titulo = " ".join(titulo.split())
-            desc = " ".join(desc.split())
-            
-            # Dividir rangos por comas y crear una fila por cada rango
-            if rangos_str:
-                rangos = [r.strip() for r in rangos_str.split(',') if r.strip()]
-                for rango in rangos:
-                    writer.writerow([titulo, rango, desc])
-            else:
-                # Si no hay rangos, escribir una fila vacía
-                writer.writerow([titulo, "", desc])
-    
-    return len(all_targets)
+
+        gmp = conectar(user, password)
+        try:
+            filas, recibidos, total = _filas_pagina(gmp, 1, page_size)
+            writer.writerows(filas)
+            total_targets += recibidos
+
+            if total is None:
+                # Sin total en la respuesta: paginación secuencial hasta una página incompleta
+                start = 1
+                while recibidos == page_size:
+                    start += page_size
+                    filas, recibidos, _ = _filas_pagina(gmp, start, page_size)
+                    writer.writerows(filas)
+                    total_targets += recibidos
+                return total_targets
+        finally:
+            gmp.disconnect()
+
+        inicios = list(range(1 + page_size, total + 1, page_size))
+        if not inicios:
+            return total_targets
+        print(f"[INFO] {total} targets en {len(inicios) + 1} páginas, {workers} conexiones en paralelo")
+
+        # Una sesión GMP por hilo, reutilizada entre páginas
+        local = threading.local()
+        sesiones = []
+        sesiones_lock = threading.Lock()
+
+        def pedir(start):
+            if not hasattr(local, "gmp"):
+                local.gmp = conectar(user, password)
+                with sesiones_lock:
+                    sesiones.append(local.gmp)
+            return _filas_pagina(local.gmp, start, page_size)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export-target") as pool:
+            try:
+                # Ventana acotada de páginas en vuelo: se escriben en orden y se descartan
+                pendientes = deque()
+                for start in inicios:
+                    pendientes.append(pool.submit(pedir, start))
+                    if len(pendientes) >= workers * 2:
+                        filas, recibidos, _ = pendientes.popleft().result()
+                        writer.writerows(filas)
+                        total_targets += recibidos
+                while pendientes:
+                    filas, recibidos, _ = pendientes.popleft().result()
+                    writer.writerows(filas)
+                    total_targets += recibidos
+            finally:
+                pool.shutdown(wait=True)
+                for sesion in sesiones:
+                    sesion.disconnect()
+
+    return total_targets
 
 def upload_to_sharepoint(csv_path: str, config_path: str) -> bool:
     """
-    Sube el CSV exportado a SharePoint usando subida_share.py
-    NOTA: subida_share.py lee el config de /opt/gvm/Config/config.json
-          así que solo funciona si ese archivo tiene las credenciales correctas
+    Sube el CSV exportado a SharePoint con el uploader de subida_share.py,
+    en el mismo proceso y con las credenciales del config indicado.
     """
     # Cargar config para obtener país
     with open(config_path, 'r', encoding='utf-8') as f:
@@ -81,33 +138,8 @@ def upload_to_sharepoint(csv_path: str, config_path: str) -> bool:
         print(f"[ERROR] No se encuentra el archivo: {csv_path}", file=sys.stderr)
         return False
     
-    # Ruta al script de subida
-    subida_script = "/opt/gvm/Reports/subida_share.py"
-    if not os.path.isfile(subida_script):
-        print(f"[ERROR] No se encuentra subida_share.py: {subida_script}", file=sys.stderr)
-        return False
-    
-    # IMPORTANTE: subida_share.py lee /opt/gvm/Config/config.json automáticamente
-    # Si estás usando un config diferente (-c), la subida puede fallar
-    if config_path != "/opt/gvm/Config/config.json":
-        print(f"[WARNING] Usando config no estándar: {config_path}")
-        print(f"[WARNING] subida_share.py leerá /opt/gvm/Config/config.json para credenciales SharePoint")
-    
-    # Ejecutar subida_share.py
     print(f"[INFO] Subiendo {csv_path} a SharePoint...")
-    result = subprocess.run([
-        "python3", subida_script,
-        "-f", csv_path,
-        "-p", pais,
-        "-a", "Targets_Export"
-    ], capture_output=True, text=True)
-    
-    if result.returncode == 0:
-        print(result.stdout)
-        return True
-    else:
-        print(f"[ERROR] Fallo al subir a SharePoint: {result.stderr}", file=sys.stderr)
-        return False
+    return subir_fichero(csv_path, pais, "Targets_Export", config)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -129,21 +161,36 @@ if __name__ == "__main__":
         default=1000,
         help="Número de elementos a solicitar en cada página (no debe superar el límite Max Rows Per Page)"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Conexiones GMP en paralelo para pedir las páginas (por defecto: 4)"
+    )
     parser.add_argument(
         "--no-upload",
         action="store_true",
         help="NO subir el CSV a SharePoint (por defecto siempre sube)"
     )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Perfila la ejecución (cProfile + tracemalloc); el perfil se guarda junto al CSV"
+    )
     args = parser.parse_args()
+    if args.profile:
+        iniciar_perfilado("export-target", os.path.dirname(os.path.abspath(args.output)))
     
     # Exportar targets
     print(f"[INFO] Exportando targets desde OpenVAS...")
-    num_targets = export_targets_csv(args.config, args.output, args.page_size)
+    with etapa("exportacion"):
+        num_targets = export_targets_csv(args.config, args.output, args.page_size, args.workers)
     print(f"[OK] Exportados {num_targets} targets a {args.output}")
     
     # Subir a SharePoint (siempre, excepto si se usa --no-upload)
     if not args.no_upload:
-        success = upload_to_sharepoint(args.output, args.config)
+        with etapa("subida"):
+            success = upload_to_sharepoint(args.output, args.config)
         if success:
             print("[OK] Exportación y subida completadas exitosamente")
             sys.exit(0)
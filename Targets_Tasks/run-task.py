@@ -4,13 +4,20 @@ import xml.etree.ElementTree as ET
 import getpass
 import datetime
 import smtplib
-import os, json
+import os, json, sys
 import subprocess
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
 
+# Mantenimiento de la BD de gvmd tras borrados masivos (Reports/mantenimiento_gvmd.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Reports"))
+from mantenimiento_gvmd import lock_activo, mantener, registrar_borrados
+from metricas import configurar as configurar_metricas, fijar, incrementar, reemplazar
+from registro import GmpRegistrado, configurar as configurar_registro
+from perfilado import activo as perfilando, desde_argv as perfilado_desde_argv, etapa
+
 def leer_configuracion():
     try:
         with open('/opt/gvm/Config/config.json', 'r') as archivo:
@@ -68,12 +75,6 @@ def get_pass():
     password = getpass.getpass(prompt="Enter password: ")
     return password
 
-def write_log(mensaje, log):
-    mensaje_tiempo=f"{datetime.datetime.now()} - {mensaje}\n"
-    with open(log, "a") as archivo:
-        archivo.write(mensaje_tiempo)
-        print(mensaje_tiempo)
-        
 def email(file1, file2, configuracion):
     smtp_server = configuracion.get('mailserver')
     smtp_user = configuracion.get('smtp_user')
@@ -133,6 +134,15 @@ def email(file1, file2, configuracion):
         # Cierra la conexión
         smtp.quit()
 
+def segundos_escaneo(scan_start, scan_end):
+    """Duración en segundos entre dos fechas ISO 8601 de GMP (None si falta alguna)."""
+    try:
+        inicio = datetime.datetime.fromisoformat(scan_start.replace("Z", "+00:00"))
+        fin = datetime.datetime.fromisoformat(scan_end.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+    return (fin - inicio).total_seconds()
+
 def connect_gvm():
     # Conexión TLS a GVM
     connection = TLSConnection(hostname="127.0.0.1", port=9390)
@@ -143,10 +153,28 @@ def start_task(connection, user, password, configuracion):
     informacion_tareas = []
     logfinal='/opt/gvm/tasksend.txt'
     tasklog='/opt/gvm/taskslog.txt'
+    log = configurar_registro(tasklog, configuracion)
     MAX_INTERRUPCIONES = 3
+
+    # Con el lock de mantenimiento no se lanzan tareas nuevas (un lock obsoleto se elimina)
+    if lock_activo(configuracion):
+        log.info("Mantenimiento de gvmd en curso: no se lanzan tareas nuevas")
+        return 3
+    # Mantenimiento de gvmd pendiente de ciclos anteriores (solo si no hay tareas activas)
+    with etapa("mantenimiento"):
+        mantener(configuracion)
     
     with Gmp(connection=connection) as gmp:
+        # Cada llamada GMP queda en el registro con su duración y tamaño
+        gmp = GmpRegistrado(gmp, log)
         gmp.authenticate(user,password)
+
+        # Métricas: tareas por estado (cola de escaneos)
+        por_estado = {}
+        for task_elem in ET.fromstring(gmp.get_tasks(filter_string='rows=-1')).findall("task"):
+            estado = task_elem.findtext("status")
+            por_estado[estado] = por_estado.get(estado, 0) + 1
+        reemplazar("openvas_tareas", [({"estado": estado}, total) for estado, total in por_estado.items()])
         
         # NUEVO: Verificar si hay tareas interrumpidas
         respuesta_interrupted = gmp.get_tasks(filter_string='status="Stopped" status="Interrupted"')
@@ -160,15 +188,16 @@ def start_task(connection, user, password, configuracion):
             if status in ['Stopped', 'Interrupted']:
                 # Incrementar el contador de interrupciones
                 num_interrupciones = incrementar_contador_tarea(task_id, name)
-                write_log(f"Tarea interrumpida detectada: {name} (ID: {task_id}). Interrupciones: {num_interrupciones}/{MAX_INTERRUPCIONES}", tasklog)
+                incrementar("openvas_interrupciones_total", tarea=name)
+                log.info(f"Tarea interrumpida detectada: {name} (ID: {task_id}). Interrupciones: {num_interrupciones}/{MAX_INTERRUPCIONES}")
                 
                 if num_interrupciones >= MAX_INTERRUPCIONES:
-                    write_log(f"La tarea {name} ha alcanzado el límite de {MAX_INTERRUPCIONES} interrupciones. Se omite.", tasklog)
+                    log.info(f"La tarea {name} ha alcanzado el límite de {MAX_INTERRUPCIONES} interrupciones. Se omite.")
                     # Marcar la tarea como omitida (opcional: podrías agregar un estado especial)
                     continue
                 else:
                     # Eliminar todos los reportes de la tarea para dejarla en estado New
-                    write_log(f"Buscando reportes de la tarea {name} para resetearla a estado New...", tasklog)
+                    log.info(f"Buscando reportes de la tarea {name} para resetearla a estado New...")
                     try:
                         # Obtener todos los reportes asociados a esta tarea
                         reports_response = gmp.get_reports(filter_string=f'task_id={task_id}')
@@ -176,17 +205,19 @@ def start_task(connection, user, password, configuracion):
                         reports = reports_root.findall(".//report")
                         
                         if reports:
-                            write_log(f"Se encontraron {len(reports)} reporte(s) para la tarea {name}", tasklog)
+                            log.info(f"Se encontraron {len(reports)} reporte(s) para la tarea {name}")
                             for report in reports:
                                 report_id = report.get("id")
                                 # Eliminar el reporte
-                                delete_response = gmp.delete_report(report_id)
-                                write_log(f"Reporte {report_id} eliminado. Respuesta: {delete_response}", tasklog)
-                            write_log(f"Tarea {name} reseteada a estado New. Será relanzada en la próxima ejecución.", tasklog)
+                                delete_response = ET.fromstring(gmp.delete_report(report_id))
+                                log.info(f"Reporte {report_id} eliminado", task_id=task_id,
+                                         status=delete_response.get("status"))
+                            registrar_borrados(len(reports))
+                            log.info(f"Tarea {name} reseteada a estado New. Será relanzada en la próxima ejecución.")
                         else:
-                            write_log(f"No se encontraron reportes para la tarea {name}. Puede que ya esté en estado New.", tasklog)
+                            log.info(f"No se encontraron reportes para la tarea {name}. Puede que ya esté en estado New.")
                     except Exception as e:
-                        write_log(f"Error al eliminar el reporte de la tarea {name}: {e}", tasklog)
+                        log.error(f"Error al eliminar el reporte de la tarea {name}: {e}", task_id=task_id)
         
         # Verificar tareas en ejecución
         respuesta = gmp.get_tasks(filter_string='status="Running" status="Requested" status="Queued"')
@@ -196,7 +227,7 @@ def start_task(connection, user, password, configuracion):
             name = task_elem.findtext("name")
             status = task_elem.findtext("status")
             if(status=='Running' or status=='Requested' or status=='Queued'):
-                write_log("La tarea {0} con id {1} está corriendo aun. Finalizamos script.".format(name,task_id),tasklog)
+                log.info("La tarea {0} con id {1} está corriendo aun. Finalizamos script.".format(name,task_id))
                 return 1
         respuesta = gmp.get_tasks(filter_string='status="New"')
         root = ET.fromstring(respuesta)
@@ -210,15 +241,20 @@ def start_task(connection, user, password, configuracion):
             if(status=='New'):
                 # Verificar si esta tarea ha sido interrumpida demasiadas veces
                 if task_id in contador and contador[task_id]['interruptions'] >= MAX_INTERRUPCIONES:
-                    write_log(f"Omitiendo tarea {name} (ID: {task_id}) - ha sido interrumpida {contador[task_id]['interruptions']} veces", tasklog)
+                    log.info(f"Omitiendo tarea {name} (ID: {task_id}) - ha sido interrumpida {contador[task_id]['interruptions']} veces")
                     continue  # Saltar a la siguiente tarea
                 
-                write_log("Arrancamos la tarea {0} con id {1}".format(name,task_id),tasklog)
-                starttask=gmp.start_task(task_id)
-                write_log(starttask, tasklog)
+                log.info("Arrancamos la tarea {0} con id {1}".format(name,task_id))
+                starttask=ET.fromstring(gmp.start_task(task_id))
+                log.info(f"Tarea {name} arrancada", task_id=task_id, status=starttask.get("status"),
+                         report_id=starttask.findtext("report_id"))
                 return 2
         respuesta = gmp.get_tasks(filter_string='rows=-1')
         root = ET.fromstring(respuesta)
+        # Hosts de cada target, para las métricas de hosts/hora
+        hosts_target = {target.get("id"): int(target.findtext("max_hosts") or 0)
+                        for target in ET.fromstring(gmp.get_targets(filter_string='rows=-1')).findall("target")}
+        duraciones, ritmos = [], []
         for task_elem in root.findall(".//task"):
             task_id = task_elem.get("id")
             name = task_elem.findtext("name")
@@ -242,6 +278,13 @@ def start_task(connection, user, password, configuracion):
                 print("Scan Start:", scan_start)
                 print("Scan End:", scan_end)
                 print("-----------------------------")
+                segundos = segundos_escaneo(scan_start, scan_end)
+                if status == 'Done' and segundos:
+                    duraciones.append(({"tarea": name}, segundos))
+                    target = task_elem.find("target")
+                    hosts = hosts_target.get(target.get("id") if target is not None else None, 0)
+                    if hosts:
+                        ritmos.append(({"tarea": name}, round(hosts / (segundos / 3600), 1)))
                 informacion_tarea = {
                         "report_id": report_id,
                         "name": name,
@@ -251,6 +294,8 @@ def start_task(connection, user, password, configuracion):
                         "scan_end": scan_end
                 }
                 informacion_tareas.append(informacion_tarea)
+        reemplazar("openvas_escaneo_segundos", duraciones)
+        reemplazar("openvas_hosts_por_hora", ritmos)
         if os.path.exists(logfinal):
             return 0
         else:
@@ -261,14 +306,19 @@ def start_task(connection, user, password, configuracion):
             print("Todas las tareas finalizadas")
             #email(logfinal, tasklog, configuracion)
             print("Exportamos las tasks")
-            subprocess.run(["python3", "/opt/gvm/Reports/get-reports-test.py"])
+            subprocess.run(["python3", "/opt/gvm/Reports/get-reports-test.py"]
+                           + (["--profile"] if perfilando() else []))
         return 0
 
+perfilado_desde_argv("run-task")
 configuracion = leer_configuracion()
+configurar_metricas(configuracion)
+fijar("openvas_ultima_ejecucion_timestamp", datetime.datetime.now().timestamp(), script="run-task")
 user = configuracion.get('user')
 password = configuracion.get('password')
 connection = connect_gvm()
-resultado=start_task(connection,user,password,configuracion)
+with etapa("start_task"):
+    resultado=start_task(connection,user,password,configuracion)
 if(resultado==0):
     print("Finalizamos sin lanzar")
 elif(resultado==1):
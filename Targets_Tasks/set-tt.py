@@ -1,5 +1,7 @@
 import pandas as pd
 import getpass
+import os
+import sys
 import xml.etree.ElementTree as ET
 from gvm.connections import TLSConnection
 from gvm.protocols.gmp import Gmp
@@ -13,6 +15,10 @@ except ImportError:
         # Si no se puede importar, usar None y eliminar el parámetro
         HostsOrdering = None
 
+# Modo --profile compartido (Reports/perfilado.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Reports"))
+from perfilado import desde_argv as perfilado_desde_argv, etapa
+
 
 def load_csv(file):
     try:
@@ -256,16 +262,19 @@ def create_task(name,id,desc,gmp,log_file,config_id):
 if __name__ == '__main__':
     username = 'admin'
     password = get_pass()
+    perfilado_desde_argv("set-tt")
     file= "openvas.csv"
     print(f"Leyendo archivo: {file}")
-    df = load_csv(file)
+    with etapa("load_csv"):
+        df = load_csv(file)
     if df is None:
         print("No se pudo cargar el CSV. Abortando.")
         exit(1)
     print("Conectando a GVM...")
     try:
         connection= connect_gvm()
-        ready_target(connection,username,password,df)
+        with etapa("ready_target"):
+            ready_target(connection,username,password,df)
     except Exception as e:
         print(f"ERROR al conectar o procesar: {e}")
         import traceback
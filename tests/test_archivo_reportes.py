@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Reports"))
+from archivo_reportes import archivar, buscar, reexportar
+
+
+def _override(new_severity, active="1"):
+    return f"<override><active>{active}</active><new_severity>{new_severity}</new_severity></override>"
+
+
+def _result(ip, severity, overrides):
+    return (f'<result id="{ip}"><host>{ip}</host><port>443/tcp</port><severity>{severity}</severity>'
+            f"<qod><value>80</value></qod>"
+            f'<nvt oid="1.3.6"><name>NVT {ip}</name><tags>summary=Resumen|solution_type=VendorFix</tags>'
+            f'<solution type="VendorFix">sol</solution><refs/></nvt><description>salida</description>'
+            f'<overrides>{"".join(overrides)}</overrides></result>')
+
+
+# En el orden en que gvmd lista los overrides (por precedencia)
+RESULTADOS = [
+    # Dos overrides activos: gana el primero, no el último
+    _result("10.0.0.1", "5.0", [_override("2.0"), _override("9.0")]),
+    # El primero inactivo no cuenta
+    _result("10.0.0.2", "5.0", [_override("10.0", active="0"), _override("7.5"), _override("1.0")]),
+    # Falso positivo: desaparece con severity>0
+    _result("10.0.0.3", "6.0", [_override("-1")]),
+]
+
+
+class GmpFalso:
+    def get_report(self, report_id, filter_string, ignore_pagination, details):
+        return ('<?xml version="1.0"?><get_reports_response status="200"><report id="x"><report id="x">'
+                f'<results>{"".join(RESULTADOS)}</results></report></report></get_reports_response>')
+
+
+@pytest.fixture
+def archivado(tmp_path):
+    directorio, indice = str(tmp_path / "archivo"), str(tmp_path / "indice.db")
+    archivar(GmpFalso(), {"id": "r1", "task_id": "t1", "task_name": "Tarea", "fecha": 0},
+             directorio=directorio, ruta=indice)
+    return buscar(ruta=indice), directorio
+
+
+@pytest.mark.parametrize("filtro, esperado", [
+    ("apply_overrides=1 min_qod=70 severity>0", {"10.0.0.1": 2.0, "10.0.0.2": 7.5}),
+    ("apply_overrides=0 min_qod=70 severity>0", {"10.0.0.1": 5.0, "10.0.0.2": 5.0, "10.0.0.3": 6.0}),
+])
+def test_reexportar_aplica_el_primer_override_activo(archivado, tmp_path, filtro, esperado):
+    entradas, directorio = archivado
+    fichero, = reexportar(entradas, filtro, str(tmp_path / "reexport"), directorio=directorio)
+
+    df = pd.read_csv(fichero)
+    assert dict(zip(df["IP"], df["CVSS"])) == esperado
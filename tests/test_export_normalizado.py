@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Reports"))
+from export_normalizado import normalizar, nvt_id, rehidratar
+
+
+def _plano():
+    return pd.DataFrame({
+        "IP": ["10.0.0.1", "10.0.0.2", "10.0.0.3"],
+        "Port": ["443", "80", "22"],
+        "NVT Name": ["Same name", "Same name", "Otro"],
+        "Summary": ["resumen", "resumen", "otro resumen"],
+        "CVEs": ["CVE-1", None, "CVE-2"],
+        "Solution": ["sol1", "sol2", "sol3"],
+    })
+
+
+def test_mismo_nombre_distinto_contenido_no_se_mezcla():
+    plano = _plano()
+    catalogo, hallazgos = normalizar(plano)
+
+    assert len(catalogo) == 3
+    resultado = rehidratar(hallazgos, catalogo)
+    for columna in plano.columns:
+        assert resultado[columna].tolist() == plano[columna].tolist()
+
+
+def test_nvt_repetido_una_fila_en_catalogo():
+    plano = pd.concat([_plano(), _plano()], ignore_index=True)
+    catalogo, hallazgos = normalizar(plano)
+
+    assert len(catalogo) == 3
+    assert len(hallazgos) == 6
+    assert "NVT Name" not in hallazgos.columns
+
+
+def test_nvt_id_estable_y_coherente_con_el_catalogo():
+    catalogo, _ = normalizar(_plano())
+    fila = catalogo.iloc[0]
+
+    # Mismo orden de columnas que el catálogo (COLUMNAS_NVT)
+    assert fila["nvt_id"] == nvt_id(fila["NVT Name"], fila["Summary"], fila["Solution"], fila["CVEs"])
@@ -0,0 +1,109 @@
+import os
+import re
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Reports"))
+from ingesta_xml import COLUMNAS, leer_reporte
+from tipos_hallazgos import concatenar, ip_a_entero, ip_a_texto, leer_csv, para_serializar
+
+# (ip, hostname, port, severity, nvt, summary, descripción, cves, solución);
+# None = la etiqueta no aparece en el XML
+RESULTADOS = [
+    ("10.0.0.1", "a.corp", "443/tcp", "7.5", "NVT 1", "Resumen 1", "salida 1", ["CVE-1", "CVE-2"], "sol 1"),
+    ("10.0.0.2", "", "general/tcp", "5.0", "NVT 2", "Resumen 2", "salida 2", [], "sol 2"),
+    ("192.168.1.3", "c.corp", None, None, "NVT 1", "Resumen 1", "salida 3", ["CVE-1", "CVE-2"], "sol 1"),
+]
+
+# Los mismos hallazgos en "CSV Results" de gvmd
+CSV = (
+    "IP,Hostname,Port,Port Protocol,CVSS,NVT Name,Summary,Specific Result,CVEs,Solution\n"
+    '10.0.0.1,a.corp,443,tcp,7.5,NVT 1,Resumen 1,salida 1,"CVE-1,CVE-2",sol 1\n'
+    "10.0.0.2,,,tcp,5.0,NVT 2,Resumen 2,salida 2,,sol 2\n"
+    '192.168.1.3,c.corp,,,,NVT 1,Resumen 1,salida 3,"CVE-1,CVE-2",sol 1\n'
+)
+
+
+def _result(ip, hostname, port, severity, nvt, summary, descripcion, cves, solucion):
+    puerto = f"<port>{port}</port>" if port is not None else ""
+    severidad = f"<severity>{severity}</severity>" if severity is not None else ""
+    refs = "".join(f'<ref type="cve" id="{cve}"/>' for cve in cves)
+    return (f'<result id="r"><host>{ip}<hostname>{hostname}</hostname></host>{puerto}{severidad}'
+            f'<nvt oid="1.3.6"><name>{nvt}</name><tags>summary={summary}|solution_type=VendorFix</tags>'
+            f'<solution type="VendorFix">{solucion}</solution><refs>{refs}</refs></nvt>'
+            f"<description>{descripcion}</description></result>")
+
+
+class GmpFalso:
+    """get_report paginado sobre RESULTADOS, como gvmd con first/rows."""
+
+    def __init__(self, resultados=RESULTADOS):
+        self.resultados = resultados
+        self.filtros = []
+
+    def get_report(self, report_id, filter_string, ignore_pagination, details):
+        self.filtros.append(filter_string)
+        primero = int(re.search(r"first=(\d+)", filter_string).group(1))
+        filas = int(re.search(r"rows=(\d+)", filter_string).group(1))
+        pagina = self.resultados[primero - 1:primero - 1 + filas]
+        return ('<get_reports_response status="200"><report id="x"><report id="x"><results>'
+                + "".join(_result(*r) for r in pagina)
+                + "</results></report></report></get_reports_response>")
+
+
+def test_paginacion_termina_con_pagina_incompleta():
+    gmp = GmpFalso()
+    df = leer_reporte(gmp, "x", page_size=2).a_dataframe()
+
+    assert len(df) == 3
+    assert len(gmp.filtros) == 2
+    assert "first=1 rows=2" in gmp.filtros[0]
+    assert "first=3 rows=2" in gmp.filtros[1]
+
+
+def test_paginacion_pagina_completa_pide_la_siguiente():
+    gmp = GmpFalso(RESULTADOS[:2])
+    df = leer_reporte(gmp, "x", page_size=2).a_dataframe()
+
+    assert len(df) == 2
+    assert len(gmp.filtros) == 2  # la segunda página llega vacía
+
+
+def test_ip_ida_y_vuelta_uint32():
+    df = leer_reporte(GmpFalso(), "x").a_dataframe()
+
+    assert df["IP"].dtype == "uint32"
+    assert df["IP"].tolist() == ip_a_entero(pd.Series([r[0] for r in RESULTADOS])).tolist()
+    assert ip_a_texto(df["IP"]).tolist() == [r[0] for r in RESULTADOS]
+
+
+def test_puerto_y_cvss_vacios_o_ausentes():
+    df = leer_reporte(GmpFalso(), "x").a_dataframe()
+
+    assert df["Port"].iloc[0] == 443
+    assert pd.isna(df["Port"].iloc[1])        # general/tcp
+    assert pd.isna(df["Port"].iloc[2])        # sin <port>
+    assert df["Port Protocol"].iloc[1] == "tcp"
+    assert pd.isna(df["Port Protocol"].iloc[2])
+    assert pd.isna(df["CVSS"].iloc[2])        # sin <severity>, igual que la celda vacía del CSV
+    assert pd.isna(df["CVEs"].iloc[1])
+    assert pd.isna(df["Hostname"].iloc[1])
+
+
+def test_mismo_dataframe_que_la_ruta_csv(tmp_path):
+    fichero = tmp_path / "reporte.csv"
+    fichero.write_text(CSV)
+    xml = leer_reporte(GmpFalso(), "x", page_size=2).a_dataframe()
+    csv = leer_csv(str(fichero))[COLUMNAS]
+
+    # Mismas columnas y tipos que concatena delete_duplicates
+    assert list(xml.columns) == COLUMNAS
+    for columna in COLUMNAS:
+        assert xml[columna].dtype.name == csv[columna].dtype.name, columna
+
+    # Y el mismo CSV de salida, por separado o mezclados
+    pd.testing.assert_frame_equal(para_serializar(concatenar([xml])), para_serializar(concatenar([csv])))
+    mezclados = para_serializar(concatenar([xml, csv]))
+    assert mezclados.iloc[:3].to_csv(index=False) == mezclados.iloc[3:].to_csv(index=False)
+    assert mezclados.to_csv(index=False).startswith(CSV.splitlines()[0])
@@ -0,0 +1,51 @@
+import datetime
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Reports"))
+import mantenimiento_gvmd
+
+
+@pytest.fixture
+def lock(tmp_path, monkeypatch):
+    ruta = str(tmp_path / ".maintenance.lock")
+    monkeypatch.setattr(mantenimiento_gvmd, "LOCK_MANTENIMIENTO", ruta)
+
+    def escribir(pid, hace=0):
+        fecha = datetime.datetime.now() - datetime.timedelta(seconds=hace)
+        with open(ruta, "w") as f:
+            json.dump({"timestamp": fecha.isoformat(timespec="seconds"), "pid": pid, "status": "running"}, f)
+    escribir.ruta = ruta
+    return escribir
+
+
+def _pid_muerto():
+    proceso = subprocess.Popen([sys.executable, "-c", "pass"])
+    proceso.wait()
+    return proceso.pid
+
+
+def test_sin_lock(lock):
+    assert not mantenimiento_gvmd.lock_activo({})
+
+
+def test_lock_de_proceso_vivo(lock):
+    lock(os.getpid())
+    assert mantenimiento_gvmd.lock_activo({})
+    assert os.path.exists(lock.ruta)
+
+
+def test_lock_de_proceso_muerto_se_elimina(lock):
+    lock(_pid_muerto())
+    assert not mantenimiento_gvmd.lock_activo({})
+    assert not os.path.exists(lock.ruta)
+
+
+def test_lock_mas_antiguo_que_el_timeout_se_elimina(lock):
+    lock(os.getpid(), hace=3 * 3600)
+    assert not mantenimiento_gvmd.lock_activo({"mantenimiento_gvmd": {"timeout": 3600, "modos": ["vacuum"]}})
+    assert not os.path.exists(lock.ruta)
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Reports"))
+from gvmd_db import _epoch
+from retencion_reportes import seleccionar
+
+DIA = 86400
+AHORA = 100 * DIA
+
+
+def _reporte(ident, tarea, dias_antiguedad):
+    fecha = AHORA - dias_antiguedad * DIA if dias_antiguedad is not None else 0
+    return {"id": ident, "task_id": tarea, "task_name": tarea, "fecha": fecha}
+
+
+# Tarea A: 3 reportes de 1, 5 y 40 días; tarea B: 10 y 60 días y uno sin fecha
+REPORTES = [
+    _reporte("a1", "A", 1), _reporte("a2", "A", 5), _reporte("a3", "A", 40),
+    _reporte("b1", "B", 10), _reporte("b2", "B", 60), _reporte("b3", "B", None),
+]
+
+
+@pytest.mark.parametrize("mantener, dias, borrados", [
+    # Política por defecto (0/0): se borra todo
+    (0, 0, {"a1", "a2", "a3", "b1", "b2", "b3"}),
+    # Los N más recientes de cada tarea
+    (1, 0, {"a2", "a3", "b2", "b3"}),
+    (2, 0, {"a3", "b3"}),
+    (5, 0, set()),
+    # Más recientes que X días
+    (0, 7, {"a3", "b1", "b2", "b3"}),
+    (0, 30, {"a3", "b2", "b3"}),
+    # Unión: se conserva si cumple cualquiera de las dos
+    (1, 7, {"a3", "b2", "b3"}),
+    (2, 30, {"a3", "b3"}),
+])
+def test_seleccionar(mantener, dias, borrados):
+    seleccion = seleccionar([dict(r) for r in REPORTES], mantener_por_tarea=mantener, dias=dias, ahora=AHORA)
+    assert {r["id"] for r in seleccion} == borrados
+
+
+@pytest.mark.parametrize("fecha", [None, "", "no es una fecha"])
+def test_reporte_sin_fecha_cuenta_como_el_mas_antiguo(fecha):
+    reportes = [{"id": "viejo", "task_id": "A", "fecha": _epoch(fecha)},
+                {"id": "nuevo", "task_id": "A", "fecha": AHORA - DIA}]
+
+    # `dias` nunca lo conserva...
+    assert [r["id"] for r in seleccionar(reportes, dias=30, ahora=AHORA)] == ["viejo"]
+    # ...y `mantener_por_tarea` solo si la tarea no tiene N reportes más recientes
+    assert [r["id"] for r in seleccionar(reportes, mantener_por_tarea=1, ahora=AHORA)] == ["viejo"]
+    assert seleccionar(reportes, mantener_por_tarea=2, ahora=AHORA) == []
@@ -0,0 +1,39 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+REPORTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Reports")
+sys.path.insert(0, REPORTS)
+
+CSV = (
+    "IP,Hostname,Port,Port Protocol,CVSS,NVT Name,Summary,Specific Result,CVEs,Solution\n"
+    '10.0.0.1,a.corp,443,tcp,7.5,NVT 1,Resumen 1,salida 1,"CVE-1,CVE-2",sol 1\n'
+    "10.0.0.2,,,tcp,5.0,NVT 2,Resumen 2,salida 2,,sol 2\n"
+)
+
+
+@pytest.fixture
+def get_reports():
+    # get-reports-test.py no es importable por nombre (lleva guiones)
+    spec = importlib.util.spec_from_file_location("get_reports_test", os.path.join(REPORTS, "get-reports-test.py"))
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    modulo.configuracion = {}
+    return modulo
+
+
+def test_fallo_del_indice_cve_no_impide_los_ficheros(get_reports, tmp_path, monkeypatch):
+    fichero = tmp_path / "2026_01_30_10_30.csv"
+    fichero.write_text(CSV)
+
+    def indexar(df):
+        raise RuntimeError("base de datos no disponible")
+    monkeypatch.setattr(get_reports, "indexar", indexar)
+
+    ficheros = get_reports.separar_cve(str(fichero))
+
+    assert ficheros == [str(tmp_path / "2026_01_30_10_30_CVE.csv"),
+                        str(tmp_path / "2026_01_30_10_30_Misconfigs.csv")]
+    assert all(os.path.exists(f) for f in ficheros)